@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # Third-Party apps
     "rest_framework",
     "rest_framework_simplejwt",
@@ -146,6 +147,24 @@ USE_TZ = True
 
 # Custom settings
 PHONE_NUMBER_RESEND_OTP_MINUTES = 2
+# text search configuration used for products.search_vector
+PRODUCT_SEARCH_CONFIG = "simple"
+# upper bounds of the price facet buckets, run rebuild_product_facets after changing them
+PRODUCT_FACET_PRICE_BOUNDS = [100, 500, 1000, 5000, 10000]
+# product views are buffered per worker and written to view_count every N seconds
+PRODUCT_VIEW_COUNT_FLUSH_SECONDS = 10
+# distinct products a worker buffers before it starts dropping view events
+PRODUCT_VIEW_COUNT_MAX_PENDING = 10000
+# "database", or "redis" to hold active carts in Redis and persist them with the persist_carts command
+CART_STORE = "database"
+CART_REDIS_URL = "redis://127.0.0.1:6379/2"
+# idle carts are dropped from Redis after this long, keep it well above the persist_carts interval
+CART_REDIS_TTL_SECONDS = 60 * 60 * 24 * 7
+# after a Redis error carts are served from the database for this long before Redis is tried again
+CART_REDIS_RETRY_SECONDS = 5
+# 0-1023 and distinct per process for collision-free order numbers (orders.identifiers),
+# required unless DEBUG, where unset derives one from the host name and pid
+ID_WORKER_ID = int(os.getenv("ID_WORKER_ID")) if os.getenv("ID_WORKER_ID") else None
 
 
 # Static files (CSS, JavaScript, Images)
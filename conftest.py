@@ -1,11 +1,19 @@
+import itertools
 import pytest
-from accounts.models import User, Role
-from products.models import Category
+from accounts.models import Address, User, Role
+from django.utils import timezone
+from products.models import Category, Discount, Product
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.test import APIClient
 from datetime import datetime, timedelta
 
 
+@pytest.fixture(autouse=True)
+def id_worker_id(settings):
+    # tests run with DEBUG off, where order numbers need a configured worker id
+    settings.ID_WORKER_ID = 1
+
+
 # returns authorized client to send HTTP request and a user object to be used accross user relations
 @pytest.fixture
 def make_authorized_client(db):
@@ -26,6 +34,67 @@ def make_authorized_client(db):
     return _make
 
 
+# returns a factory of categories named after their slug
+@pytest.fixture
+def make_category(db):
+    def _make(slug, parent=None, **fields):
+        return Category.objects.create(**{
+            "name": slug, "description": "d", "slug": slug, "icon_url": "http://example.com/i.png", "parent": parent,
+            **fields,
+        })
+
+    return _make
+
+
+# returns a factory of products, fields not given get test values, name and price may be passed positionally
+@pytest.fixture
+def make_product(make_category):
+    counter = itertools.count()
+    default_category = []
+
+    def _make(name=None, price="10.00", category=None, **fields):
+        if category is None:
+            if not default_category:
+                default_category.append(make_category("default"))
+            category = default_category[0]
+        name = name or f"Product {next(counter)}"
+        slug = name.lower().replace(" ", "-")
+
+        return Product.objects.create(**{
+            "name": name, "description": "Description", "category": category, "brand": "Brand", "slug": slug,
+            "sku": slug, "price": price, "weight_kg": "1.000", "dimensions": "1x1x1", **fields,
+        })
+
+    return _make
+
+
+# returns a factory of addresses of a user
+@pytest.fixture
+def make_address(db):
+    def _make(user, **fields):
+        return Address.objects.create(**{
+            "user": user, "title": "Home", "province": "Tehran", "street": "Street", "city": "Tehran",
+            "postal_code": "12345", "full_address": "Tehran", "reciever_name": "Name",
+            "reciever_phone": user.phone_number, "latitude": "35.7", "longitude": "51.4", **fields,
+        })
+
+    return _make
+
+
+# returns a factory of discounts live for a day either side of now, a 10% "SALE" unless fields say otherwise
+@pytest.fixture
+def make_discount(db):
+    def _make(**fields):
+        now = timezone.now()
+        return Discount.objects.create(**{
+            "title": "Sale", "description": "d", "code": "SALE", "type": "percentage", "value": "10.00",
+            "max_discount": "0.00", "starts_at": now - timedelta(days=1), "ends_at": now + timedelta(days=1),
+            **fields,
+        })
+
+    return _make
+
+
 # returns category data needed to create one
 @pytest.fixture
 def category_data():
@@ -107,10 +176,6 @@ def cart_data(make_authorized_client):
 
         return {
             "user_id": user.id if is_post_method_data else user,
-            "items": [
-                {"product_id": 1, "quantity": 4},
-                {"product_id": 2, "quantity": 2},
-            ],
             "expires_at": datetime.now() + timedelta(days=7),
         }
 
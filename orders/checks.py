@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+@register()
+def check_id_worker_id(app_configs, **kwargs):
+    """Order numbers of processes deriving the same worker id can collide, see orders.identifiers."""
+
+    if settings.DEBUG or getattr(settings, "ID_WORKER_ID", None) is not None:
+        return []
+    return [
+        Error(
+            "ID_WORKER_ID is not set.",
+            hint="Set ID_WORKER_ID to a number from 0 to 1023 that no other running process uses.",
+            id="orders.E001",
+        )
+    ]
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import secrets
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from utils.base32 import ALPHABET
+
+# what support staff may type instead of a base32 symbol
+READ_AS = {"I": "1", "L": "1", "O": "0", "U": "V"}
+
+# 2025-01-01T00:00:00Z in milliseconds, ids count from here
+EPOCH_MS = 1735689600000
+
+TIMESTAMP_BITS = 41
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+# a millisecond's sequence starts at random below this, leaving 2048 ids for the millisecond
+FIRST_SEQUENCES = 1 << (SEQUENCE_BITS - 1)
+
+# 63 bits in 5 bit symbols, zero padded so the strings sort like the ids
+ENCODED_LENGTH = 13
+
+
+def default_worker_id():
+    """Worker id of this process when ``ID_WORKER_ID`` is not set in development, from the host name and pid."""
+
+    digest = hashlib.blake2b(f"{socket.gethostname()}:{os.getpid()}".encode(), digest_size=4).digest()
+    return int.from_bytes(digest, "big") & MAX_WORKER
+
+
+class IdGenerator:
+    """
+    Snowflake ids: 41 bits of milliseconds since ``EPOCH_MS``, 10 bits of
+    worker id and a 12 bit sequence within the millisecond. Ids of one
+    process never repeat and only grow, without a database round trip, so
+    a unique index on them only ever appends to its rightmost leaf.
+
+    Processes need distinct worker ids to never collide, so
+    ``ID_WORKER_ID`` must be set per process outside ``DEBUG``, the
+    ``orders.E001`` check fails startup without it. The development
+    default from host name and pid can be shared by two processes, a
+    random start of every millisecond's sequence keeps even those from
+    making the same id in all but a tiny fraction of cases.
+
+    A clock moving backwards does not move the ids back, the last
+    millisecond keeps being used until the clock catches up.
+    """
+
+    def __init__(self, worker_id):
+        if not 0 <= worker_id <= MAX_WORKER:
+            raise ValueError(f"worker id must be between 0 and {MAX_WORKER}")
+
+        self.worker_id = worker_id
+        self.last_ms = -1
+        self.sequence = 0
+        self.lock = threading.Lock()
+
+    def now_ms(self):
+        return time.time_ns() // 1_000_000 - EPOCH_MS
+
+    def next_id(self):
+        with self.lock:
+            now = self.now_ms()
+            if now > self.last_ms:
+                self.last_ms, self.sequence = now, secrets.randbelow(FIRST_SEQUENCES)
+            elif self.sequence < MAX_SEQUENCE:
+                self.sequence += 1
+            else:
+                # the millisecond is used up, borrow the next one
+                self.last_ms, self.sequence = self.last_ms + 1, 0
+
+            return (self.last_ms << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self.sequence
+
+
+def encode(value):
+    symbols = []
+    for _ in range(ENCODED_LENGTH):
+        value, symbol = divmod(value, 32)
+        symbols.append(ALPHABET[symbol])
+    return "".join(reversed(symbols))
+
+
+def decode(text):
+    """The id of an encoded string, forgiving case, dashes and look-alike letters."""
+
+    value = 0
+    for char in text.upper().replace("-", ""):
+        value = value * 32 + ALPHABET.index(READ_AS.get(char, char))
+    return value
+
+
+def timestamp_ms(value):
+    """Unix time in milliseconds an id was generated at."""
+
+    return (value >> (WORKER_BITS + SEQUENCE_BITS)) + EPOCH_MS
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def configured_worker_id():
+    """``ID_WORKER_ID``, derived in development, raises ``ImproperlyConfigured`` when unset otherwise."""
+
+    worker_id = getattr(settings, "ID_WORKER_ID", None)
+    if worker_id is not None:
+        return worker_id
+    if not settings.DEBUG:
+        raise ImproperlyConfigured("ID_WORKER_ID must be set to a worker id distinct per process.")
+    return default_worker_id()
+
+
+def generator():
+    global _generator
+
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                _generator = IdGenerator(configured_worker_id())
+    return _generator
+
+
+def reset_generator():
+    global _generator
+    _generator = None
+
+
+@receiver(setting_changed)
+def reset_generator_on_setting_changed(setting, **kwargs):
+    if setting in ("ID_WORKER_ID", "DEBUG"):
+        reset_generator()
+
+
+# a forked worker derives its own worker id instead of sharing its parent's
+os.register_at_fork(after_in_child=reset_generator)
+
+
+def order_number():
+    """A new ``Order.order_number``."""
+
+    return encode(generator().next_id())
+
+
+def transaction_id():
+    """A new ``Payment.transaction_id``."""
+
+    return encode(generator().next_id())
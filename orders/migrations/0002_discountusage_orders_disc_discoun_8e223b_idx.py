@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+        ('products', '0018_alter_discount_applies_to'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='discountusage',
+            index=models.Index(fields=['discount', 'user'], name='orders_disc_discoun_8e223b_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:36
+
+import orders.identifiers
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_discountusage_orders_disc_discoun_8e223b_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='order_number',
+            field=models.CharField(default=orders.identifiers.order_number, max_length=50, unique=True, verbose_name='شماره سفارش'),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='transaction_id',
+            field=models.CharField(default=orders.identifiers.transaction_id, max_length=100, unique=True, verbose_name='شناسه تراکنش'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_alter_address_city_alter_address_full_address_and_more'),
+        ('orders', '0003_alter_order_order_number_and_more'),
+        ('products', '0020_discount_template'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+        ),
+    ]
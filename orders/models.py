@@ -2,6 +2,7 @@ from django.db import models
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from django.contrib.auth import get_user_model
+from orders.identifiers import order_number, transaction_id
 
 User = get_user_model()
 
@@ -45,7 +46,7 @@ class Order(models.Model):
         related_name='orders',
         verbose_name='تخفیف'
     )
-    order_number = models.CharField(max_length=50, unique=True, verbose_name='شماره سفارش') # random
+    order_number = models.CharField(max_length=50, unique=True, default=order_number, verbose_name='شماره سفارش') # time ordered, see orders.identifiers
     discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name='مبلغ تخفیف')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name='مبلغ کل')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='وضعیت')
@@ -57,7 +58,10 @@ class Order(models.Model):
     updated_at = models.DateTimeField(default=timezone.now, verbose_name='زمان به‌روزرسانی')
 
     class Meta:
-
+        indexes = [
+            # a user's order history, newest first, see orders.pagination.OrderPagination
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+        ]
         verbose_name = 'سفارش'
         verbose_name_plural = 'سفارش‌ها'
 
@@ -126,6 +130,8 @@ class DiscountUsage(models.Model):
         indexes = [
             models.Index(fields=['user']),
             models.Index(fields=['used_at']),
+            # uses of a code by one user, see orders.services.redeem_discount
+            models.Index(fields=['discount', 'user']),
         ]
         verbose_name = 'استفاده از تخفیف'
         verbose_name_plural = 'استفاده‌های تخفیف'
@@ -148,7 +154,7 @@ class Payment(models.Model):
         related_name='payments',
         verbose_name='سفارش'
     )
-    transaction_id = models.CharField(max_length=100, unique=True, verbose_name='شناسه تراکنش') #random
+    transaction_id = models.CharField(max_length=100, unique=True, default=transaction_id, verbose_name='شناسه تراکنش') # time ordered, see orders.identifiers
     payment_method = models.CharField(max_length=50, verbose_name='روش پرداخت')
     amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name='مبلغ')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='وضعیت')
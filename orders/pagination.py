@@ -0,0 +1,8 @@
+from utils.pagination import KeysetPagination
+
+
+class OrderPagination(KeysetPagination):
+
+    # backed by the (user, -created_at, -id) index on Order
+    ordering = "-created_at"
+    ordering_fields = ("created_at",)
@@ -0,0 +1,72 @@
+from rest_framework import serializers
+from accounts.models import Address
+from orders.models import Order, OrderItem, Payment, Shipment
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = OrderItem
+        fields = (
+            "id", "product", "product_name", "product_snapshot", "quantity", "unit_price", "discount_amount", "total_price",
+        )
+
+
+class OrderSerializer(serializers.ModelSerializer):
+
+    items = OrderItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = (
+            "id", "order_number", "status", "payment_status", "shipping_address", "discount", "discount_amount",
+            "total_amount", "customer_notes", "created_at", "items",
+        )
+
+
+class PaymentSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Payment
+        fields = (
+            "id", "transaction_id", "payment_method", "amount", "status", "card_number", "paid_at", "refund_amount",
+            "refunded_at",
+        )
+
+
+class ShipmentSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Shipment
+        fields = ("id", "tracking_number", "courier", "status", "delivered_at", "delivered_to", "created_at")
+
+
+class OrderHistorySerializer(OrderSerializer):
+
+    # load with orders.views.order_history, the relations come prefetched
+    payments = PaymentSerializer(many=True, read_only=True)
+    shipments = ShipmentSerializer(many=True, read_only=True)
+
+    class Meta(OrderSerializer.Meta):
+        fields = OrderSerializer.Meta.fields + ("payments", "shipments")
+
+
+class OrderSummarySerializer(serializers.ModelSerializer):
+
+    # annotated by orders.views.order_history
+    item_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ("id", "order_number", "status", "payment_status", "total_amount", "created_at", "item_count")
+
+
+class CheckoutSerializer(serializers.Serializer):
+
+    shipping_address = serializers.PrimaryKeyRelatedField(queryset=Address.objects.none())
+    customer_notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # only the user's own addresses
+        self.fields["shipping_address"].queryset = Address.objects.filter(user=self.context["request"].user)
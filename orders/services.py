@@ -0,0 +1,198 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Now
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from orders.models import DiscountUsage, Order, OrderItem
+from products.cart_store import cart_store
+from products.discounts import CENT, ZERO, compile_discount, invalidate_active, invalidate_code
+from products.models import Cart, CartItem, Discount, Product
+from utils import error_messages
+
+
+def redeem_discount(discount, user, order, amount):
+    """
+    Record one use of ``discount`` by ``user`` for ``order``.
+
+    The use is claimed with a single conditional UPDATE. The UPDATE fails
+    when the code is inactive, outside its window, or at
+    ``usage_limit_total``, so concurrent redemptions can never take the
+    count past the limit.
+
+    The UPDATE also holds the discount's row lock until the caller's
+    transaction ends. The user's earlier uses are counted after the lock is
+    taken, so parallel redemptions by one user are counted one at a time.
+    Redeem as late in the transaction as possible, because every other
+    redemption of the code waits on that lock.
+
+    The UPDATE bypasses ``save()`` and its signals. The redemption that uses
+    the code up drops the cached rules itself, so ``is_live()`` stops
+    accepting the code.
+    """
+
+    discount_id = getattr(discount, "pk", discount)
+    now = timezone.now()
+    discounts = Discount.objects.filter(pk=discount_id)
+
+    with transaction.atomic():
+        claimed = discounts.filter(
+            Q(usage_limit_total__isnull=True) | Q(used_count__lt=F("usage_limit_total")),
+            is_active=True,
+            starts_at__lte=now,
+            ends_at__gt=now,
+        ).update(used_count=F("used_count") + 1)
+
+        if not claimed:
+            used_up = discounts.filter(used_count__gte=F("usage_limit_total")).exists()
+            raise ValidationError({"discount_code": [
+                error_messages.ERR_DISCOUNT_USED_UP if used_up else error_messages.ERR_INVALID_DISCOUNT_CODE
+            ]})
+
+        # counted through the (discount, user) index of DiscountUsage
+        code, used, total, per_user, used_by_user = discounts.annotate(
+            used_by_user=Count("usages", filter=Q(usages__user=user))
+        ).values_list("code", "used_count", "usage_limit_total", "usage_limit_per_user", "used_by_user").get()
+
+        if per_user is not None and used_by_user >= per_user:
+            # leaving the savepoint gives the claimed use back
+            raise ValidationError({"discount_code": [error_messages.ERR_DISCOUNT_USER_LIMIT]})
+
+        if total is not None and used >= total:
+            invalidate_code(code)
+            invalidate_active()
+
+        return DiscountUsage.objects.create(discount_id=discount_id, user=user, order=order, discount_amount=amount)
+
+
+def checkout(user, shipping_address, customer_notes=None):
+    """
+    Turn the user's active cart into an order in one transaction.
+
+    The cart is locked and its lines are read once with their products, so
+    the order is priced at the current prices. Then the order, its items
+    (one ``bulk_create``), the discount use and the checked-out cart are
+    written. The number of queries does not depend on the number of lines.
+
+    A discount that takes nothing off the cart, or a first purchase code
+    of a user who has ordered before, rejects the checkout rather than
+    using the code up.
+    """
+
+    # a cart held in Redis is written back first
+    cart_store().persist(user.pk)
+
+    with transaction.atomic():
+        cart = (
+            Cart.objects.select_for_update(of=("self",))
+            .select_related("discount")
+            .filter(user=user, status=Cart.active)
+            .first()
+        )
+        lines = [] if cart is None else list(
+            CartItem.objects.filter(cart=cart)
+            .select_related("product__category")
+            .defer("product__description", "product__search_vector")
+            .order_by("pk")
+        )
+
+        if not lines:
+            raise ValidationError({"cart": [error_messages.ERR_CART_EMPTY]})
+        if not all(line.product.is_active for line in lines):
+            raise ValidationError({"cart": [error_messages.ERR_PRODUCT_UNAVAILABLE]})
+
+        evaluator = compile_discount(cart.discount)
+        if evaluator is None:
+            subtotal, eligible, amount = sum((line.quantity * line.product.price for line in lines), ZERO), ZERO, ZERO
+        else:
+            subtotal, eligible, amount = evaluator.evaluate(
+                (line.product_id, line.quantity, line.product.price, category_path(line.product)) for line in lines
+            )
+            check_discount(evaluator, user, subtotal, eligible, amount)
+
+        order = Order.objects.create(
+            user=user,
+            shipping_address=shipping_address,
+            discount=cart.discount,
+            discount_amount=amount,
+            total_amount=subtotal - amount,
+            customer_notes=customer_notes,
+        )
+        OrderItem.objects.bulk_create(order_items(order, lines, evaluator, amount, eligible))
+
+        Cart.objects.filter(pk=cart.pk).update(
+            status=Cart.checkedOut, subtotal=subtotal, eligible_subtotal=eligible, total_amount=subtotal - amount,
+            updated_at=Now(),
+        )
+        CartItem.objects.filter(cart=cart).update(
+            unit_price_snapshot=Subquery(Product.objects.filter(pk=OuterRef("product_id")).values("price")[:1]),
+            updated_at=Now(),
+        )
+
+        if cart.discount_id is not None:
+            # last, every other checkout with this code waits on its row lock
+            redeem_discount(cart.discount_id, user, order, amount)
+
+        transaction.on_commit(lambda: cart_store().forget(user.pk))
+
+    return order
+
+
+def check_discount(evaluator, user, subtotal, eligible, amount):
+    """Reject a cart discount that saves nothing, runs under the cart's lock so the user's orders cannot change."""
+
+    if evaluator.type == "free_shipping":
+        applies = subtotal >= evaluator.min_purchase and eligible > 0
+    else:
+        applies = amount > 0
+    if not applies:
+        raise ValidationError({"discount_code": [error_messages.ERR_DISCOUNT_NOT_APPLICABLE]})
+
+    if evaluator.first_purchase_only and Order.objects.filter(user=user).exists():
+        raise ValidationError({"discount_code": [error_messages.ERR_DISCOUNT_FIRST_PURCHASE]})
+
+
+def order_items(order, lines, evaluator, amount, eligible):
+    """
+    The order's items, with the order discount spread over the lines it
+    applies to by their share of ``eligible``. The rounding remainder goes
+    to the last of them so the items add up to the order.
+    """
+
+    items = []
+    for line in lines:
+        product = line.product
+        items.append(OrderItem(
+            order=order,
+            product=product,
+            product_name=product.name,
+            product_snapshot={
+                "id": product.pk,
+                "name": product.name,
+                "slug": product.slug,
+                "sku": product.sku,
+                "brand": product.brand,
+                "price": str(product.price),
+                "category_id": product.category_id,
+            },
+            quantity=line.quantity,
+            unit_price=product.price,
+            discount_amount=ZERO,
+            total_price=line.quantity * product.price,
+        ))
+
+    if amount:
+        discounted = [item for item in items if evaluator.applies(item.product_id, category_path(item.product))]
+        left = amount
+        for item in discounted[:-1]:
+            item.discount_amount = (amount * item.total_price / eligible).quantize(CENT)
+            left -= item.discount_amount
+        discounted[-1].discount_amount = left
+
+    for item in items:
+        item.total_price -= item.discount_amount
+    return items
+
+
+def category_path(product):
+    return product.category.path if product.category_id else None
@@ -0,0 +1,180 @@
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+import pytest
+from orders.models import DiscountUsage, Order
+from orders.services import checkout
+from products.models import Cart, Discount, Product
+from utils import error_messages
+
+
+@pytest.fixture
+def shopper(make_authorized_client, make_address):
+    client, user = make_authorized_client("09140329711")
+    return client, user, make_address(user)
+
+
+def add(client, *lines):
+    response = client.post(
+        reverse("carts-me-items"),
+        data=[{"product_id": product.id, "quantity": quantity} for product, quantity in lines],
+        content_type="application/json",
+    )
+    assert response.status_code == 200
+
+
+def post_checkout(client, address, **data):
+    return client.post(reverse("orders-checkout"), data={"shipping_address": address.pk, **data}, format="json")
+
+
+@pytest.mark.django_db
+class TestCheckout:
+
+    def test_cart_becomes_an_order_at_current_prices(self, shopper, make_product):
+        client, user, address = shopper
+        shoe, hat = make_product("shoe", "100.00"), make_product("hat", "25.00")
+        add(client, (shoe, 2), (hat, 1))
+        Product.objects.filter(pk=hat.pk).update(price="30.00")
+
+        response = post_checkout(client, address, customer_notes="ring twice")
+
+        assert response.status_code == 201
+        order = Order.objects.get(pk=response.json()["id"])
+        assert (order.total_amount, order.discount_amount, order.customer_notes) == (
+            Decimal("230.00"), Decimal("0.00"), "ring twice",
+        )
+        items = {item["product"]: item for item in response.json()["items"]}
+        assert items[hat.pk]["unit_price"] == "30.00"
+        assert items[shoe.pk]["product_snapshot"]["sku"] == "shoe"
+
+        cart = Cart.objects.get(user=user)
+        assert (cart.status, cart.total_amount) == (Cart.checkedOut, Decimal("230.00"))
+        # the next cart request starts a new one
+        assert client.get(reverse("carts-me")).json()["items"] == []
+
+    def test_discount_is_spread_over_its_lines_and_redeemed(self, shopper, make_product, make_discount):
+        client, user, address = shopper
+        shoe, hat, belt = make_product("shoe", "100.00"), make_product("hat", "33.33"), make_product("belt", "10.00")
+        add(client, (shoe, 1), (hat, 1), (belt, 1))
+        discount = make_discount(applies_to="products", traget_ids=[shoe.pk, hat.pk], usage_limit_total=5)
+        Cart.objects.filter(user=user).update(discount=discount)
+
+        response = post_checkout(client, address)
+
+        assert response.status_code == 201
+        order = Order.objects.get(pk=response.json()["id"])
+        assert (order.discount_id, order.discount_amount, order.total_amount) == (
+            discount.pk, Decimal("13.33"), Decimal("130.00"),
+        )
+        items = {item.product_id: item for item in order.items.all()}
+        assert [items[pk].discount_amount for pk in (shoe.pk, hat.pk, belt.pk)] == [
+            Decimal("10.00"), Decimal("3.33"), Decimal("0.00"),
+        ]
+        assert sum(item.total_price for item in items.values()) == order.total_amount
+        assert DiscountUsage.objects.get(order=order).discount_amount == Decimal("13.33")
+        assert Discount.objects.get(pk=discount.pk).used_count == 1
+
+    def test_query_count_does_not_grow_with_the_cart(self, shopper, make_product):
+        client, user, address = shopper
+        products = [make_product(f"p{n}", "10.00") for n in range(12)]
+
+        def checkout_queries(lines):
+            add(client, *((product, 1) for product in lines))
+            with CaptureQueriesContext(connection) as ctx:
+                checkout(user, address)
+            return len(ctx.captured_queries)
+
+        assert checkout_queries(products[:1]) == checkout_queries(products[1:])
+
+    def test_empty_cart_is_rejected(self, shopper):
+        client, _, address = shopper
+
+        response = post_checkout(client, address)
+
+        assert response.status_code == 400
+        assert response.json() == {"cart": [error_messages.ERR_CART_EMPTY]}
+
+    def test_unavailable_product_writes_nothing(self, shopper, make_product):
+        client, user, address = shopper
+        shoe = make_product("shoe", "100.00")
+        add(client, (shoe, 1))
+        Product.objects.filter(pk=shoe.pk).update(is_active=False)
+
+        response = post_checkout(client, address)
+
+        assert response.status_code == 400
+        assert not Order.objects.exists()
+        assert Cart.objects.get(user=user).status == Cart.active
+
+    def test_used_up_discount_rolls_the_order_back(self, shopper, make_product, make_discount):
+        client, user, address = shopper
+        add(client, (make_product("shoe", "100.00"), 1))
+        discount = make_discount(type="fixed", usage_limit_total=1, used_count=1)
+        Cart.objects.filter(user=user).update(discount=discount)
+
+        response = post_checkout(client, address)
+
+        assert response.status_code == 400
+        assert response.json() == {"discount_code": [error_messages.ERR_DISCOUNT_USED_UP]}
+        assert not Order.objects.exists()
+        assert Cart.objects.get(user=user).status == Cart.active
+
+    @pytest.mark.parametrize("fields", [
+        {"min_purchase": "500.00"},
+        {"applies_to": "products", "traget_ids": [0]},
+        {"type": "free_shipping", "min_purchase": "500.00"},
+    ])
+    def test_discount_saving_nothing_is_not_used_up(self, shopper, make_product, make_discount, fields):
+        client, user, address = shopper
+        add(client, (make_product("shoe", "100.00"), 1))
+        discount = make_discount(usage_limit_total=1, **fields)
+        Cart.objects.filter(user=user).update(discount=discount)
+
+        response = post_checkout(client, address)
+
+        assert response.status_code == 400
+        assert response.json() == {"discount_code": [error_messages.ERR_DISCOUNT_NOT_APPLICABLE]}
+        assert not Order.objects.exists() and not DiscountUsage.objects.exists()
+        assert Discount.objects.get(pk=discount.pk).used_count == 0
+
+    def test_first_purchase_code_only_works_once(self, shopper, make_product, make_discount):
+        client, user, address = shopper
+        shoe = make_product("shoe", "100.00")
+        discount = make_discount(first_purchase_only=True)
+
+        add(client, (shoe, 1))
+        Cart.objects.filter(user=user, status=Cart.active).update(discount=discount)
+        assert post_checkout(client, address).status_code == 201
+
+        add(client, (shoe, 1))
+        Cart.objects.filter(user=user, status=Cart.active).update(discount=discount)
+        response = post_checkout(client, address)
+
+        assert response.status_code == 400
+        assert response.json() == {"discount_code": [error_messages.ERR_DISCOUNT_FIRST_PURCHASE]}
+        assert Order.objects.count() == 1
+        assert Discount.objects.get(pk=discount.pk).used_count == 1
+
+    def test_checks_out_from_the_database_while_redis_is_down(self, shopper, make_product, settings):
+        settings.CART_STORE = "redis"
+        # nothing listens there, every Redis call fails at once
+        settings.CART_REDIS_URL = "redis://127.0.0.1:1/0"
+        client, user, address = shopper
+        add(client, (make_product("shoe", "100.00"), 2))
+
+        response = post_checkout(client, address)
+
+        assert response.status_code == 201
+        assert Order.objects.get(pk=response.json()["id"]).total_amount == Decimal("200.00")
+
+    def test_address_must_be_the_users(self, shopper, make_authorized_client, make_address, make_product):
+        client, _, _ = shopper
+        _, other = make_authorized_client("09120000000")
+        foreign = make_address(other)
+        add(client, (make_product("shoe", "100.00"), 1))
+
+        response = post_checkout(client, foreign)
+
+        assert response.status_code == 400
+        assert "shipping_address" in response.json()
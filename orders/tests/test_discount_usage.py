@@ -0,0 +1,129 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+import pytest
+from accounts.models import Role, User
+from orders.models import DiscountUsage, Order
+from orders.services import redeem_discount
+from products.discounts import active_discounts, discount_by_code
+from products.models import Discount
+from utils import error_messages
+
+
+@pytest.fixture
+def make_order(make_address):
+    role = Role.objects.create(name="Test", permissions="{}")
+
+    def _make(phone_number, user=None):
+        user = user or User.objects.create_user(phone_number=phone_number, role=role, password="something")
+        return Order.objects.create(user=user, shipping_address=make_address(user), order_number=f"O-{phone_number}")
+
+    return _make
+
+
+def redeem(discount, order):
+    return redeem_discount(discount, order.user, order, "10.00")
+
+
+def error_of(excinfo):
+    return excinfo.value.detail["discount_code"][0]
+
+
+@pytest.mark.django_db
+class TestRedeemDiscount:
+
+    def test_redemption_counts_the_use(self, make_discount, make_order):
+        discount = make_discount(usage_limit_total=2)
+        order = make_order("09120000001")
+
+        usage = redeem(discount, order)
+
+        discount.refresh_from_db()
+        assert discount.used_count == 1
+        assert (usage.discount_id, usage.user_id, usage.order_id) == (discount.pk, order.user_id, order.pk)
+
+    def test_total_limit_is_enforced(self, make_discount, make_order):
+        discount = make_discount(usage_limit_total=1)
+        redeem(discount, make_order("09120000001"))
+
+        with pytest.raises(ValidationError) as excinfo:
+            redeem(discount, make_order("09120000002"))
+
+        assert error_of(excinfo) == error_messages.ERR_DISCOUNT_USED_UP
+        assert Discount.objects.get(pk=discount.pk).used_count == 1
+
+    def test_used_up_code_stops_being_live(self, make_discount, make_order, django_capture_on_commit_callbacks):
+        discount = make_discount(usage_limit_total=2)
+        assert discount_by_code("SALE").is_live()
+        assert [live.pk for live in active_discounts()] == [discount.pk]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            redeem(discount, make_order("09120000001"))
+        assert discount_by_code("SALE").is_live()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            redeem(discount, make_order("09120000002"))
+        assert not discount_by_code("SALE").is_live()
+        assert active_discounts()[0].used_count == 2
+
+    def test_per_user_limit_gives_the_claimed_use_back(self, make_discount, make_order):
+        discount = make_discount(usage_limit_total=10, usage_limit_per_user=1)
+        order = make_order("09120000001")
+        redeem(discount, order)
+
+        with pytest.raises(ValidationError) as excinfo:
+            redeem(discount, order)
+
+        assert error_of(excinfo) == error_messages.ERR_DISCOUNT_USER_LIMIT
+        assert Discount.objects.get(pk=discount.pk).used_count == 1
+        assert DiscountUsage.objects.count() == 1
+
+    @pytest.mark.parametrize("fields", [
+        {"is_active": False},
+        {"ends_at": timezone.now() - timedelta(hours=1)},
+    ])
+    def test_inactive_or_expired_code_is_rejected(self, make_discount, make_order, fields):
+        discount = make_discount(**fields)
+
+        with pytest.raises(ValidationError) as excinfo:
+            redeem(discount, make_order("09120000001"))
+
+        assert error_of(excinfo) == error_messages.ERR_INVALID_DISCOUNT_CODE
+        assert Discount.objects.get(pk=discount.pk).used_count == 0
+
+
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="needs row locking of PostgreSQL")
+@pytest.mark.django_db(transaction=True)
+class TestConcurrentRedemption:
+
+    def redeem_all(self, discount, orders):
+        def attempt(order):
+            try:
+                with transaction.atomic():
+                    redeem(discount, order)
+                return True
+            except ValidationError:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            return sum(pool.map(attempt, orders))
+
+    def test_limit_holds_under_parallel_redemptions(self, make_discount, make_order):
+        discount = make_discount(usage_limit_total=50)
+        orders = [make_order(f"0912{n:07d}") for n in range(300)]
+
+        assert self.redeem_all(discount, orders) == 50
+        assert Discount.objects.get(pk=discount.pk).used_count == 50
+        assert DiscountUsage.objects.filter(discount=discount).count() == 50
+
+    def test_per_user_limit_holds_under_parallel_redemptions(self, make_discount, make_order):
+        discount = make_discount(usage_limit_per_user=2)
+        first = make_order("09120000000")
+        orders = [first] + [make_order(f"0912{n:07d}", user=first.user) for n in range(1, 100)]
+
+        assert self.redeem_all(discount, orders) == 2
+        assert Discount.objects.get(pk=discount.pk).used_count == 2
@@ -0,0 +1,104 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from orders import identifiers
+from orders.checks import check_id_worker_id
+from orders.identifiers import IdGenerator, decode, encode, timestamp_ms
+from orders.models import Order, Payment
+
+
+class FrozenClock(IdGenerator):
+
+    def __init__(self, worker_id, ms):
+        super().__init__(worker_id)
+        self.ms = ms
+
+    def now_ms(self):
+        return self.ms
+
+
+def test_ids_only_grow_and_sort_as_strings():
+    generator = IdGenerator(7)
+
+    ids = [generator.next_id() for _ in range(20000)]
+
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    assert [encode(value) for value in ids] == sorted(encode(value) for value in ids)
+
+
+def test_threads_never_share_an_id():
+    generator = IdGenerator(1)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        ids = [value for chunk in pool.map(lambda _: [generator.next_id() for _ in range(2000)], range(8)) for value in chunk]
+
+    assert len(set(ids)) == len(ids)
+
+
+def test_full_millisecond_borrows_the_next():
+    generator = FrozenClock(3, 1000)
+
+    ids = [generator.next_id() for _ in range(4096)]
+
+    assert len(set(ids)) == len(ids) and ids == sorted(ids)
+    assert timestamp_ms(ids[-1]) - timestamp_ms(ids[0]) >= 1
+
+
+def test_clock_going_back_keeps_ids_growing():
+    generator = FrozenClock(3, 5000)
+    before = generator.next_id()
+
+    generator.ms = 4000
+    after = generator.next_id()
+
+    assert after > before
+    assert timestamp_ms(after) == timestamp_ms(before)
+
+
+def test_worker_id_is_part_of_the_id():
+    one, two = FrozenClock(1, 1000), FrozenClock(2, 1000)
+
+    assert one.next_id() != two.next_id()
+    with pytest.raises(ValueError):
+        IdGenerator(1024)
+
+
+def test_encoding_is_readable_and_forgiving():
+    value = IdGenerator(5).next_id()
+    text = encode(value)
+
+    assert len(text) == 13 and not set(text) & set("ILOU")
+    assert decode(text) == value
+    assert decode(f"{text[:6]}-{text[6:]}".lower()) == value
+    assert decode("O1") == decode("ol") == 1
+
+
+def test_worker_id_comes_from_settings(settings):
+    settings.ID_WORKER_ID = 42
+
+    assert identifiers.generator().worker_id == 42
+
+
+def test_worker_id_is_required_outside_debug(settings):
+    settings.ID_WORKER_ID = None
+
+    assert [error.id for error in check_id_worker_id(None)] == ["orders.E001"]
+    with pytest.raises(ImproperlyConfigured):
+        identifiers.generator()
+
+    settings.DEBUG = True
+    assert check_id_worker_id(None) == []
+    assert identifiers.generator().worker_id == identifiers.default_worker_id()
+
+
+@pytest.mark.django_db
+def test_orders_and_payments_get_their_numbers(make_authorized_client, make_address):
+    _, user = make_authorized_client("09140329711")
+    address = make_address(user)
+
+    first = Order.objects.create(user=user, shipping_address=address)
+    second = Order.objects.create(user=user, shipping_address=address)
+    payment = Payment.objects.create(order=first, payment_method="card")
+
+    assert len(first.order_number) == 13
+    assert first.order_number < second.order_number < payment.transaction_id
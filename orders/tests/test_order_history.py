@@ -0,0 +1,93 @@
+from datetime import timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+import pytest
+from orders.models import Order, OrderItem, Payment, Shipment
+
+
+@pytest.fixture
+def make_orders(make_product, make_address):
+    product = make_product("shoe", "100.00")
+
+    def _make(user, count):
+        address = make_address(user)
+        start = timezone.now() - timedelta(days=count)
+        orders = []
+        for n in range(count):
+            order = Order.objects.create(user=user, shipping_address=address, created_at=start + timedelta(days=n))
+            for _ in range(n % 3 + 1):
+                OrderItem.objects.create(order=order, product=product, product_name=product.name, unit_price="100.00")
+            Payment.objects.create(order=order, payment_method="card", amount="100.00")
+            Shipment.objects.create(order=order)
+            orders.append(order)
+        return orders
+
+    return _make
+
+
+def list_orders(client, url=None, **params):
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url or reverse("orders-me"), params)
+    assert response.status_code == 200
+    return response.json(), len(ctx.captured_queries)
+
+
+@pytest.mark.django_db
+class TestOrderHistory:
+
+    def test_lists_own_orders_newest_first_with_relations(self, make_authorized_client, make_orders):
+        client, user = make_authorized_client("09140329711")
+        _, other = make_authorized_client("09120000000")
+        orders = make_orders(user, 3)
+        make_orders(other, 1)
+
+        data, _ = list_orders(client)
+
+        assert [order["id"] for order in data["results"]] == [order.pk for order in reversed(orders)]
+        newest = data["results"][0]
+        assert (len(newest["items"]), len(newest["payments"]), len(newest["shipments"])) == (3, 1, 1)
+        assert newest["payments"][0]["transaction_id"]
+
+    def test_query_count_does_not_grow_with_the_page(self, make_authorized_client, make_orders):
+        client, user = make_authorized_client("09140329711")
+        make_orders(user, 2)
+        _, few = list_orders(client)
+
+        make_orders(user, 6)
+        data, many = list_orders(client)
+
+        assert len(data["results"]) == 8
+        assert few == many
+
+    def test_keyset_pages_walk_every_order_once(self, make_authorized_client, make_orders):
+        client, user = make_authorized_client("09140329711")
+        orders = make_orders(user, 5)
+
+        seen, url, params = [], None, {"page_size": 2}
+        while True:
+            data, _ = list_orders(client, url, **params)
+            seen += [order["id"] for order in data["results"]]
+            if not data["next"]:
+                break
+            url, params = data["next"], {}
+
+        assert seen == [order.pk for order in reversed(orders)]
+
+    def test_summary_mode_is_one_query(self, make_authorized_client, make_orders):
+        client, user = make_authorized_client("09140329711")
+        make_orders(user, 4)
+        _, full = list_orders(client)
+
+        data, summary = list_orders(client, view="summary")
+
+        assert set(data["results"][0]) == {
+            "id", "order_number", "status", "payment_status", "total_amount", "created_at", "item_count",
+        }
+        assert [order["item_count"] for order in data["results"]] == [1, 3, 2, 1]
+        # no prefetches of items, payments and shipments
+        assert summary == full - 3
+
+    def test_requires_authentication(self, api_client):
+        assert api_client.get(reverse("orders-me")).status_code == 401
@@ -1,3 +1,8 @@
+from django.urls import path
+from . import views
+
+
 urlpatterns = [
-    
-]
\ No newline at end of file
+    path("orders/checkout/", views.CheckoutView.as_view(), name="orders-checkout"),
+    path("orders/me/", views.MyOrdersView.as_view(), name="orders-me"),
+]
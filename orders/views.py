@@ -1,3 +1,71 @@
-from django.shortcuts import render
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from rest_framework import generics, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from orders.models import Order, OrderItem, Payment, Shipment
+from orders.pagination import OrderPagination
+from orders.serializers import (
+    CheckoutSerializer,
+    OrderHistorySerializer,
+    OrderSerializer,
+    OrderSummarySerializer,
+)
+from orders.services import checkout
 
-# Create your views here.
+
+def is_summary(request):
+    return request.query_params.get("view") == "summary"
+
+
+def order_history(user, summary=False):
+    """
+    The user's orders. In full they come with their items, payments and
+    shipments, one prefetch query each whatever the page size. A summary
+    reads the order columns a list screen shows and counts the items.
+    """
+
+    orders = Order.objects.filter(user=user)
+    if summary:
+        # a subquery rather than a join, only the orders of the page are counted
+        item_count = OrderItem.objects.filter(order=OuterRef("pk")).order_by().values("order").annotate(n=Count("pk"))
+        return orders.only(*(name for name in OrderSummarySerializer.Meta.fields if name != "item_count")).annotate(
+            item_count=Coalesce(Subquery(item_count.values("n")), 0)
+        )
+
+    return orders.prefetch_related(
+        Prefetch("items", queryset=OrderItem.objects.order_by("pk")),
+        Prefetch("payments", queryset=Payment.objects.order_by("pk")),
+        Prefetch("shipments", queryset=Shipment.objects.order_by("pk")),
+    )
+
+
+class CheckoutView(APIView):
+    permission_classes = [
+        IsAuthenticated,
+    ]
+
+    def post(self, request, format="json"):
+        """Turn the user's cart into an order, see orders.services.checkout."""
+
+        serializer = CheckoutSerializer(data=request.data, context={"request": request})
+        serializer.is_valid(raise_exception=True)
+
+        order = checkout(request.user, **serializer.validated_data)
+        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+
+
+class MyOrdersView(generics.ListAPIView):
+    """The user's orders, newest first. ``?view=summary`` for list screens."""
+
+    permission_classes = [
+        IsAuthenticated,
+    ]
+    pagination_class = OrderPagination
+
+    def get_queryset(self):
+        return order_history(self.request.user, summary=is_summary(self.request))
+
+    def get_serializer_class(self):
+        return OrderSummarySerializer if is_summary(self.request) else OrderHistorySerializer
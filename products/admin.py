@@ -1,6 +1,6 @@
 from django.contrib import admin
-from .models import Cart, Category, ProductImage, Product
+from .models import Cart, CartItem, Category, ProductImage, Product
 
-allModels = [Product, ProductImage, Category, Cart]
+allModels = [Product, ProductImage, Category, Cart, CartItem]
 
 admin.site.register(allModels)
@@ -0,0 +1,91 @@
+import hashlib
+import logging
+from functools import lru_cache
+
+import redis
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# bump when a payload changes shape without its field list changing
+PAYLOAD_VERSION = 1
+DETAIL_TIMEOUT = 60 * 15
+
+
+@lru_cache(maxsize=None)
+def serializer_version(serializer_class):
+    """
+    Fingerprint of the serializer's fields, part of every cache key so a
+    deploy with a different payload shape never reads the old entries.
+    """
+
+    fields = serializer_class().fields
+    shape = ",".join(f"{name}:{type(field).__name__}" for name, field in sorted(fields.items()))
+    return hashlib.sha1(f"{PAYLOAD_VERSION}|{shape}".encode()).hexdigest()[:12]
+
+
+def detail_key(model, pk, serializer_class):
+    return f"products:{model._meta.model_name}:{serializer_version(serializer_class)}:{pk}"
+
+
+def cached(key, timeout, build):
+    """
+    The cache entry at ``key``, built and stored on a miss. While the cache
+    is unavailable every request is built from the database.
+    """
+
+    try:
+        data = cache.get(key)
+    except redis.RedisError:
+        logger.warning("Cache unavailable, %s built from the database", key, exc_info=True)
+        return build()
+
+    if data is None:
+        data = build()
+        try:
+            cache.set(key, data, timeout)
+        except redis.RedisError:
+            logger.warning("Cache unavailable, %s not stored", key, exc_info=True)
+
+    return data
+
+
+def get_detail(model, pk, serializer_class, build):
+    """Return the cached payload of one object, calling ``build()`` on a miss."""
+
+    try:
+        # "01" and "1" are the same row, the key must be too
+        pk = model._meta.pk.to_python(pk)
+    except ValidationError:
+        return build()
+
+    return cached(detail_key(model, pk, serializer_class), DETAIL_TIMEOUT, lambda: dict(build()))
+
+
+def invalidate_detail(model, pk, serializer_class):
+    invalidate_details(model, [pk], serializer_class)
+
+
+def invalidate_details(model, pks, serializer_class):
+    keys = [detail_key(model, pk, serializer_class) for pk in pks]
+    if not keys:
+        return
+
+    cache.delete_many(keys)
+    # and again after commit, a read racing the transaction may have cached the old row
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+CATEGORY_TREE_KEY = f"products:category-tree:{PAYLOAD_VERSION}"
+CATEGORY_TREE_TIMEOUT = 60 * 60
+
+
+def get_category_tree(build):
+    return cached(CATEGORY_TREE_KEY, CATEGORY_TREE_TIMEOUT, build)
+
+
+def invalidate_category_tree():
+    cache.delete(CATEGORY_TREE_KEY)
+    transaction.on_commit(lambda: cache.delete(CATEGORY_TREE_KEY))
@@ -0,0 +1,440 @@
+import json
+import logging
+import time
+from decimal import Decimal
+
+import redis
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import F, prefetch_related_objects
+from django.dispatch import receiver
+from rest_framework.exceptions import NotFound, ValidationError
+
+from products.carts import active_cart, add_cart_items, cart_lines, remove_cart_item, update_cart_item_quantity
+from products.models import Cart, CartItem, Product
+from products.pricing import recompute_totals
+from products.serializers import CartItemSerializer, CartProductSerializer, CartSerializer
+from utils import error_messages
+from utils.conditional import PreconditionFailed
+
+logger = logging.getLogger(__name__)
+
+# set of user ids whose Redis cart has changes not yet written to the database
+DIRTY_KEY = "carts:dirty"
+
+# creates the hash from the database copy unless another request already did,
+# so a line changed in the meantime is never overwritten or resurrected
+LOAD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+"""
+
+# ARGV: product id, quantity or delta, "1" for a delta, expected version or "", ttl.
+# Returns the new version, or -1 (no such line), -2 (version mismatch), -3 (below one)
+UPDATE_QUANTITY_SCRIPT = """
+local quantity = redis.call('HGET', KEYS[1], 'q:' .. ARGV[1])
+if not quantity then
+    return -1
+end
+local version = tonumber(redis.call('HGET', KEYS[1], 'v:' .. ARGV[1]) or '1')
+if ARGV[4] ~= '' and tonumber(ARGV[4]) ~= version then
+    return -2
+end
+local new = tonumber(ARGV[2])
+if ARGV[3] == '1' then
+    new = tonumber(quantity) + new
+end
+if new < 1 then
+    return -3
+end
+redis.call('HSET', KEYS[1], 'q:' .. ARGV[1], new, 'v:' .. ARGV[1], version + 1)
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return version + 1
+"""
+
+# KEYS[1] is the hash, ARGV the ``held_as`` of the user's active cart and the ttl.
+# Keeps a hash loaded from that cart at its current revision and drops any
+# other one, returns whether the hash was kept
+CHECK_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'cart') == ARGV[1] then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+redis.call('DEL', KEYS[1])
+return 0
+"""
+
+# only refreshes a cart that is already held in Redis
+SET_META_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('HSET', KEYS[1], 'meta', ARGV[1])
+end
+"""
+
+
+def cart_key(user_id):
+    return f"cart:{user_id}"
+
+
+def quantity_field(product_id):
+    return f"q:{product_id}"
+
+
+def price_field(product_id):
+    return f"p:{product_id}"
+
+
+def product_field(product_id):
+    return f"d:{product_id}"
+
+
+def version_field(product_id):
+    return f"v:{product_id}"
+
+
+def line_fields(product_id):
+    return quantity_field(product_id), price_field(product_id), product_field(product_id), version_field(product_id)
+
+
+def held_as(cart):
+    """The ``cart`` field of a hash loaded from ``cart`` in its current state."""
+
+    return f"{cart.pk}:{cart.store_revision}"
+
+
+def cart_meta(cart):
+    data = CartSerializer(cart).data
+    data.pop("items")
+    return json.dumps(data)
+
+
+def format_price(price):
+    return CartItemSerializer().fields["unit_price_snapshot"].to_representation(Decimal(price))
+
+
+def lines_of(fields):
+    """``{product_id: (quantity, unit price, version)}`` of a cart hash."""
+
+    return {
+        int(name[2:]): (int(value), fields[price_field(name[2:])], int(fields.get(version_field(name[2:]), 1)))
+        for name, value in fields.items()
+        if name.startswith("q:")
+    }
+
+
+def cart_payload(fields):
+    payload = json.loads(fields["meta"])
+    payload["items"] = [
+        {
+            "product_id": product_id,
+            "product": json.loads(fields[product_field(product_id)]),
+            "quantity": quantity,
+            "version": version,
+            "unit_price_snapshot": format_price(price),
+        }
+        for product_id, (quantity, price, version) in sorted(lines_of(fields).items())
+    ]
+    return payload
+
+
+def serialized_cart(cart):
+    prefetch_related_objects([cart], cart_lines())
+    return CartSerializer(cart).data
+
+
+class DatabaseCartStore:
+    """Carts read and written straight from the ``Cart`` / ``CartItem`` tables."""
+
+    def load(self, user):
+        return serialized_cart(active_cart(user))
+
+    def add(self, user, quantities, products):
+        cart = active_cart(user)
+        add_cart_items(cart, quantities, {pk: product.price for pk, product in products.items()})
+        return serialized_cart(cart)
+
+    def update_quantity(self, user, product_id, quantity=None, delta=None, expected_version=None):
+        cart = active_cart(user)
+        update_cart_item_quantity(cart, product_id, quantity, delta, expected_version)
+        return serialized_cart(cart)
+
+    def remove(self, user, product_id):
+        cart = active_cart(user)
+        if not remove_cart_item(cart, product_id):
+            return None
+        return serialized_cart(cart)
+
+    # nothing is held outside the database
+    def persist(self, user_id):
+        pass
+
+    def persist_dirty(self, batch_size=100):
+        return 0
+
+    def refresh(self, cart):
+        pass
+
+    def forget(self, user_id):
+        pass
+
+
+class RedisCartStore:
+    """
+    Active carts held as Redis hashes, one per user: the serialized cart in
+    ``meta`` and a ``q:<product id>`` / ``p:<product id>`` quantity and price
+    field per line, so every line change is one atomic hash update.
+
+    Changed carts are written back to the database by ``persist`` (on
+    checkout) and ``persist_dirty`` (the ``persist_carts`` command), which
+    also recomputes their totals, the cart totals served from Redis are the
+    ones of the last persist.
+
+    While Redis is unreachable requests are served from the database
+    instead. A change made there bumps the cart's ``store_revision``, and
+    a hash records the cart and revision it was loaded from, so any worker
+    drops a Redis copy that no longer matches rather than serving it or
+    writing it back over the newer lines.
+    """
+
+    def __init__(self, url, ttl, retry_after):
+        self.client = redis.Redis.from_url(
+            url, decode_responses=True, socket_timeout=0.5, socket_connect_timeout=0.5
+        )
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self.database = DatabaseCartStore()
+        self.down_until = 0
+
+        self.check_script = self.client.register_script(CHECK_SCRIPT)
+        self.load_script = self.client.register_script(LOAD_SCRIPT)
+        self.update_quantity_script = self.client.register_script(UPDATE_QUANTITY_SCRIPT)
+        self.set_meta_script = self.client.register_script(SET_META_SCRIPT)
+
+    def call(self, operation, fallback, user_id, writes=True):
+        """Run ``operation``, or ``fallback`` against the database when Redis is unavailable."""
+
+        if time.monotonic() >= self.down_until:
+            try:
+                return operation()
+            except redis.RedisError:
+                logger.warning("Cart store unavailable, falling back to the database", exc_info=True)
+                self.down_until = time.monotonic() + self.retry_after
+
+        result = fallback()
+        if writes:
+            # after the change, a Redis copy loaded before it no longer matches the
+            # database and one loaded in between is only loaded again
+            Cart.objects.filter(user_id=user_id, status=Cart.active).update(store_revision=F("store_revision") + 1)
+        return result
+
+    def ensure_loaded(self, user):
+        key = cart_key(user.pk)
+        cart = active_cart(user)
+        if self.check_script(keys=[key], args=[held_as(cart), self.ttl]):
+            return key
+
+        prefetch_related_objects([cart], cart_lines())
+
+        fields = {"meta": cart_meta(cart), "cart": held_as(cart)}
+        for line in cart.items.all():
+            quantity, price, product, version = line_fields(line.product_id)
+            fields[quantity] = line.quantity
+            fields[price] = str(line.unit_price_snapshot)
+            fields[product] = json.dumps(CartProductSerializer(line.product).data)
+            fields[version] = line.version
+
+        self.load_script(keys=[key], args=[self.ttl, *(value for pair in fields.items() for value in pair)])
+        return key
+
+    def payload(self, key):
+        return cart_payload(self.client.hgetall(key))
+
+    def load(self, user):
+        return self.call(
+            lambda: self.payload(self.ensure_loaded(user)),
+            lambda: self.database.load(user),
+            user.pk,
+            writes=False,
+        )
+
+    def add(self, user, quantities, products):
+        def operation():
+            key = self.ensure_loaded(user)
+            pipe = self.client.pipeline(transaction=True)
+            for product_id, quantity in quantities.items():
+                product = products[product_id]
+                pipe.hincrby(key, quantity_field(product_id), quantity)
+                # a new line starts at version 1 like a new row
+                pipe.hsetnx(key, version_field(product_id), 0)
+                pipe.hincrby(key, version_field(product_id), 1)
+                pipe.hset(key, mapping={
+                    price_field(product_id): str(product.price),
+                    product_field(product_id): json.dumps(CartProductSerializer(product).data),
+                })
+            pipe.expire(key, self.ttl)
+            pipe.sadd(DIRTY_KEY, user.pk)
+            pipe.execute()
+            return self.payload(key)
+
+        return self.call(operation, lambda: self.database.add(user, quantities, products), user.pk)
+
+    def update_quantity(self, user, product_id, quantity=None, delta=None, expected_version=None):
+        def operation():
+            key = self.ensure_loaded(user)
+            version = self.update_quantity_script(
+                keys=[key],
+                args=[
+                    product_id, quantity if delta is None else delta, int(delta is not None),
+                    "" if expected_version is None else expected_version, self.ttl,
+                ],
+            )
+            if version == -1:
+                raise NotFound("Item not found.")
+            if version == -2:
+                raise PreconditionFailed(error_messages.ERR_CART_ITEM_CHANGED)
+            if version == -3:
+                raise ValidationError({"delta": [error_messages.ERR_INVALID_QUANTITY]})
+
+            self.client.sadd(DIRTY_KEY, user.pk)
+            return self.payload(key)
+
+        return self.call(
+            operation,
+            lambda: self.database.update_quantity(user, product_id, quantity, delta, expected_version),
+            user.pk,
+        )
+
+    def remove(self, user, product_id):
+        def operation():
+            key = self.ensure_loaded(user)
+            if not self.client.hdel(key, *line_fields(product_id)):
+                return None
+            self.client.sadd(DIRTY_KEY, user.pk)
+            return self.payload(key)
+
+        return self.call(operation, lambda: self.database.remove(user, product_id), user.pk)
+
+    def persist(self, user_id):
+        """
+        Write the Redis copy of a user's cart to the database now, e.g.
+        before checkout. While Redis is unavailable the database copy is
+        left as it is.
+        """
+
+        def operation():
+            try:
+                self.client.srem(DIRTY_KEY, user_id)
+                self.write(user_id)
+            except Exception:
+                self.requeue([user_id])
+                raise
+
+        self.call(operation, lambda: None, user_id, writes=False)
+
+    def persist_dirty(self, batch_size=100):
+        """Write every changed cart to the database, returns how many were written."""
+
+        written = 0
+        failed = []
+        while user_ids := self.client.spop(DIRTY_KEY, batch_size):
+            for user_id in user_ids:
+                try:
+                    self.write(user_id)
+                    written += 1
+                except Exception:
+                    logger.exception("Could not persist the cart of user %s", user_id)
+                    failed.append(user_id)
+
+        # queued again for the next run
+        self.requeue(failed)
+        return written
+
+    def requeue(self, user_ids):
+        if user_ids:
+            try:
+                self.client.sadd(DIRTY_KEY, *user_ids)
+            except redis.RedisError:
+                logger.warning("Cart store unavailable, carts %s not requeued", user_ids, exc_info=True)
+
+    def write(self, user_id):
+        key = cart_key(user_id)
+        if not self.client.exists(key):
+            return
+
+        with transaction.atomic():
+            # one writer per cart, so an older snapshot never lands after a newer one.
+            # A hash of a cart checked out or expired meanwhile, e.g. while Redis
+            # was down, is not the active cart's and is dropped
+            cart = Cart.objects.select_for_update().filter(user_id=user_id, status=Cart.active).first()
+            if not self.check_script(keys=[key], args=["" if cart is None else held_as(cart), self.ttl]):
+                return
+
+            cart_id = cart.pk
+
+            lines = lines_of(self.client.hgetall(key))
+            existing = set(Product.objects.filter(pk__in=lines).values_list("pk", flat=True))
+
+            CartItem.objects.filter(cart_id=cart_id).exclude(product_id__in=existing).delete()
+            CartItem.objects.bulk_create(
+                [
+                    CartItem(
+                        cart_id=cart_id, product_id=product_id, quantity=quantity,
+                        version=version, unit_price_snapshot=Decimal(price),
+                    )
+                    for product_id, (quantity, price, version) in lines.items()
+                    if product_id in existing
+                ],
+                update_conflicts=True,
+                unique_fields=["cart", "product"],
+                update_fields=["quantity", "version", "unit_price_snapshot", "updated_at"],
+            )
+            # the Redis copy has no totals, they are brought up to date here
+            recompute_totals([cart_id])
+
+        self.refresh(Cart.objects.get(pk=cart_id))
+
+    def refresh(self, cart):
+        """Update the cached cart fields of a cart held in Redis after it was saved."""
+
+        try:
+            self.set_meta_script(keys=[cart_key(cart.user_id)], args=[cart_meta(cart)])
+        except redis.RedisError:
+            logger.warning("Cart store unavailable, cart %s not refreshed", cart.pk, exc_info=True)
+
+    def forget(self, user_id):
+        """Drop a user's cart from Redis, e.g. after it was deleted."""
+
+        try:
+            self.client.delete(cart_key(user_id))
+            self.client.srem(DIRTY_KEY, user_id)
+        except redis.RedisError:
+            logger.warning("Cart store unavailable, cart of user %s not dropped", user_id, exc_info=True)
+
+
+_store = None
+
+
+def cart_store():
+    """The configured store, ``settings.CART_STORE`` is ``"database"`` or ``"redis"``."""
+
+    global _store
+    if _store is None:
+        if settings.CART_STORE == "redis":
+            _store = RedisCartStore(
+                settings.CART_REDIS_URL,
+                ttl=settings.CART_REDIS_TTL_SECONDS,
+                retry_after=settings.CART_REDIS_RETRY_SECONDS,
+            )
+        else:
+            _store = DatabaseCartStore()
+    return _store
+
+
+@receiver(setting_changed)
+def reset_cart_store(setting, **kwargs):
+    global _store
+    if setting.startswith("CART_"):
+        _store = None
@@ -0,0 +1,186 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import F, Prefetch
+from django.db.models.functions import Now
+from django.utils import timezone
+from rest_framework.exceptions import NotFound, ValidationError
+
+from products.models import Cart, CartItem, Product
+from products.pricing import recompute_totals, track_totals
+from utils import error_messages
+from utils.conditional import PreconditionFailed
+
+# lifetime of a new cart
+CART_LIFETIME = timedelta(days=7)
+
+
+def active_cart(user):
+    """
+    The user's active cart, created when there is none, in one round trip.
+    The existing cart is read first and the INSERT only runs when there is
+    none, so reading a cart never draws from the id sequence. The partial
+    unique constraint on active carts makes concurrent first requests agree
+    on a single cart.
+    """
+
+    table = connection.ops.quote_name(Cart._meta.db_table)
+    fields = [field for field in Cart._meta.concrete_fields if not field.primary_key]
+    columns = ", ".join(connection.ops.quote_name(field.column) for field in Cart._meta.concrete_fields)
+
+    cart = Cart(user=user, expires_at=timezone.now() + CART_LIFETIME)
+    params = [field.get_db_prep_save(field.pre_save(cart, True), connection) for field in fields]
+
+    select = f"SELECT {columns} FROM {table} WHERE user_id = %s AND status = '{Cart.active}'"
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH existing AS ({select}),
+            inserted AS (
+                INSERT INTO {table} ({", ".join(connection.ops.quote_name(field.column) for field in fields)})
+                SELECT {", ".join(["%s"] * len(fields))} WHERE NOT EXISTS (SELECT 1 FROM existing)
+                ON CONFLICT (user_id) WHERE status = '{Cart.active}' DO NOTHING
+                RETURNING {columns}
+            )
+            SELECT * FROM existing UNION ALL SELECT * FROM inserted LIMIT 1
+            """,
+            [user.pk, *params],
+        )
+        row = cursor.fetchone()
+
+        if row is None:
+            # a concurrent request created it after this statement's snapshot was taken
+            cursor.execute(select, [user.pk])
+            row = cursor.fetchone()
+
+    return cart_from_row(row)
+
+
+def cart_from_row(row):
+    values = []
+    for field, value in zip(Cart._meta.concrete_fields, row):
+        column = field.get_col(Cart._meta.db_table)
+        for converter in connection.ops.get_db_converters(column) + field.get_db_converters(connection):
+            value = converter(value, column, connection)
+        values.append(value)
+    return Cart.from_db(connection.alias, [field.attname for field in Cart._meta.concrete_fields], values)
+
+
+def cart_lines():
+    """Prefetch of cart lines with the product each one embeds."""
+
+    lines = CartItem.objects.select_related("product").defer("product__description", "product__search_vector")
+    return Prefetch("items", queryset=lines.order_by("pk"))
+
+
+def payload_lines(data):
+    """
+    ``(product_id, quantity, unit price, category path)`` rows of a cart
+    payload as the stores return it (see products.cart_store), for pricing
+    it against discounts. The category paths take one query.
+    """
+
+    items = data["items"]
+    paths = dict(Product.objects.filter(pk__in=[item["product_id"] for item in items]).values_list("pk", "category__path"))
+    return [
+        (item["product_id"], item["quantity"], Decimal(item["unit_price_snapshot"]), paths.get(item["product_id"]))
+        for item in items
+    ]
+
+
+def load_cart_products(product_ids):
+    """The products being added to a cart with one query, by id, with what validation and the snapshot need."""
+
+    return Product.objects.only("pk", "name", "slug", "brand", "price", "is_active").in_bulk(product_ids)
+
+
+def add_cart_items(cart, quantities, prices):
+    """
+    Add ``quantities`` (product id -> quantity) to ``cart``, snapshotting
+    ``prices`` (product id -> unit price). Every line is one upsert row, an
+    existing line has the quantity added to it in the database, so
+    concurrent adds of the same product are never lost. The cart totals
+    move by what the added lines change (see products.pricing).
+    """
+
+    if not quantities:
+        return
+
+    table = CartItem._meta.db_table
+    columns = ("cart", "product", "quantity", "version", "unit_price_snapshot", "created_at", "updated_at")
+    fields = [CartItem._meta.get_field(name) for name in columns]
+
+    now = timezone.now()
+    params = [
+        field.get_db_prep_save(value, connection)
+        for product_id, quantity in quantities.items()
+        for field, value in zip(fields, (cart.pk, product_id, quantity, 1, prices[product_id], now, now))
+    ]
+    row = "(%s)" % ", ".join(["%s"] * len(fields))
+
+    # ON CONFLICT ... DO UPDATE is understood by PostgreSQL and SQLite alike
+    with track_totals(cart, quantities), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} ({", ".join(field.column for field in fields)})
+            VALUES {", ".join([row] * len(quantities))}
+            ON CONFLICT (cart_id, product_id) DO UPDATE SET
+                quantity = {table}.quantity + EXCLUDED.quantity,
+                version = {table}.version + 1,
+                unit_price_snapshot = EXCLUDED.unit_price_snapshot,
+                updated_at = EXCLUDED.updated_at
+            """,
+            params,
+        )
+
+
+def update_cart_item_quantity(cart, product_id, quantity=None, delta=None, expected_version=None):
+    """
+    Set a line's quantity to ``quantity`` or move it by ``delta`` with one
+    conditional UPDATE. With ``expected_version`` the line must still be at
+    that version, a concurrent change fails with ``PreconditionFailed``
+    instead of being waited for or overwritten.
+
+    Only the line is locked, the cart row is not, so changes to other lines
+    of the cart do not queue behind this one. The totals are recomputed
+    from the lines once the change is committed (see products.pricing), a
+    cart locked while its line is held would deadlock against adds and
+    reprices, which lock the cart before its lines.
+    """
+
+    lines = CartItem.objects.filter(cart=cart, product_id=product_id)
+
+    matching = lines if expected_version is None else lines.filter(version=expected_version)
+    if delta is not None:
+        # the line keeps at least one unit, removing it is a DELETE
+        matching = matching.filter(quantity__gte=1 - delta)
+        quantity = F("quantity") + delta
+
+    if matching.update(quantity=quantity, version=F("version") + 1, updated_at=Now()):
+        transaction.on_commit(lambda: refresh_totals(cart))
+        return
+
+    # nothing matched, the line tells why
+    version = lines.values_list("version", flat=True).first()
+    if version is None:
+        raise NotFound("Item not found.")
+    if expected_version is not None and version != expected_version:
+        raise PreconditionFailed(error_messages.ERR_CART_ITEM_CHANGED)
+    raise ValidationError({"delta": [error_messages.ERR_INVALID_QUANTITY]})
+
+
+def refresh_totals(cart):
+    """Recompute ``cart``'s totals from its lines and update it in place."""
+
+    recompute_totals([cart.pk])
+    cart.refresh_from_db(fields=Cart.MAINTAINED_FIELDS)
+
+
+def remove_cart_item(cart, product_id):
+    """Delete one line, returns False when the cart has no such line."""
+
+    with track_totals(cart, [product_id]):
+        deleted, _ = CartItem.objects.filter(cart=cart, product_id=product_id).delete()
+    return bool(deleted)
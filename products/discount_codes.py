@@ -0,0 +1,91 @@
+import secrets
+
+from django.db import connection, transaction
+from rest_framework.exceptions import ValidationError
+
+from products.models import Discount
+from utils import error_messages
+from utils.base32 import ALPHABET
+
+# 32 symbols, so a random byte modulo 32 picks each one with the same odds
+BYTE_TO_SYMBOL = bytes(ord(ALPHABET[byte % 32]) for byte in range(256))
+
+CODE_LENGTH = 10
+# random symbols a code may have, fewer are easy to guess
+MIN_CODE_LENGTH = 6
+MAX_CODE_LENGTH = 30
+CODE_CHUNK_SIZE = 5000
+
+# what a generated code takes over from its template
+TEMPLATE_FIELDS = (
+    "title", "description", "type", "value", "min_purchase", "max_discount", "usage_limit_per_user",
+    "applies_to", "traget_ids", "first_purchase_only", "starts_at", "ends_at",
+)
+
+
+def random_codes(count, prefix="", length=CODE_LENGTH):
+    """``count`` distinct random codes, ``prefix`` followed by ``length`` symbols of ``ALPHABET``."""
+
+    codes = set()
+    while len(codes) < count:
+        raw = secrets.token_bytes((count - len(codes)) * length).translate(BYTE_TO_SYMBOL).decode()
+        codes.update(prefix + raw[start:start + length] for start in range(0, len(raw), length))
+    return codes
+
+
+def generate_codes(template, count, prefix="", length=CODE_LENGTH, chunk_size=CODE_CHUNK_SIZE, progress=None):
+    """
+    Create ``count`` one-time discounts copying ``template``, each with a
+    new random code, ``chunk_size`` per statement. A code already taken is
+    left out of its chunk and the next chunk makes up for it, so nothing
+    is ever retried row by row. A chunk of only taken codes means the
+    prefix and length have few free codes left, generation stops there with
+    a ``ValidationError`` rather than looping, the codes created so far are
+    kept. ``progress(created, count)`` is called after every chunk.
+    Returns the number of codes created.
+    """
+
+    values = {name: getattr(template, name) for name in TEMPLATE_FIELDS}
+    values.update(template=template, usage_limit_total=1, is_active=True)
+    created = 0
+
+    while created < count:
+        inserted = insert_unnested(values, random_codes(min(chunk_size, count - created), prefix, length))
+        if not inserted:
+            raise ValidationError({"length": [error_messages.ERR_DISCOUNT_CODES_EXHAUSTED]})
+        created += inserted
+        if progress is not None:
+            progress(created, count)
+
+    return created
+
+
+def insert_unnested(values, codes):
+    """
+    One ``INSERT ... SELECT FROM unnest(codes)``: the template columns are
+    prepared once for the chunk rather than once per row, and
+    ``ON CONFLICT DO NOTHING`` skips taken codes. Returns the rows inserted.
+    """
+
+    prototype = Discount(**values)
+    fields = [field for field in Discount._meta.concrete_fields if not field.primary_key]
+    selected, params = [], []
+    for field in fields:
+        if field.name == "code":
+            selected.append("code")
+        else:
+            selected.append("%s")
+            params.append(field.get_db_prep_save(field.pre_save(prototype, True), connection))
+
+    table = connection.ops.quote_name(Discount._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} ({", ".join(connection.ops.quote_name(field.column) for field in fields)})
+            SELECT {", ".join(selected)} FROM unnest(%s::varchar[]) AS code
+            ON CONFLICT (code) DO NOTHING
+            """,
+            [*params, sorted(codes)],
+        )
+        return cursor.rowcount
+
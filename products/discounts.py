@@ -0,0 +1,365 @@
+import time
+import uuid
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from orders.models import DiscountUsage, Order
+from products.models import Discount
+
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+
+# bump when RULE_FIELDS changes
+RULE_VERSION = 3
+CODE_TIMEOUT = 60 * 15
+# unknown codes are remembered briefly, a new discount deletes the entry anyway
+MISSING_CODE_TIMEOUT = 60
+MISSING = "missing"
+
+# what a compiled rule is built from, also what the code cache stores
+RULE_FIELDS = (
+    "id", "code", "title", "type", "value", "min_purchase", "max_discount", "applies_to", "traget_ids",
+    "starts_at", "ends_at", "is_active", "usage_limit_total", "usage_limit_per_user", "used_count",
+    "first_purchase_only", "updated_at",
+)
+
+# changed when a discount is saved or deleted, every process reloads its active discounts
+ACTIVE_VERSION_KEY = f"products:discounts:active:{RULE_VERSION}"
+# seconds between two reads of ACTIVE_VERSION_KEY by one process
+ACTIVE_CHECK_SECONDS = 5
+
+# evaluators by (id, updated_at, used_count), a saved or used up discount gets a new key. A
+# redemption does not touch updated_at, see orders.services.redeem_discount
+MAX_COMPILED = 1024
+_compiled = {}
+
+
+class CompiledDiscount:
+    """
+    A discount rule read once into plain attributes, target ids as a
+    frozenset. Evaluating it against cart lines touches no model or
+    database.
+
+    ``amount`` prices what is in a cart. Whether a code can be used right
+    now (active, in its window, under its usage limit) is ``is_live``.
+    """
+
+    __slots__ = (
+        "pk", "code", "title", "type", "value", "min_purchase", "max_discount", "applies_to",
+        "target_ids", "starts_at", "ends_at", "is_active", "usage_limit_total", "usage_limit_per_user",
+        "used_count", "first_purchase_only",
+    )
+
+    def __init__(self, rule):
+        self.pk = rule["id"]
+        self.code = rule["code"]
+        self.title = rule["title"]
+        self.type = rule["type"]
+        self.value = Decimal(rule["value"])
+        self.min_purchase = Decimal(rule["min_purchase"])
+        self.max_discount = Decimal(rule["max_discount"])
+        self.applies_to = rule["applies_to"]
+        self.target_ids = target_ids(rule["traget_ids"])
+        self.starts_at = rule["starts_at"]
+        self.ends_at = rule["ends_at"]
+        self.is_active = rule["is_active"]
+        self.usage_limit_total = rule["usage_limit_total"]
+        self.usage_limit_per_user = rule["usage_limit_per_user"]
+        self.used_count = rule["used_count"]
+        self.first_purchase_only = rule["first_purchase_only"]
+
+    def is_live(self, now=None):
+        now = now or timezone.now()
+        return (
+            self.is_active
+            and self.starts_at <= now < self.ends_at
+            and (self.usage_limit_total is None or self.used_count < self.usage_limit_total)
+        )
+
+    def applies(self, product_id, category_path):
+        """Whether a line of the given product is covered."""
+
+        if self.applies_to == "products":
+            return product_id in self.target_ids
+        if self.applies_to == "categories":
+            # a category target covers its whole subtree, the path lists its ancestors
+            return bool(category_path) and not self.target_ids.isdisjoint(path_ids(category_path))
+        return True
+
+    def amount(self, subtotal, eligible_subtotal):
+        """What the discount takes off, capped by ``max_discount`` and the eligible lines."""
+
+        if subtotal < self.min_purchase:
+            return ZERO
+
+        if self.type == "percentage":
+            amount = (eligible_subtotal * self.value / 100).quantize(CENT, rounding=ROUND_HALF_UP)
+        elif self.type == "fixed":
+            amount = self.value
+        else:
+            # free shipping does not change the cart total
+            return ZERO
+
+        if self.max_discount:
+            amount = min(amount, self.max_discount)
+        return min(amount, eligible_subtotal)
+
+    def eligible_in(self, summary):
+        """The eligible subtotal of a ``CartSummary``, without visiting every line."""
+
+        if self.applies_to == "products":
+            return sum(map(summary.by_product.__getitem__, self.target_ids & summary.by_product.keys()), ZERO)
+        if self.applies_to == "categories":
+            # a line under two targeted categories counts once
+            paths = set()
+            for pk in self.target_ids & summary.paths_by_category.keys():
+                paths.update(summary.paths_by_category[pk])
+            return sum(map(summary.by_path.__getitem__, paths), ZERO)
+        return summary.subtotal
+
+    def evaluate(self, lines):
+        """``(subtotal, eligible_subtotal, amount)`` of ``(product_id, quantity, unit price, category path)`` lines."""
+
+        subtotal = eligible = ZERO
+        for product_id, quantity, price, category_path in lines:
+            line_total = quantity * price
+            subtotal += line_total
+            if self.applies(product_id, category_path):
+                eligible += line_total
+        return subtotal, eligible, self.amount(subtotal, eligible)
+
+
+class CartSummary:
+    """
+    Cart lines folded once into totals by product and by category path, so
+    many discounts can be priced against the same cart cheaply.
+    """
+
+    __slots__ = ("subtotal", "by_product", "by_path", "paths_by_category")
+
+    def __init__(self, lines):
+        self.subtotal = ZERO
+        self.by_product = {}
+        self.by_path = {}
+        # category id -> the paths of the cart's lines that run through it
+        self.paths_by_category = {}
+
+        for product_id, quantity, price, category_path in lines:
+            line_total = quantity * price
+            self.subtotal += line_total
+            self.by_product[product_id] = self.by_product.get(product_id, ZERO) + line_total
+            if category_path:
+                if category_path not in self.by_path:
+                    self.by_path[category_path] = ZERO
+                    for pk in path_ids(category_path):
+                        self.paths_by_category.setdefault(pk, []).append(category_path)
+                self.by_path[category_path] += line_total
+
+
+def target_ids(values):
+    ids = set()
+    for value in values or ():
+        try:
+            ids.add(int(value))
+        except (TypeError, ValueError):
+            continue
+    return frozenset(ids)
+
+
+def path_ids(category_path):
+    return {int(pk) for pk in category_path.strip("/").split("/") if pk}
+
+
+def rule_of(discount):
+    return {name: getattr(discount, name) for name in RULE_FIELDS}
+
+
+def compile_rule(rule):
+    key = (rule["id"], rule["updated_at"], rule["used_count"])
+    if None in key:
+        # an unsaved discount has nothing to be keyed by
+        return CompiledDiscount(rule)
+
+    evaluator = _compiled.get(key)
+    if evaluator is None:
+        if len(_compiled) >= MAX_COMPILED:
+            _compiled.clear()
+        evaluator = _compiled[key] = CompiledDiscount(rule)
+    return evaluator
+
+
+def compile_discount(discount):
+    """The evaluator of a loaded ``Discount``, ``None`` for no discount."""
+
+    return None if discount is None else compile_rule(rule_of(discount))
+
+
+def code_key(code):
+    return f"products:discount:{RULE_VERSION}:{code}"
+
+
+def discount_by_code(code):
+    """
+    The evaluator of the discount with ``code``, ``None`` when there is
+    none. Codes resolve through the cache, the database is read on a miss.
+    """
+
+    rule = cache.get(code_key(code))
+    if rule is None:
+        discount = Discount.objects.filter(code=code).first()
+        rule = MISSING if discount is None else rule_of(discount)
+        cache.set(code_key(code), rule, MISSING_CODE_TIMEOUT if rule is MISSING else CODE_TIMEOUT)
+
+    return None if rule == MISSING else compile_rule(rule)
+
+
+def invalidate_code(*codes):
+    keys = [code_key(code) for code in codes if code]
+    cache.delete_many(keys)
+    # a concurrent miss may have cached the old row until the commit
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def forget_compiled(pk):
+    for key in [key for key in _compiled if key[0] == pk]:
+        _compiled.pop(key, None)
+
+
+class ActiveDiscounts:
+    """
+    The active discounts that have not ended, held in process as their
+    ``[starts_at, ends_at)`` windows.
+
+    ``live(now)`` answers from memory. The live set only changes when a
+    window starts or ends, so the next such boundary is kept and the set is
+    rebuilt from the held windows once it passes. A saved or deleted
+    discount changes ``ACTIVE_VERSION_KEY``. Each process reads that key at
+    most every ``ACTIVE_CHECK_SECONDS`` and reloads when it has moved.
+    """
+
+    def __init__(self, check_seconds=ACTIVE_CHECK_SECONDS):
+        self.check_seconds = check_seconds
+        self.reset()
+
+    def reset(self):
+        self.version = None
+        self.checked_at = None
+        self.windows = ()
+        self.current = ()
+        self.next_boundary = None
+
+    def live(self, now=None):
+        """The evaluators of the discounts valid at ``now``, ordered by end."""
+
+        now = now or timezone.now()
+
+        if self.checked_at is None or time.monotonic() - self.checked_at >= self.check_seconds:
+            version = cache.get(ACTIVE_VERSION_KEY)
+            if version is None or version != self.version:
+                self.load(now, version)
+            self.checked_at = time.monotonic()
+
+        if self.next_boundary is not None and now >= self.next_boundary:
+            self.advance(now)
+        return self.current
+
+    def load(self, now, version):
+        if version is None:
+            version = uuid.uuid4().hex
+            cache.add(ACTIVE_VERSION_KEY, version, None)
+            version = cache.get(ACTIVE_VERSION_KEY, version)
+
+        # served by the partial (starts_at, ends_at) index of active discounts. Generated
+        # one-time codes are redeemed by code only, there can be hundreds of thousands
+        discounts = Discount.objects.filter(is_active=True, ends_at__gt=now, template__isnull=True).only(*RULE_FIELDS)
+        self.windows = tuple(sorted((compile_rule(rule_of(discount)) for discount in discounts), key=lambda d: d.ends_at))
+        self.version = version
+        self.advance(now)
+
+    def advance(self, now):
+        self.current = tuple(d for d in self.windows if d.starts_at <= now < d.ends_at)
+        self.next_boundary = min(
+            [d.starts_at for d in self.windows if d.starts_at > now] + [d.ends_at for d in self.windows if d.ends_at > now],
+            default=None,
+        )
+
+
+_active = ActiveDiscounts()
+
+
+def active_discounts(now=None):
+    """The discounts valid now, without a query unless one changed (see ``ActiveDiscounts``)."""
+
+    return _active.live(now)
+
+
+def invalidate_active():
+    def bump():
+        cache.set(ACTIVE_VERSION_KEY, uuid.uuid4().hex, None)
+        _active.reset()
+
+    bump()
+    # a process reloading before the commit would hold the old rows
+    transaction.on_commit(bump)
+
+
+def best_discount(lines, user, now=None):
+    """
+    The live discount that takes the most off a cart of ``lines``
+    (``(product_id, quantity, unit price, category path)`` rows) for
+    ``user``, as ``(evaluator, savings)``, or ``None`` when none applies.
+
+    The lines are summarised once and every live discount is priced against
+    the summary. The user's past orders and uses are read only when a
+    candidate has a first-purchase or per-user limit. Free shipping saves
+    nothing off the cart total and is only picked when nothing else does
+    and it covers a line of the cart, as checkout requires.
+    A tie goes to the discount ending first.
+    """
+
+    summary = CartSummary(lines)
+    if not summary.by_product:
+        return None
+
+    candidates = [
+        discount for discount in active_discounts(now)
+        if discount.usage_limit_total is None or discount.used_count < discount.usage_limit_total
+    ]
+
+    if user is not None and any(discount.first_purchase_only for discount in candidates):
+        if Order.objects.filter(user=user).exists():
+            candidates = [discount for discount in candidates if not discount.first_purchase_only]
+
+    limited = [discount.pk for discount in candidates if discount.usage_limit_per_user is not None]
+    if user is not None and limited:
+        used = dict(
+            DiscountUsage.objects.filter(user=user, discount_id__in=limited)
+            .values_list("discount_id")
+            .annotate(uses=Count("pk"))
+        )
+        candidates = [
+            discount for discount in candidates
+            if discount.usage_limit_per_user is None or used.get(discount.pk, 0) < discount.usage_limit_per_user
+        ]
+
+    best = free_shipping = None
+    for discount in candidates:
+        if summary.subtotal < discount.min_purchase:
+            continue
+        if discount.type == "free_shipping":
+            # like checkout, it needs something it covers in the cart
+            if free_shipping is None and discount.eligible_in(summary) > 0:
+                free_shipping = discount
+            continue
+
+        savings = discount.amount(summary.subtotal, discount.eligible_in(summary))
+        if savings > 0 and (best is None or savings > best[1]):
+            best = (discount, savings)
+
+    if best is None and free_shipping is not None:
+        return free_shipping, ZERO
+    return best
@@ -0,0 +1,86 @@
+import json
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from products.cart_store import cart_store
+from products.models import Cart, CartItem
+
+
+def locked_batch(queryset, batch_size):
+    """
+    Ids of the next ``batch_size`` rows of ``queryset``, locked for the
+    current transaction. Rows a checkout is holding are skipped rather
+    than waited for, the next run picks them up.
+    """
+
+    return list(
+        queryset.select_for_update(skip_locked=True, of=("self",))
+        .order_by("expires_at", "pk")
+        .values_list("pk", "user_id")[:batch_size]
+    )
+
+
+def expire_carts(batch_size=500, pause=0, now=None):
+    """
+    Move active carts past ``expires_at`` to ``EXPIRED``, ``batch_size``
+    carts per short transaction with ``pause`` seconds between batches.
+    Returns the number of carts expired.
+    """
+
+    now = now or timezone.now()
+    expired = 0
+
+    while True:
+        with transaction.atomic():
+            batch = locked_batch(Cart.objects.filter(status=Cart.active, expires_at__lte=now), batch_size)
+            Cart.objects.filter(pk__in=[pk for pk, _ in batch]).update(status=Cart.expired, updated_at=Now())
+
+        # held Redis copies are of carts that can no longer be changed
+        for _, user_id in batch:
+            cart_store().forget(user_id)
+
+        expired += len(batch)
+        if len(batch) < batch_size:
+            return expired
+        time.sleep(pause)
+
+
+def purge_expired_carts(expired_before, batch_size=500, pause=0, archive=None):
+    """
+    Delete expired carts whose ``expires_at`` is before ``expired_before``
+    with their lines, ``batch_size`` carts per transaction. With ``archive``
+    (a text file) every cart is first written to it as a JSON line. Returns
+    the number of carts deleted.
+    """
+
+    purged = 0
+
+    while True:
+        with transaction.atomic():
+            batch = locked_batch(Cart.objects.filter(status=Cart.expired, expires_at__lt=expired_before), batch_size)
+            ids = [pk for pk, _ in batch]
+
+            if archive is not None:
+                archive_carts(ids, archive)
+            Cart.objects.filter(pk__in=ids).delete()
+
+        purged += len(batch)
+        if len(batch) < batch_size:
+            return purged
+        time.sleep(pause)
+
+
+def archive_carts(ids, archive):
+    lines = {}
+    for line in CartItem.objects.filter(cart_id__in=ids).values(
+        "cart_id", "product_id", "quantity", "unit_price_snapshot"
+    ):
+        lines.setdefault(line.pop("cart_id"), []).append(line)
+
+    for cart in Cart.objects.filter(pk__in=ids).order_by("pk").values():
+        cart["items"] = lines.get(cart["id"], [])
+        archive.write(json.dumps(cart, cls=DjangoJSONEncoder) + "\n")
@@ -0,0 +1,120 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+
+from products.models import Product, ProductFacetCount
+
+
+def price_bucket(price):
+    lower = 0
+    for bound in settings.PRODUCT_FACET_PRICE_BOUNDS:
+        if price < bound:
+            return f"{lower}-{bound}"
+        lower = bound
+    return f"{lower}+"
+
+
+def product_facet_keys(category_id, brand, price, is_featured):
+    """The (category, facet, value) rows a product with these values is counted in."""
+
+    return {
+        (category_id, ProductFacetCount.BRAND, brand),
+        (category_id, ProductFacetCount.PRICE, price_bucket(Decimal(price))),
+        (category_id, ProductFacetCount.FEATURED, "true" if is_featured else "false"),
+    }
+
+
+def facet_keys_of(product):
+    return product_facet_keys(product.category_id, product.brand, product.price, product.is_featured)
+
+
+def stored_facet_keys(product_id):
+    """Facet keys of the product as currently stored, empty if it does not exist yet."""
+
+    values = (
+        Product.objects.filter(pk=product_id)
+        .values_list("category_id", "brand", "price", "is_featured")
+        .first()
+    )
+    return product_facet_keys(*values) if values else set()
+
+
+def adjust_facet_counts(keys, delta):
+    for category_id, facet, value in keys:
+        rows = ProductFacetCount.objects.filter(category_id=category_id, facet=facet, value=value)
+        if rows.update(count=F("count") + delta):
+            continue
+
+        try:
+            with transaction.atomic():
+                ProductFacetCount.objects.create(
+                    category_id=category_id, facet=facet, value=value, count=delta
+                )
+        except IntegrityError:
+            # another request created the row first
+            rows.update(count=F("count") + delta)
+
+
+def move_facet_counts(old_keys, new_keys):
+    adjust_facet_counts(old_keys - new_keys, -1)
+    adjust_facet_counts(new_keys - old_keys, 1)
+
+
+def category_condition(category_ids):
+    category_ids = list(category_ids)
+    condition = Q(category_id__in=[pk for pk in category_ids if pk is not None])
+    if None in category_ids:
+        condition |= Q(category__isnull=True)
+    return condition
+
+
+def facet_counts(category=None):
+    """
+    Facet counts read from the maintained aggregate, optionally limited to
+    products in ``category`` and its subcategories.
+    """
+
+    rows = ProductFacetCount.objects.filter(count__gt=0)
+    if category is not None:
+        rows = rows.filter(category__path__startswith=category.path)
+
+    facets = {facet: {} for facet, _ in ProductFacetCount.FACET_CHOICES}
+    totals = rows.values("facet", "value").annotate(total=Sum("count")).order_by("facet", "value")
+    for row in totals:
+        facets[row["facet"]][row["value"]] = row["total"]
+
+    return facets
+
+
+def rebuild_facet_counts(category_ids=None, chunk_size=2000):
+    """
+    Recount facets from the product table, for every category or only for
+    ``category_ids`` (``None`` in it stands for uncategorized products).
+    """
+
+    products = Product.objects.all()
+    rows = ProductFacetCount.objects.all()
+    if category_ids is not None:
+        condition = category_condition(category_ids)
+        products = products.filter(condition)
+        rows = rows.filter(condition)
+
+    counts = Counter()
+    values = products.values_list("category_id", "brand", "price", "is_featured")
+    for category_id, brand, price, is_featured in values.iterator(chunk_size=chunk_size):
+        counts.update(product_facet_keys(category_id, brand, price, is_featured))
+
+    with transaction.atomic():
+        rows.delete()
+        ProductFacetCount.objects.bulk_create(
+            [
+                ProductFacetCount(category_id=category_id, facet=facet, value=value, count=count)
+                for (category_id, facet, value), count in counts.items()
+            ],
+            batch_size=chunk_size,
+        )
+
+    return len(counts)
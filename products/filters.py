@@ -0,0 +1,75 @@
+from decimal import Decimal, InvalidOperation
+
+from rest_framework.exceptions import ValidationError
+
+from products.models import Category
+from utils import error_messages
+
+
+TRUE_VALUES = ("true", "1")
+FALSE_VALUES = ("false", "0")
+
+
+def invalid(name):
+    return ValidationError({name: [error_messages.ERR_INVALID_FILTER_VALUE]})
+
+
+def decimal_param(params, name):
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise invalid(name)
+
+    if not number.is_finite() or number < 0:
+        raise invalid(name)
+    return number
+
+
+def filter_products(queryset, params):
+    """
+    Apply the catalog filters from ``params`` and return ``(queryset, category)``,
+    ``category`` being the selected category or ``None``.
+
+    Supported filters: ``category`` (including subcategories), ``brand``
+    (repeatable), ``min_price``, ``max_price``, ``is_featured`` and ``min_rating``.
+    """
+
+    category = None
+    category_id = params.get("category")
+    if category_id:
+        try:
+            category = Category.objects.only("path").get(pk=int(category_id))
+        except (ValueError, Category.DoesNotExist):
+            raise invalid("category")
+        queryset = queryset.filter(category__path__startswith=category.path)
+
+    brands = [brand for brand in params.getlist("brand") if brand]
+    if brands:
+        queryset = queryset.filter(brand__in=brands)
+
+    min_price = decimal_param(params, "min_price")
+    if min_price is not None:
+        queryset = queryset.filter(price__gte=min_price)
+
+    max_price = decimal_param(params, "max_price")
+    if max_price is not None:
+        queryset = queryset.filter(price__lte=max_price)
+
+    is_featured = params.get("is_featured")
+    if is_featured:
+        if is_featured.lower() in TRUE_VALUES:
+            queryset = queryset.filter(is_featured=True)
+        elif is_featured.lower() in FALSE_VALUES:
+            queryset = queryset.filter(is_featured=False)
+        else:
+            raise invalid("is_featured")
+
+    min_rating = decimal_param(params, "min_rating")
+    if min_rating is not None:
+        queryset = queryset.filter(average_rating__gte=min_rating)
+
+    return queryset, category
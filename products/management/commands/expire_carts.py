@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from products.expiry import expire_carts, purge_expired_carts
+
+
+class Command(BaseCommand):
+    help = "Expire active carts past their expiry and optionally purge old expired carts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--pause", type=float, default=0.1,
+            help="Seconds to sleep between batches, leaves room for checkout traffic.",
+        )
+        parser.add_argument(
+            "--purge-after-days", type=int,
+            help="Also delete carts that expired more than this many days ago.",
+        )
+        parser.add_argument(
+            "--archive",
+            help="File the purged carts are appended to as JSON lines before they are deleted.",
+        )
+
+    def handle(self, *args, **options):
+        expired = expire_carts(batch_size=options["batch_size"], pause=options["pause"])
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} carts."))
+
+        if options["purge_after_days"] is None:
+            return
+
+        expired_before = timezone.now() - timedelta(days=options["purge_after_days"])
+        purge = dict(expired_before=expired_before, batch_size=options["batch_size"], pause=options["pause"])
+
+        if options["archive"]:
+            with open(options["archive"], "a", encoding="utf-8") as archive:
+                purged = purge_expired_carts(archive=archive, **purge)
+        else:
+            purged = purge_expired_carts(**purge)
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} carts."))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from products.discount_codes import CODE_CHUNK_SIZE, CODE_LENGTH, MAX_CODE_LENGTH, MIN_CODE_LENGTH, generate_codes
+from products.models import Discount
+
+
+class Command(BaseCommand):
+    help = "Generate one-time discount codes copying a template discount."
+
+    def add_arguments(self, parser):
+        parser.add_argument("template", type=int, help="Id of the discount the codes copy.")
+        parser.add_argument("count", type=int)
+        parser.add_argument("--prefix", default="")
+        parser.add_argument("--length", type=int, default=CODE_LENGTH, help="Random symbols after the prefix.")
+        parser.add_argument("--chunk-size", type=int, default=CODE_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        template = Discount.objects.filter(pk=options["template"], template__isnull=True).first()
+        if template is None:
+            raise CommandError(f"No template discount with id {options['template']}.")
+        if not MIN_CODE_LENGTH <= options["length"] <= MAX_CODE_LENGTH:
+            raise CommandError(f"Length must be between {MIN_CODE_LENGTH} and {MAX_CODE_LENGTH}.")
+        if len(options["prefix"]) + options["length"] > Discount._meta.get_field("code").max_length:
+            raise CommandError("Prefix and length make codes longer than the code column.")
+
+        def progress(created, count):
+            self.stdout.write(f"{created}/{count} codes")
+
+        try:
+            created = generate_codes(
+                template, options["count"], prefix=options["prefix"], length=options["length"],
+                chunk_size=options["chunk_size"], progress=progress,
+            )
+        except ValidationError:
+            raise CommandError("Every code of a chunk was taken, use a longer length or another prefix.")
+        self.stdout.write(self.style.SUCCESS(f"Generated {created} codes."))
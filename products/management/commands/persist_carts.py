@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products.cart_store import cart_store
+
+
+class Command(BaseCommand):
+    help = "Write carts changed in the Redis cart store back to the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--interval", type=int, default=0,
+            help="Keep running and persist every N seconds instead of once.",
+        )
+
+    def handle(self, *args, **options):
+        if settings.CART_STORE != "redis":
+            self.stdout.write("CART_STORE is not redis, nothing to persist.")
+            return
+
+        while True:
+            written = cart_store().persist_dirty(batch_size=options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"Persisted {written} carts."))
+
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
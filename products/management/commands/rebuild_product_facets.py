@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products.facets import rebuild_facet_counts
+
+
+class Command(BaseCommand):
+    help = "Recount the product facet aggregate from the product table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rows = rebuild_facet_counts(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} facet rows."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from products.models import Cart
+from products.pricing import reprice
+
+
+class Command(BaseCommand):
+    help = "Snapshot current product prices into active carts and recompute their totals."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--product", type=int, action="append", default=[],
+            help="Only reprice carts holding this product, may be repeated.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        carts = Cart.objects.filter(status=Cart.active)
+        if options["product"]:
+            carts = carts.filter(items__product__in=options["product"]).distinct()
+
+        repriced = reprice(carts, chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Repriced {repriced} carts."))
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:24
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    Product = apps.get_model("products", "Product")
+    Category = apps.get_model("products", "Category")
+    config = settings.PRODUCT_SEARCH_CONFIG
+    category_name = Coalesce(
+        Subquery(Category.objects.filter(pk=OuterRef("category_id")).values("name")[:1]),
+        Value(""),
+        output_field=TextField(),
+    )
+
+    Product.objects.using(schema_editor.connection.alias).update(
+        search_vector=SearchVector("name", weight="A", config=config)
+        + SearchVector("brand", weight="B", config=config)
+        + SearchVector(category_name, weight="B", config=config)
+        + SearchVector("description", weight="C", config=config)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_products_pr_created_3be21c_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='products_pr_search__98d711_gin'),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+    ]
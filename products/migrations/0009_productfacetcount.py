@@ -0,0 +1,60 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:26
+
+from collections import Counter
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def price_bucket(price):
+    lower = 0
+    for bound in settings.PRODUCT_FACET_PRICE_BOUNDS:
+        if price < bound:
+            return f"{lower}-{bound}"
+        lower = bound
+    return f"{lower}+"
+
+
+def count_existing_products(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    ProductFacetCount = apps.get_model("products", "ProductFacetCount")
+
+    counts = Counter()
+    values = Product.objects.values_list("category_id", "brand", "price", "is_featured")
+    for category_id, brand, price, is_featured in values.iterator(chunk_size=2000):
+        counts[(category_id, "brand", brand)] += 1
+        counts[(category_id, "price", price_bucket(price))] += 1
+        counts[(category_id, "is_featured", "true" if is_featured else "false")] += 1
+
+    ProductFacetCount.objects.bulk_create(
+        [
+            ProductFacetCount(category_id=category_id, facet=facet, value=value, count=count)
+            for (category_id, facet, value), count in counts.items()
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_search_vector_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(choices=[('brand', 'برند'), ('price', 'قیمت'), ('is_featured', 'ویژه')], max_length=20)),
+                ('value', models.CharField(max_length=100)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='products.category')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('category', 'facet', 'value'), name='unique_product_facet_count', nulls_distinct=False)],
+            },
+        ),
+        migrations.RunPython(count_existing_products, migrations.RunPython.noop),
+    ]
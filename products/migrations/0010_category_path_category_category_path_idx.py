@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:31
+
+from django.db import migrations, models
+
+
+def populate_paths(apps, schema_editor):
+    Category = apps.get_model("products", "Category")
+    parents = dict(Category.objects.values_list("pk", "parent_id"))
+
+    paths = {}
+
+    def path_of(pk, seen=()):
+        if pk not in paths:
+            parent_id = parents[pk]
+            # a broken parent chain (cycle) is cut and the category made a root
+            if parent_id is None or parent_id in seen or parent_id not in parents:
+                paths[pk] = f"/{pk}/"
+            else:
+                paths[pk] = f"{path_of(parent_id, seen + (pk,))}{pk}/"
+        return paths[pk]
+
+    categories = list(Category.objects.only("pk"))
+    for category in categories:
+        category.path = path_of(category.pk)
+    Category.objects.bulk_update(categories, ["path"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_productfacetcount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:41
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    Comment = apps.get_model("products", "Comment")
+
+    approved = Comment.objects.filter(product=OuterRef("pk"), is_approved=True).order_by().values("product")
+    Product.objects.update(
+        rating_sum=Coalesce(Subquery(approved.annotate(total=Sum("rating")).values("total")), 0),
+        review_count=Coalesce(Subquery(approved.annotate(count=Count("id")).values("count")), 0),
+    )
+
+    average = models.DecimalField(max_digits=3, decimal_places=2)
+    Product.objects.update(
+        average_rating=Coalesce(
+            # half up in integer cents, see products.ratings.rounded_average
+            Cast(
+                (F("rating_sum") * 200 + F("review_count")) / (NullIf(F("review_count"), 0) * 2)
+                * Value(Decimal("0.01")),
+                average,
+            ),
+            Value(Decimal("0.00")),
+            output_field=average,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_category_path_category_category_path_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:48
+
+import json
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def decode_items(items):
+    # UserCart.post stored json.dumps() output in the JSON column, so some
+    # carts hold a string (possibly encoded more than once) instead of a list
+    while isinstance(items, str):
+        try:
+            items = json.loads(items)
+        except ValueError:
+            return []
+    return items if isinstance(items, list) else []
+
+
+def copy_items_to_rows(apps, schema_editor):
+    Cart = apps.get_model("products", "Cart")
+    CartItem = apps.get_model("products", "CartItem")
+    Product = apps.get_model("products", "Product")
+
+    prices = dict(Product.objects.values_list("pk", "price"))
+
+    rows = []
+    for cart_id, items in Cart.objects.values_list("pk", "items").iterator(chunk_size=1000):
+        quantities = {}
+        for item in decode_items(items):
+            try:
+                product_id, quantity = int(item["product_id"]), int(item.get("quantity", 1))
+            except (KeyError, TypeError, ValueError):
+                continue
+            # lines of deleted products and non positive quantities are dropped
+            if product_id in prices and quantity > 0:
+                quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+        rows.extend(
+            CartItem(cart_id=cart_id, product_id=product_id, quantity=quantity, unit_price_snapshot=prices[product_id])
+            for product_id, quantity in quantities.items()
+        )
+
+    CartItem.objects.bulk_create(rows, batch_size=1000)
+
+
+def copy_rows_to_items(apps, schema_editor):
+    Cart = apps.get_model("products", "Cart")
+    CartItem = apps.get_model("products", "CartItem")
+
+    items = {}
+    for cart_id, product_id, quantity in CartItem.objects.values_list("cart_id", "product_id", "quantity"):
+        items.setdefault(cart_id, []).append({"product_id": product_id, "quantity": quantity})
+
+    for cart_id, cart_items in items.items():
+        Cart.objects.filter(pk=cart_id).update(items=cart_items)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_alter_productimage_product_and_more'),
+    ]
+
+    operations = [
+        # the reverse accessor is renamed to "items" once the JSON column is gone
+        migrations.CreateModel(
+            name='CartItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)])),
+                ('unit_price_snapshot', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to='products.cart')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to='products.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('cart', 'product'), name='cart_item_unique_product')],
+            },
+        ),
+        migrations.RunPython(copy_items_to_rows, copy_rows_to_items),
+        migrations.RemoveField(
+            model_name='cart',
+            name='items',
+        ),
+        migrations.AlterField(
+            model_name='cartitem',
+            name='cart',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='products.cart'),
+        ),
+    ]
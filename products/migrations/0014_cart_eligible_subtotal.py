@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_cartitem_remove_cart_items'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='eligible_subtotal',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=10),
+        ),
+    ]
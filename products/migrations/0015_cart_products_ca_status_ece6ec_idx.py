@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_cart_eligible_subtotal'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['status', 'expires_at'], name='products_ca_status_ece6ec_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:04
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_active_carts(apps, schema_editor):
+    """
+    Keep the most recently updated active cart of every user, move the
+    lines of the others into it and expire them. Totals of the kept carts
+    are left to the reprice_carts command.
+    """
+
+    Cart = apps.get_model("products", "Cart")
+    CartItem = apps.get_model("products", "CartItem")
+
+    users = (
+        Cart.objects.filter(status="ACTIVE").values("user_id")
+        .annotate(carts=Count("pk")).filter(carts__gt=1).values_list("user_id", flat=True)
+    )
+    for user_id in list(users):
+        kept, *duplicates = Cart.objects.filter(user_id=user_id, status="ACTIVE").order_by("-updated_at", "-pk")
+
+        lines = {line.product_id: line for line in CartItem.objects.filter(cart=kept)}
+        for line in CartItem.objects.filter(cart__in=duplicates):
+            if line.product_id in lines:
+                lines[line.product_id].quantity += line.quantity
+                lines[line.product_id].save(update_fields=["quantity"])
+                line.delete()
+            else:
+                line.cart = kept
+                line.save(update_fields=["cart"])
+                lines[line.product_id] = line
+
+        Cart.objects.filter(pk__in=[cart.pk for cart in duplicates]).update(status="EXPIRED")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0015_cart_products_ca_status_ece6ec_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_active_carts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'ACTIVE')), fields=('user',), name='cart_one_active_per_user'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0016_cart_cart_one_active_per_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartitem',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0017_cartitem_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='discount',
+            name='applies_to',
+            field=models.CharField(choices=[('all', 'همه'), ('products', 'محصولات'), ('categories', 'دسته بندی ها')], default='all', max_length=20),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0018_alter_discount_applies_to'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='discount',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['starts_at', 'ends_at'], name='discount_active_window_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0019_discount_discount_active_window_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discount',
+            name='template',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='generated_codes', to='products.discount'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 21:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0020_discount_template'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='store_revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
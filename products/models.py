@@ -1,10 +1,40 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Value
+from django.db.models.functions import Concat, Now, Substr
 from accounts.models import User
     
 
 
-class Product(models.Model):
+class MaintainedFieldsModel(models.Model):
+    """
+    Model with columns kept up to date by SQL updates, listed in
+    ``MAINTAINED_FIELDS``. Saving an existing instance never writes them,
+    so a stale instance cannot undo concurrent updates.
+    """
+
+    MAINTAINED_FIELDS = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get("force_insert") and kwargs.get("update_fields") is None:
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.attname
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.MAINTAINED_FIELDS
+                and field.attname not in deferred
+            ]
+
+        super().save(*args, **kwargs)
+
+
+class Product(MaintainedFieldsModel):
 
     name = models.CharField(max_length=255)
     description = models.TextField()
@@ -46,11 +76,60 @@ class Product(models.Model):
 
     is_featured = models.BooleanField(default=False)
 
+    # sum of the ratings of approved comments, average_rating = rating_sum / review_count
+    rating_sum = models.PositiveIntegerField(default=0)
+
+    # kept in sync by products.signals, see products.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # maintained with SQL updates (products.signals, products.view_counts),
+    # saving a stale instance must not write them back
+    MAINTAINED_FIELDS = ("view_count", "rating_sum", "average_rating", "review_count", "search_vector")
+
+    class Meta:
+        indexes = [
+            # keyset pagination walks (sort key, id)
+            models.Index(fields=["created_at", "id"]),
+            models.Index(fields=["price", "id"]),
+            GinIndex(fields=["search_vector"]),
+        ]
+
+
+class ProductFacetCount(models.Model):
+    """
+    Product counts per (category, facet, value), maintained incrementally by
+    products.signals so listings never GROUP BY the product table.
+    """
+
+    BRAND = "brand"
+    PRICE = "price"
+    FEATURED = "is_featured"
+
+    FACET_CHOICES = (
+        (BRAND, "برند"),
+        (PRICE, "قیمت"),
+        (FEATURED, "ویژه"),
+    )
+
+    category = models.ForeignKey("Category", null=True, on_delete=models.CASCADE)
+    facet = models.CharField(max_length=20, choices=FACET_CHOICES)
+    value = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["category", "facet", "value"],
+                name="unique_product_facet_count",
+                nulls_distinct=False,
+            ),
+        ]
+
 
 class ProductImage(models.Model):
 
     product_image_id = models.AutoField(primary_key=True)
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="images")
 
     url = models.URLField()
     thumbnail_url = models.URLField()
@@ -59,6 +138,12 @@ class ProductImage(models.Model):
     is_primary = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # the gallery prefetch reads images of a page of products in position order
+            models.Index(fields=["product", "position"]),
+        ]
+
 
 class Category(models.Model):
 
@@ -92,8 +177,53 @@ class Category(models.Model):
     display_order = models.IntegerField(null=True, blank=True)
     display_order = models.IntegerField(null=True)
 
+    # materialized path of ids from the root, e.g. "/1/4/9/"
+    path = models.CharField(max_length=255, default="", editable=False)
+
     class Meta:
         verbose_name_plural = "Categories"
+        indexes = [
+            # prefix (subtree) lookups use LIKE 'path%'
+            models.Index(fields=["path"], name="category_path_idx", opclasses=["varchar_pattern_ops"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        parent_path = "/"
+        if self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list("path", flat=True).get()
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"parent", "parent_id"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "path"}
+
+        if self.pk is None:
+            super().save(*args, **kwargs)
+            self.path = f"{parent_path}{self.pk}/"
+            Category.objects.filter(pk=self.pk).update(path=self.path)
+            return
+
+        old_path = Category.objects.filter(pk=self.pk).values_list("path", flat=True).first()
+        if old_path and parent_path.startswith(old_path):
+            raise ValueError("A category cannot be moved under itself or one of its descendants.")
+
+        self.path = f"{parent_path}{self.pk}/"
+        moved = old_path and old_path != self.path
+        if moved:
+            # the descendants' payloads change with their path, post_save drops their cached details
+            descendants = Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk)
+            self._moved_descendants = list(descendants.values_list("pk", flat=True))
+
+        # atomic, so the cache entries dropped on commit are dropped after the subtree moved
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            if moved:
+                # move the whole subtree with one UPDATE
+                descendants.update(path=Concat(Value(self.path), Substr("path", len(old_path) + 1)), updated_at=Now())
+
+    def descendants(self, include_self=True):
+        categories = Category.objects.filter(path__startswith=self.path)
+        return categories if include_self else categories.exclude(pk=self.pk)
 
 
 class Discount(models.Model):
@@ -124,18 +254,30 @@ class Discount(models.Model):
     usage_limit_per_user = models.PositiveIntegerField(null=True)
     used_count = models.PositiveIntegerField(default=0)
 
-    applies_to = models.CharField(max_length=20, default="all", choices=TYPE_CHOICES)
+    applies_to = models.CharField(max_length=20, default="all", choices=APPLIES_TO_CHOICES)
     traget_ids = models.JSONField(default=list)
     first_purchase_only = models.BooleanField(default=False)
     starts_at = models.DateTimeField()
     ends_at = models.DateTimeField()
     is_active = models.BooleanField(default=True)
+    # set on one-time codes generated from a campaign discount, see products.discount_codes
+    template = models.ForeignKey(
+        "self", on_delete=models.CASCADE, null=True, blank=True, related_name="generated_codes"
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # the discounts valid now, see products.discounts.ActiveDiscounts
+            models.Index(
+                fields=["starts_at", "ends_at"], condition=models.Q(is_active=True), name="discount_active_window_idx"
+            ),
+        ]
+
 
-class Cart(models.Model):
+class Cart(MaintainedFieldsModel):
 
     # status choices
 
@@ -158,16 +300,58 @@ class Cart(models.Model):
         Discount, null=True, on_delete=models.SET_NULL
     )
 
+    # the part of subtotal the discount applies to
+    eligible_subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+
     # the amount of money that user should be paying
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
 
     status = models.CharField(max_length=11, choices=STATUS_CHOICES, default=active)
-    items = models.JSONField(default=list)
 
     expires_at = models.DateTimeField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # bumped when the lines change in the database while a Redis copy may be
+    # held, which that copy then no longer matches (see products.cart_store)
+    store_revision = models.PositiveIntegerField(default=0)
+
+    # maintained by products.pricing and products.cart_store
+    MAINTAINED_FIELDS = ("subtotal", "eligible_subtotal", "total_amount", "store_revision")
+
+    class Meta:
+        indexes = [
+            # the expire_carts sweep walks carts of a status by expiry
+            models.Index(fields=["status", "expires_at"]),
+        ]
+        constraints = [
+            # also the conflict target of products.carts.active_cart
+            models.UniqueConstraint(
+                fields=["user"], condition=models.Q(status="ACTIVE"), name="cart_one_active_per_user"
+            ),
+        ]
+
+
+class CartItem(models.Model):
+    """One product line of a cart, written with single-row upserts (see products.carts)."""
+
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="items")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="cart_items")
+    quantity = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
+    # bumped on every quantity change, the ETag of the line for If-Match updates
+    version = models.PositiveIntegerField(default=1)
+
+    # product price when the line was last added to
+    unit_price_snapshot = models.DecimalField(max_digits=10, decimal_places=2)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["cart", "product"], name="cart_item_unique_product"),
+        ]
+
 
 class Comment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=True)
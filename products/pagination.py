@@ -0,0 +1,15 @@
+from utils.pagination import KeysetPagination
+
+
+class ProductPagination(KeysetPagination):
+
+    ordering = "-created_at"
+    # every sort key here is backed by a (key, id) index on Product
+    ordering_fields = ("created_at", "price")
+
+
+class ProductSearchPagination(KeysetPagination):
+
+    # rank is annotated by products.search.search_products
+    ordering = "-rank"
+    ordering_fields = ("rank",)
@@ -0,0 +1,130 @@
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import OuterRef, QuerySet, Subquery
+from django.db.models.functions import Now
+
+from products.discounts import ZERO, compile_discount
+from products.models import Cart, CartItem, Product
+
+# chunk of carts locked and repriced per transaction
+REPRICE_CHUNK_SIZE = 1000
+
+# what the totals need of a cart line
+LINE_FIELDS = ("product_id", "quantity", "unit_price_snapshot", "product__category__path")
+
+
+def lines_totals(lines, discount):
+    """``(subtotal, eligible_subtotal)`` of ``(product_id, quantity, unit price, category path)`` rows."""
+
+    evaluator = compile_discount(discount)
+    if evaluator is None:
+        subtotal = sum((quantity * price for _, quantity, price, _ in lines), ZERO)
+        return subtotal, ZERO
+
+    subtotal, eligible, _ = evaluator.evaluate(lines)
+    return subtotal, eligible
+
+
+def apply_totals(cart, subtotal, eligible_subtotal):
+    cart.subtotal = subtotal
+    cart.eligible_subtotal = eligible_subtotal
+    # a deactivated, ended or used up discount takes nothing off
+    evaluator = compile_discount(cart.discount)
+    live = evaluator is not None and evaluator.is_live()
+    cart.total_amount = subtotal - (evaluator.amount(subtotal, eligible_subtotal) if live else ZERO)
+
+
+@contextmanager
+def track_totals(cart, product_ids):
+    """
+    Lock ``cart`` while the body changes its lines of ``product_ids`` and
+    move the totals by the difference those lines make, the rest of the
+    cart is not read again. ``cart`` is updated in place.
+    """
+
+    with transaction.atomic():
+        locked = Cart.objects.select_for_update(of=("self",)).select_related("discount").get(pk=cart.pk)
+        touched = CartItem.objects.filter(cart=locked, product_id__in=product_ids)
+
+        before = lines_totals(touched.values_list(*LINE_FIELDS), locked.discount)
+        yield
+        after = lines_totals(touched.values_list(*LINE_FIELDS), locked.discount)
+
+        apply_totals(
+            locked,
+            locked.subtotal + after[0] - before[0],
+            locked.eligible_subtotal + after[1] - before[1],
+        )
+        Cart.objects.filter(pk=locked.pk).update(
+            subtotal=locked.subtotal,
+            eligible_subtotal=locked.eligible_subtotal,
+            total_amount=locked.total_amount,
+            updated_at=Now(),
+        )
+
+    cart.discount = locked.discount
+    apply_totals(cart, locked.subtotal, locked.eligible_subtotal)
+
+
+def cart_ids(carts):
+    if isinstance(carts, QuerySet):
+        return carts.values_list("pk", flat=True).order_by("pk").iterator(chunk_size=REPRICE_CHUNK_SIZE)
+    return (getattr(cart, "pk", cart) for cart in carts)
+
+
+def recompute_totals(carts, refresh_prices=False, chunk_size=REPRICE_CHUNK_SIZE):
+    """
+    Recompute the totals of ``carts`` (a queryset, or carts or cart ids)
+    from all their lines, ``chunk_size`` carts per transaction. Needed when
+    a cart's discount changes, the delta updates of ``track_totals`` only
+    cover added and removed lines, and after a line's quantity changed
+    (see products.carts). Returns the number of carts recomputed.
+    """
+
+    done = 0
+    chunk = []
+    for pk in cart_ids(carts):
+        chunk.append(pk)
+        if len(chunk) == chunk_size:
+            done += recompute_chunk(chunk, refresh_prices)
+            chunk = []
+    if chunk:
+        done += recompute_chunk(chunk, refresh_prices)
+    return done
+
+
+def recompute_chunk(ids, refresh_prices):
+    with transaction.atomic():
+        # carts are locked before their lines, in the same order as track_totals
+        carts = list(
+            Cart.objects.select_for_update(of=("self",)).select_related("discount").filter(pk__in=ids).order_by("pk")
+        )
+        items = CartItem.objects.filter(cart_id__in=ids)
+
+        if refresh_prices:
+            items.update(
+                unit_price_snapshot=Subquery(Product.objects.filter(pk=OuterRef("product_id")).values("price")[:1]),
+                updated_at=Now(),
+            )
+
+        lines = {}
+        for cart_id, *line in items.values_list("cart_id", *LINE_FIELDS):
+            lines.setdefault(cart_id, []).append(line)
+
+        for cart in carts:
+            apply_totals(cart, *lines_totals(lines.get(cart.pk, ()), cart.discount))
+        Cart.objects.bulk_update(carts, ["subtotal", "eligible_subtotal", "total_amount"])
+
+    return len(carts)
+
+
+def reprice(carts, chunk_size=REPRICE_CHUNK_SIZE):
+    """
+    Snapshot the current product prices into every line of ``carts`` and
+    recompute their totals, in one pass of ``chunk_size`` carts at a time
+    (one UPDATE of the lines and one read of them per chunk). Returns the
+    number of carts repriced.
+    """
+
+    return recompute_totals(carts, refresh_prices=True, chunk_size=chunk_size)
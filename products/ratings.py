@@ -0,0 +1,133 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Now
+from django.utils import timezone
+
+from products.cache import invalidate_detail
+from products.models import Comment, Product
+from products.serializers import ProductSerializer
+
+AVERAGE_FIELD = DecimalField(max_digits=3, decimal_places=2)
+
+
+def rating_contribution(product_id, rating, is_approved):
+    """What one comment adds to its product's ``(rating_sum, review_count)``."""
+
+    return {product_id: (rating, 1)} if is_approved else {}
+
+
+def stored_contribution(comment_id):
+    values = (
+        Comment.objects.filter(pk=comment_id)
+        .values_list("product_id", "rating", "is_approved")
+        .first()
+    )
+    return rating_contribution(*values) if values else {}
+
+
+def contribution_of(comment):
+    return rating_contribution(comment.product_id, comment.rating, comment.is_approved)
+
+
+def apply_rating_change(old, new):
+    """Move product aggregates from the ``old`` to the ``new`` contribution of a comment."""
+
+    for product_id in old.keys() | new.keys():
+        old_sum, old_count = old.get(product_id, (0, 0))
+        new_sum, new_count = new.get(product_id, (0, 0))
+        if (old_sum, old_count) != (new_sum, new_count):
+            adjust_product_rating(product_id, new_sum - old_sum, new_count - old_count)
+
+
+def adjust_product_rating(product_id, sum_delta, count_delta):
+    """
+    Apply a delta to the running sum and count and recompute the average
+    in the same UPDATE, the right hand sides all read the old row.
+    """
+
+    rating_sum = F("rating_sum") + sum_delta
+    review_count = F("review_count") + count_delta
+    average = Coalesce(
+        rounded_average(rating_sum, review_count),
+        Value(Decimal("0.00")),
+        output_field=AVERAGE_FIELD,
+    )
+
+    Product.objects.filter(pk=product_id).update(
+        rating_sum=rating_sum,
+        review_count=review_count,
+        average_rating=average,
+        updated_at=Now(),
+    )
+    invalidate_product(product_id)
+
+
+def rounded_average(rating_sum, review_count):
+    """
+    ``rating_sum / review_count`` rounded half up to two places, as an SQL
+    expression. The rounding is done in integer cents so every backend
+    agrees with ``average_rating`` to the last digit.
+    """
+
+    cents = (rating_sum * 200 + review_count) / (NullIf(review_count, 0) * 2)
+    return Cast(cents * Value(Decimal("0.01")), AVERAGE_FIELD)
+
+
+def invalidate_product(product_id):
+    invalidate_detail(Product, product_id, ProductSerializer)
+
+
+def average_rating(rating_sum, review_count):
+    if not review_count:
+        return Decimal("0.00")
+    # half up, like rounded_average
+    return (Decimal(rating_sum) / review_count).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def rebuild_product_ratings(batch_size=500):
+    """
+    Recompute ``rating_sum``, ``review_count`` and ``average_rating`` of every
+    product from its approved comments, ``batch_size`` products at a time.
+    Returns the number of products that had drifted.
+    """
+
+    repaired = 0
+    last_pk = 0
+
+    while True:
+        with transaction.atomic():
+            products = list(
+                Product.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .only("pk", "rating_sum", "review_count", "average_rating")[:batch_size]
+            )
+            if not products:
+                return repaired
+            last_pk = products[-1].pk
+
+            totals = {
+                row["product_id"]: (row["total"], row["count"])
+                for row in Comment.objects.filter(product__in=products, is_approved=True)
+                .values("product_id")
+                .annotate(total=Sum("rating"), count=Count("id"))
+            }
+
+            drifted = []
+            now = timezone.now()
+            for product in products:
+                rating_sum, review_count = totals.get(product.pk, (0, 0))
+                average = average_rating(rating_sum, review_count)
+                if (product.rating_sum, product.review_count, product.average_rating) != (rating_sum, review_count, average):
+                    product.rating_sum, product.review_count, product.average_rating = rating_sum, review_count, average
+                    product.updated_at = now
+                    drifted.append(product)
+
+            Product.objects.bulk_update(
+                drifted, ["rating_sum", "review_count", "average_rating", "updated_at"]
+            )
+
+        for product in drifted:
+            invalidate_product(product.pk)
+        repaired += len(drifted)
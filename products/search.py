@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Cast, Coalesce
+
+from products.models import Category
+
+
+def search_config():
+    return getattr(settings, "PRODUCT_SEARCH_CONFIG", "simple")
+
+
+def is_postgres(queryset):
+    return connections[queryset.db].vendor == "postgresql"
+
+
+def product_search_vector():
+    """Weighted tsvector over name, brand, category name and description."""
+
+    config = search_config()
+    category_name = Coalesce(
+        Subquery(Category.objects.filter(pk=OuterRef("category_id")).values("name")[:1]),
+        Value(""),
+        output_field=TextField(),
+    )
+
+    return (
+        SearchVector("name", weight="A", config=config)
+        + SearchVector("brand", weight="B", config=config)
+        + SearchVector(category_name, weight="B", config=config)
+        + SearchVector("description", weight="C", config=config)
+    )
+
+
+def refresh_search_vectors(queryset):
+    """Rebuild ``search_vector`` for every product in the queryset with one UPDATE."""
+
+    if not is_postgres(queryset):
+        return 0
+
+    return queryset.update(search_vector=product_search_vector())
+
+
+def search_products(queryset, query):
+    """
+    Filter products matching ``query`` and annotate them with a ``rank``.
+
+    On PostgreSQL the GIN indexed ``search_vector`` is used. Other backends
+    (local sqlite runs) have no full-text index and fall back to substring
+    matching with a constant rank.
+    """
+
+    if is_postgres(queryset):
+        search_query = SearchQuery(query, search_type="websearch", config=search_config())
+        # ts_rank is a float4, as a float8 it compares equal to the cursor's value on the next page
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=Cast(SearchRank(F("search_vector"), search_query), FloatField())
+        )
+
+    condition = Q()
+    for term in query.split():
+        condition &= (
+            Q(name__icontains=term)
+            | Q(brand__icontains=term)
+            | Q(description__icontains=term)
+            | Q(category__name__icontains=term)
+        )
+
+    return queryset.filter(condition).annotate(rank=Value(0.0, output_field=FloatField()))
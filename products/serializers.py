@@ -1,23 +1,189 @@
 from rest_framework import serializers
-from products.models import Category, Product, Cart
+from products.discount_codes import CODE_LENGTH, MAX_CODE_LENGTH, MIN_CODE_LENGTH
+from products.discounts import discount_by_code
+from products.models import Category, Product, ProductImage, Cart, CartItem
+from utils import error_messages
 
 
-class CategorySerializer(serializers.ModelSerializer):
+def sparse_fieldset(request):
+    """The ``(fields, omit)`` name sets asked for with ``?fields=a,b`` and ``?omit=c`` on a GET."""
+
+    if request is None or request.method != "GET":
+        return None, set()
+
+    def names(param):
+        value = request.query_params.get(param)
+        return {name.strip() for name in value.split(",") if name.strip()} if value else None
+
+    return names("fields"), names("omit") or set()
+
+
+def select_fields(names, request):
+    """Filter ``names`` down to the requested sparse fieldset, ``id`` is kept unless omitted."""
+
+    fields, omit = sparse_fieldset(request)
+    return [
+        name for name in names
+        if (fields is None or name in fields or name == "id") and name not in omit
+    ]
+
+
+class SparseFieldsetMixin:
+    """Serializes only the fields selected by the request's ``?fields=`` / ``?omit=``."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        keep = select_fields(fields, self.context.get("request"))
+
+        return {name: fields[name] for name in keep}
+
+
+class CategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Category
         fields = "__all__"
 
+    def validate_parent(self, parent):
+        if parent is not None and self.instance is not None and parent.path.startswith(self.instance.path):
+            raise serializers.ValidationError(error_messages.ERR_INVALID_CATEGORY_PARENT)
+        return parent
+
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductImageSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = ProductImage
+        fields = ("product_image_id", "url", "thumbnail_url", "alt_text", "position", "is_primary")
+
+
+def product_gallery(product):
+    """
+    Images of ``product`` in gallery order. Uses the ``gallery`` list the
+    views prefetch (see products.views.with_gallery) and only falls back to
+    a query for a product loaded without it.
+    """
+
+    gallery = getattr(product, "gallery", None)
+    if gallery is None:
+        gallery = list(product.images.order_by("position", "pk"))
+    return gallery
+
+
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+
+    primary_image = serializers.SerializerMethodField()
+    gallery = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
-        fields = "__all__"
+        exclude = ("search_vector",)
+        read_only_fields = ("view_count", "rating_sum", "average_rating", "review_count")
+
+    def get_primary_image(self, product):
+        gallery = product_gallery(product)
+        # the first image stands in when none is flagged primary
+        primary = next((image for image in gallery if image.is_primary), gallery[0] if gallery else None)
+        return ProductImageSerializer(primary).data if primary else None
+
+    def get_gallery(self, product):
+        return ProductImageSerializer(product_gallery(product), many=True).data
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartProductSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Product
+        fields = ("id", "name", "slug", "brand", "price", "is_active")
+
+
+class CartItemSerializer(serializers.ModelSerializer):
+
+    product_id = serializers.IntegerField(read_only=True)
+    # load lines with select_related("product"), see products.carts.cart_lines
+    product = CartProductSerializer(read_only=True)
+
+    class Meta:
+        model = CartItem
+        fields = ("product_id", "product", "quantity", "version", "unit_price_snapshot")
+
+
+class CartSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+
+    # lines are changed through /carts/me/items/, see products.carts
+    items = CartItemSerializer(many=True, read_only=True)
+    # resolved through the code cache, see products.discounts
+    discount_code = serializers.CharField(write_only=True, required=False, allow_null=True)
 
     class Meta:
         model = Cart
-        fields = "__all__"
+        exclude = ("store_revision",)
+        # maintained by products.pricing
+        read_only_fields = ("subtotal", "eligible_subtotal", "total_amount")
+
+    def validate_discount_code(self, value):
+        # null takes the discount off
+        if value is None:
+            return None
+        discount = discount_by_code(value)
+        if discount is None or not discount.is_live():
+            raise serializers.ValidationError(error_messages.ERR_INVALID_DISCOUNT_CODE)
+        return discount
+
+    def validate(self, attrs):
+        if "discount_code" in attrs:
+            attrs.pop("discount", None)
+            discount = attrs.pop("discount_code")
+            attrs["discount_id"] = None if discount is None else discount.pk
+
+        user = attrs.get("user", getattr(self.instance, "user", None))
+        status = attrs.get("status", getattr(self.instance, "status", Cart.active))
+
+        if user is not None and status == Cart.active:
+            active = Cart.objects.filter(user=user, status=Cart.active)
+            if self.instance is not None:
+                active = active.exclude(pk=self.instance.pk)
+            if active.exists():
+                raise serializers.ValidationError({"user": [error_messages.ERR_ACTIVE_CART_EXISTS]})
+
+        return attrs
+
+
+class CartDiscountSerializer(CartSerializer):
+    """The discount code of the user's own cart, the only part of it they set directly."""
+
+    discount_code = serializers.CharField(write_only=True, allow_null=True)
+
+    class Meta(CartSerializer.Meta):
+        exclude = None
+        fields = ("discount_code",)
+
+    def update(self, instance, validated_data):
+        # the rest of the instance may be stale, e.g. checked out meanwhile
+        instance.discount_id = validated_data["discount_id"]
+        instance.save(update_fields=["discount", "updated_at"])
+        return instance
+
+
+class ActiveDiscountSerializer(serializers.Serializer):
+    """A discount valid now, read from its compiled rule (see products.discounts)."""
+
+    id = serializers.IntegerField(source="pk")
+    code = serializers.CharField()
+    title = serializers.CharField()
+    type = serializers.CharField()
+    value = serializers.DecimalField(max_digits=10, decimal_places=2)
+    ends_at = serializers.DateTimeField()
+
+
+class DiscountCodesSerializer(serializers.Serializer):
+    """A request for one-time codes from a template discount, see products.discount_codes."""
+
+    # larger batches go through the generate_discount_codes command
+    MAX_COUNT = 100_000
+
+    count = serializers.IntegerField(min_value=1, max_value=MAX_COUNT)
+    prefix = serializers.CharField(required=False, allow_blank=True, default="", max_length=20)
+    length = serializers.IntegerField(
+        required=False, default=CODE_LENGTH, min_value=MIN_CODE_LENGTH, max_value=MAX_CODE_LENGTH
+    )
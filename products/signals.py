@@ -0,0 +1,204 @@
+from django.db.models import Value
+from django.db.models.functions import Concat, Now, Substr
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from products.cache import invalidate_category_tree, invalidate_detail, invalidate_details
+from products.cart_store import cart_store
+from products.discounts import forget_compiled, invalidate_active, invalidate_code
+from products.facets import (
+    adjust_facet_counts,
+    facet_keys_of,
+    move_facet_counts,
+    rebuild_facet_counts,
+    stored_facet_keys,
+)
+from products.models import Cart, Category, Comment, Discount, Product, ProductImage
+from products.pricing import recompute_totals
+from products.ratings import apply_rating_change, contribution_of, stored_contribution
+from products.search import refresh_search_vectors
+from products.serializers import CategorySerializer, ProductSerializer
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_facets(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    instance._stored_facet_keys = set() if instance._state.adding else stored_facet_keys(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def update_product_facets(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    move_facet_counts(getattr(instance, "_stored_facet_keys", set()), facet_keys_of(instance))
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_facets(sender, instance, **kwargs):
+    adjust_facet_counts(facet_keys_of(instance), -1)
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_vector(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    refresh_search_vectors(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Category)
+def update_category_products_search_vector(sender, instance, created, raw=False, **kwargs):
+    # a new category has no products yet
+    if raw or created:
+        return
+
+    refresh_search_vectors(Product.objects.filter(category_id=instance.pk))
+
+
+@receiver(pre_delete, sender=Category)
+def reroot_subcategories(sender, instance, **kwargs):
+    if not instance.path:
+        return
+
+    # children are detached (parent SET_NULL), so "/1/4/9/" becomes "/9/" when 4 goes
+    descendants = Category.objects.filter(path__startswith=instance.path).exclude(pk=instance.pk)
+    moved = list(descendants.values_list("pk", flat=True))
+    descendants.update(path=Concat(Value("/"), Substr("path", len(instance.path) + 1)), updated_at=Now())
+    invalidate_details(Category, moved, CategorySerializer)
+
+
+@receiver(post_delete, sender=Category)
+def recount_uncategorized_facets(sender, instance, **kwargs):
+    # the category's products were moved to NULL by a bulk update, no product signals ran
+    rebuild_facet_counts([None])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_detail(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    invalidate_detail(Product, instance.pk, ProductSerializer)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def touch_image_product(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    # images are embedded in the product payload, its validators and cache entry change with them
+    Product.objects.filter(pk=instance.product_id).update(updated_at=Now())
+    invalidate_detail(Product, instance.product_id, ProductSerializer)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_detail(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    # a moved category rewrote its subtree's paths in save()
+    invalidate_details(Category, [instance.pk, *getattr(instance, "_moved_descendants", ())], CategorySerializer)
+    instance._moved_descendants = ()
+    invalidate_category_tree()
+
+
+@receiver(pre_save, sender=Comment)
+def remember_comment_rating(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    instance._stored_contribution = {} if instance._state.adding else stored_contribution(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def update_product_rating(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    apply_rating_change(getattr(instance, "_stored_contribution", {}), contribution_of(instance))
+
+
+@receiver(post_delete, sender=Comment)
+def remove_product_rating(sender, instance, **kwargs):
+    apply_rating_change(contribution_of(instance), {})
+
+
+@receiver(pre_save, sender=Cart)
+def remember_cart_discount(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    instance._stored_discount_id = (
+        None if instance._state.adding
+        else Cart.objects.filter(pk=instance.pk).values_list("discount_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Cart)
+def recompute_cart_totals(sender, instance, created, raw=False, **kwargs):
+    # line changes move the totals themselves, a new discount needs the whole cart
+    if raw or created or instance.discount_id == getattr(instance, "_stored_discount_id", None):
+        return
+
+    recompute_totals([instance.pk])
+    instance.refresh_from_db(fields=["subtotal", "eligible_subtotal", "total_amount"])
+
+
+@receiver(pre_save, sender=Discount)
+def remember_discount_code(sender, instance, raw=False, **kwargs):
+    instance._stored_code = (
+        None if raw or instance._state.adding
+        else Discount.objects.filter(pk=instance.pk).values_list("code", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Discount)
+@receiver(post_delete, sender=Discount)
+def invalidate_discount_caches(sender, instance, **kwargs):
+    # a renamed code is dropped too, a new one may have been cached as missing
+    invalidate_code(instance.code, getattr(instance, "_stored_code", None))
+    forget_compiled(instance.pk)
+    invalidate_active()
+
+
+@receiver(post_save, sender=Discount)
+def recompute_discounted_carts(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+
+    recompute_totals(Cart.objects.filter(discount=instance, status=Cart.active))
+
+
+@receiver(pre_delete, sender=Discount)
+@receiver(pre_delete, sender=Product)
+def remember_affected_carts(sender, instance, **kwargs):
+    # the carts lose the discount (SET_NULL) or the product's lines (CASCADE) without signals
+    lookup = {"discount": instance} if sender is Discount else {"items__product": instance}
+    instance._affected_cart_ids = list(
+        Cart.objects.filter(status=Cart.active, **lookup).values_list("pk", flat=True).distinct()
+    )
+
+
+@receiver(post_delete, sender=Discount)
+@receiver(post_delete, sender=Product)
+def recompute_affected_carts(sender, instance, **kwargs):
+    recompute_totals(getattr(instance, "_affected_cart_ids", ()))
+
+
+@receiver(post_save, sender=Cart)
+def refresh_stored_cart(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    cart_store().refresh(instance)
+
+
+@receiver(post_delete, sender=Cart)
+def forget_stored_cart(sender, instance, **kwargs):
+    cart_store().forget(instance.user_id)
@@ -1,6 +1,6 @@
 from datetime import timedelta
 import pytest
-from products.models import Category
+from products.models import Cart, Category
 from django.utils import timezone
 
 
@@ -71,14 +71,32 @@ def cart_data(make_authorized_client):
 
         return {
             "user": user.id if is_post_method_data else user,
-            "items": [
-                {"product_id": 1, "quantity": 4},
-                {"product_id": 2, "quantity": 2},
-            ],
             "subtotal": 0.00,
             "total_amount": 0.00,
             "status": "ACTIVE",
             "expires_at": timezone.now() + timedelta(days=7),
         }
 
-    return _make
\ No newline at end of file
+    return _make
+
+@pytest.fixture
+def product(make_product):
+    return make_product("Test Product", "50.00")
+
+
+# returns the client of a user with an active cart, and the cart
+@pytest.fixture
+def cart_user(make_authorized_client, cart_data):
+    client, user = make_authorized_client("09140329711")
+    cart = Cart.objects.create(**cart_data(False, user))
+    return client, cart
+
+
+@pytest.fixture(autouse=True)
+def view_count_buffer(monkeypatch):
+    """A fresh view count buffer without the background flusher, tests flush it explicitly."""
+    from products import view_counts
+
+    buffer = view_counts.ViewCountBuffer(flush_interval=0, max_pending=100)
+    monkeypatch.setattr(view_counts, "buffer", buffer)
+    return buffer
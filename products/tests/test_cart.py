@@ -1,8 +1,12 @@
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 import pytest
 from rest_framework.test import APIClient
 from django.urls import reverse
 from rest_framework import status
-from products.models import Cart, Product
+from products.carts import active_cart
+from products.models import Cart, CartItem, Product
 
 
 @pytest.mark.django_db
@@ -44,7 +48,7 @@ def test_create_cart_with_auth_returns_201(make_authorized_client, cart_data):
     response = client.post(url, data, format="json")
 
     assert response.status_code == status.HTTP_201_CREATED
-    assert response.data["items"] == data["items"]
+    assert response.data["items"] == []
 
 
 @pytest.mark.django_db
@@ -77,7 +81,7 @@ def test_get_single_cart_returns_200(make_authorized_client, cart_data):
     response = client.get(url)
 
     assert response.status_code == status.HTTP_200_OK
-    assert response.data["items"] == cart.items
+    assert response.data["items"] == []
 
 
 @pytest.mark.django_db
@@ -140,6 +144,152 @@ def test_add_items_to_cart_returns_200(make_authorized_client, cart_data, produc
     response = client.post(url, data=request_data, content_type="application/json")
 
     assert response.status_code == status.HTTP_200_OK
+    assert [(item["product_id"], item["quantity"]) for item in response.data["items"]] == [
+        (product_one.id, 2),
+        (product_two.id, 2),
+    ]
+
+
+@pytest.mark.django_db
+def test_adding_a_product_twice_adds_to_its_quantity(make_authorized_client, cart_data, product_data):
+
+    client, user = make_authorized_client("09140329711")
+
+    cart = Cart.objects.create(**cart_data(False, user))
+    product = Product.objects.create(**product_data())
+
+    url = reverse("carts-me-items")
+
+    client.post(url, data=[{"product_id": product.id, "quantity": 1}], content_type="application/json")
+    client.post(url, data=[{"product_id": product.id, "quantity": 3}], content_type="application/json")
+
+    item = CartItem.objects.get(cart=cart)
+    assert (item.product_id, item.quantity, item.unit_price_snapshot) == (product.id, 4, Decimal("99.99"))
+
+
+@pytest.mark.django_db
+def test_add_items_with_invalid_quantity_returns_400(make_authorized_client, cart_data, product_data):
+
+    client, user = make_authorized_client("09140329711")
+
+    Cart.objects.create(**cart_data(False, user))
+    product = Product.objects.create(**product_data())
+
+    url = reverse("carts-me-items")
+
+    response = client.post(url, data=[{"product_id": product.id, "quantity": 0}], content_type="application/json")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert not CartItem.objects.exists()
+
+
+@pytest.mark.django_db
+def test_change_item_quantity_returns_200(make_authorized_client, cart_data, product_data):
+
+    client, user = make_authorized_client("09140329711")
+
+    cart = Cart.objects.create(**cart_data(False, user))
+    product = Product.objects.create(**product_data())
+    CartItem.objects.create(cart=cart, product=product, quantity=1, unit_price_snapshot=product.price)
+
+    url = reverse("carts-me-items-delete", kwargs={"item_id": product.id})
+
+    response = client.patch(url, data={"quantity": 5}, format="json")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["items"][0]["quantity"] == 5
+
+
+@pytest.fixture
+def cart_line(make_authorized_client, cart_data, product_data):
+    client, user = make_authorized_client("09140329711")
+
+    cart = Cart.objects.create(**cart_data(False, user))
+    product = Product.objects.create(**product_data())
+    line = CartItem.objects.create(cart=cart, product=product, quantity=2, unit_price_snapshot=product.price)
+
+    return client, line, reverse("carts-me-items-delete", kwargs={"item_id": product.id})
+
+
+@pytest.mark.django_db
+def test_delta_quantity_update_bumps_the_version(cart_line):
+
+    client, line, url = cart_line
+
+    response = client.patch(url, data={"delta": 3}, format="json")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response["ETag"] == '"2"'
+    line.refresh_from_db()
+    assert (line.quantity, line.version) == (5, 2)
+
+
+@pytest.mark.django_db
+def test_quantity_update_with_current_version_returns_200(cart_line):
+
+    client, line, url = cart_line
+
+    response = client.patch(url, data={"quantity": 7}, format="json", HTTP_IF_MATCH='"1"')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["items"][0]["version"] == 2
+
+
+@pytest.mark.django_db
+def test_quantity_update_with_stale_version_returns_412(cart_line):
+
+    client, line, url = cart_line
+
+    client.patch(url, data={"delta": 1}, format="json")
+    response = client.patch(url, data={"quantity": 7}, format="json", HTTP_IF_MATCH='"1"')
+
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    line.refresh_from_db()
+    assert (line.quantity, line.version) == (3, 2)
+
+
+@pytest.mark.django_db
+def test_delta_below_one_returns_400(cart_line):
+
+    client, line, url = cart_line
+
+    response = client.patch(url, data={"delta": -2}, format="json")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    line.refresh_from_db()
+    assert line.quantity == 2
+
+
+@pytest.mark.django_db
+def test_quantity_and_delta_together_returns_400(cart_line):
+
+    client, _, url = cart_line
+
+    response = client.patch(url, data={"quantity": 1, "delta": 1}, format="json")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_quantity_update_of_missing_item_returns_404(cart_line):
+
+    client, _, _ = cart_line
+
+    url = reverse("carts-me-items-delete", kwargs={"item_id": 999})
+    response = client.patch(url, data={"delta": 1}, format="json")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_adding_to_a_line_bumps_its_version(cart_line):
+
+    client, line, _ = cart_line
+
+    client.post(reverse("carts-me-items"), data=[{"product_id": line.product_id}], content_type="application/json")
+
+    line.refresh_from_db()
+    assert (line.quantity, line.version) == (3, 2)
 
 
 @pytest.mark.django_db
@@ -151,12 +301,170 @@ def test_delete_items_from_cart_returns_204(
 
     data = cart_data(False, user)
 
-    Cart.objects.create(**data)
+    cart = Cart.objects.create(**data)
 
-    product = product_data()
+    product = Product.objects.create(**product_data())
+    CartItem.objects.create(cart=cart, product=product, quantity=1, unit_price_snapshot=product.price)
 
-    url = reverse("carts-me-items-delete", kwargs={"item_id": 1})
+    url = reverse("carts-me-items-delete", kwargs={"item_id": product.id})
 
     response = client.delete(url)
 
     assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert not CartItem.objects.filter(cart=cart).exists()
+
+
+@pytest.mark.django_db
+def test_delete_missing_item_from_cart_returns_404(make_authorized_client, cart_data):
+
+    client, user = make_authorized_client("09140329711")
+
+    Cart.objects.create(**cart_data(False, user))
+
+    url = reverse("carts-me-items-delete", kwargs={"item_id": 1})
+
+    response = client.delete(url)
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def make_products(product_data, count):
+    data = product_data()
+    products = []
+    for i in range(count):
+        data.update(slug=f"bulk-{i}", sku=f"bulk-{i}")
+        products.append(Product.objects.create(**data))
+    return products
+
+
+@pytest.mark.django_db
+def test_add_items_validates_products_with_one_query(make_authorized_client, cart_data, product_data):
+
+    client, user = make_authorized_client("09140329711")
+
+    Cart.objects.create(**cart_data(False, user))
+    products = make_products(product_data, 20)
+
+    url = reverse("carts-me-items")
+    request_data = [{"product_id": product.id, "quantity": 1} for product in products]
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.post(url, data=request_data, content_type="application/json")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.data["items"]) == 20
+    product_selects = [q["sql"] for q in ctx.captured_queries if 'FROM "products_product"' in q["sql"]]
+    assert len(product_selects) == 1
+
+
+@pytest.mark.django_db
+def test_add_inactive_product_returns_400(make_authorized_client, cart_data, product_data):
+
+    client, user = make_authorized_client("09140329711")
+
+    Cart.objects.create(**cart_data(False, user))
+    active, = make_products(product_data, 1)
+    inactive = Product.objects.create(**{**product_data(), "slug": "off", "sku": "off", "is_active": False})
+
+    url = reverse("carts-me-items")
+    request_data = [{"product_id": active.id, "quantity": 1}, {"product_id": inactive.id, "quantity": 1}]
+
+    response = client.post(url, data=request_data, content_type="application/json")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert not CartItem.objects.exists()
+
+
+@pytest.mark.django_db
+def test_add_unknown_product_returns_404(make_authorized_client, cart_data):
+
+    client, user = make_authorized_client("09140329711")
+
+    Cart.objects.create(**cart_data(False, user))
+
+    url = reverse("carts-me-items")
+
+    response = client.post(url, data=[{"product_id": 999, "quantity": 1}], content_type="application/json")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_active_cart_is_created_once_in_one_query(make_authorized_client):
+
+    _, user = make_authorized_client("09140329711")
+
+    with CaptureQueriesContext(connection) as ctx:
+        cart = active_cart(user)
+    assert len(ctx.captured_queries) == 1
+
+    assert active_cart(user).pk == cart.pk
+    assert Cart.objects.filter(user=user).count() == 1
+
+
+@pytest.mark.django_db
+def test_reading_the_active_cart_does_not_use_up_ids(make_authorized_client):
+
+    _, user = make_authorized_client("09140329711")
+    _, other = make_authorized_client("09120000000")
+    first = active_cart(user)
+
+    with CaptureQueriesContext(connection) as ctx:
+        for _ in range(3):
+            assert active_cart(user).pk == first.pk
+    assert len(ctx.captured_queries) == 3
+
+    assert active_cart(other).pk == first.pk + 1
+
+
+@pytest.mark.django_db
+def test_get_cart_skips_expired_carts(make_authorized_client, cart_data):
+
+    client, user = make_authorized_client("09140329711")
+
+    expired = Cart.objects.create(**{**cart_data(False, user), "status": Cart.expired})
+
+    response = client.get(reverse("carts-me"))
+
+    assert response.data["id"] != expired.id
+    assert response.data["status"] == Cart.active
+
+
+@pytest.mark.django_db
+def test_get_cart_query_count_does_not_grow_with_items(make_authorized_client, product_data):
+
+    client, user = make_authorized_client("09140329711")
+
+    products = make_products(product_data, 6)
+    url = reverse("carts-me")
+
+    def queries():
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url)
+        return len(ctx.captured_queries), response
+
+    client.post(reverse("carts-me-items"), data=[{"product_id": products[0].id}], content_type="application/json")
+    few, _ = queries()
+
+    client.post(
+        reverse("carts-me-items"),
+        data=[{"product_id": product.id} for product in products[1:]],
+        content_type="application/json",
+    )
+    many, response = queries()
+
+    assert few == many
+    assert [item["product"]["id"] for item in response.data["items"]] == [product.id for product in products]
+
+
+@pytest.mark.django_db
+def test_second_active_cart_returns_400(make_authorized_client, cart_data):
+
+    client, user = make_authorized_client("09140329711", True)
+
+    Cart.objects.create(**cart_data(False, user))
+
+    response = client.post(reverse("carts-list"), cart_data(True, user), format="json")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "user" in response.data
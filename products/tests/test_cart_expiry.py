@@ -0,0 +1,62 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management import call_command
+from django.utils import timezone
+import pytest
+from products.expiry import expire_carts, purge_expired_carts
+from products.models import Cart, CartItem, Product
+
+
+@pytest.fixture
+def make_cart(make_authorized_client):
+    users = iter(range(10))
+
+    def _make(expires_in_days, status=Cart.active):
+        # a user has one active cart at most
+        _, user = make_authorized_client(f"0914032970{next(users)}")
+        return Cart.objects.create(
+            user=user, status=status, expires_at=timezone.now() + timedelta(days=expires_in_days)
+        )
+
+    return _make
+
+
+def statuses():
+    return sorted(Cart.objects.values_list("status", flat=True))
+
+
+@pytest.mark.django_db
+class TestCartExpiry:
+
+    def test_expires_only_active_carts_past_expiry(self, make_cart):
+        make_cart(-1)
+        make_cart(-2)
+        make_cart(3)
+        make_cart(-5, status=Cart.checkedOut)
+
+        assert expire_carts(batch_size=1) == 2
+        assert statuses() == [Cart.active, Cart.checkedOut, Cart.expired, Cart.expired]
+
+    def test_purges_old_expired_carts_with_their_lines(self, make_cart, product_data):
+        product = Product.objects.create(**product_data())
+        old = make_cart(-40, status=Cart.expired)
+        CartItem.objects.create(cart=old, product=product, quantity=2, unit_price_snapshot=product.price)
+        make_cart(-1, status=Cart.expired)
+
+        assert purge_expired_carts(timezone.now() - timedelta(days=30), batch_size=1) == 1
+        assert Cart.objects.count() == 1
+        assert not CartItem.objects.exists()
+
+    def test_command_archives_purged_carts(self, make_cart, product_data, tmp_path):
+        product = Product.objects.create(**product_data())
+        old = make_cart(-40)
+        CartItem.objects.create(cart=old, product=product, quantity=2, unit_price_snapshot=product.price)
+        archive = tmp_path / "carts.jsonl"
+
+        call_command("expire_carts", purge_after_days=30, archive=str(archive), pause=0)
+
+        assert not Cart.objects.exists()
+        row = json.loads(archive.read_text())
+        assert row["id"] == old.pk
+        assert row["items"] == [{"product_id": product.pk, "quantity": 2, "unit_price_snapshot": str(Decimal("99.99"))}]
@@ -0,0 +1,149 @@
+from decimal import Decimal
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+import pytest
+from products.models import Cart, Product
+from products.pricing import reprice
+
+
+def add(client, product, quantity):
+    return client.post(
+        reverse("carts-me-items"), data=[{"product_id": product.id, "quantity": quantity}], content_type="application/json"
+    )
+
+
+def totals(cart):
+    cart.refresh_from_db()
+    return cart.subtotal, cart.total_amount
+
+
+@pytest.mark.django_db
+class TestCartPricing:
+
+    def test_line_changes_move_the_totals(self, cart_user, make_product, django_capture_on_commit_callbacks):
+        client, cart = cart_user
+        shoe, hat = make_product("shoe", "100.00"), make_product("hat", "25.50")
+
+        add(client, shoe, 2)
+        response = add(client, hat, 1)
+        assert (response.data["subtotal"], response.data["total_amount"]) == ("225.50", "225.50")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            client.patch(reverse("carts-me-items-delete", kwargs={"item_id": hat.id}), {"quantity": 3}, format="json")
+        assert totals(cart) == (Decimal("276.50"), Decimal("276.50"))
+
+        client.delete(reverse("carts-me-items-delete", kwargs={"item_id": shoe.id}))
+        assert totals(cart) == (Decimal("76.50"), Decimal("76.50"))
+
+    def test_quantity_change_does_not_lock_the_cart(self, cart_user, make_product, django_capture_on_commit_callbacks):
+        client, cart = cart_user
+        hat = make_product("hat", "25.00")
+        add(client, hat, 1)
+
+        with CaptureQueriesContext(connection) as ctx, django_capture_on_commit_callbacks() as callbacks:
+            client.patch(reverse("carts-me-items-delete", kwargs={"item_id": hat.id}), {"quantity": 2}, format="json")
+        assert not [q for q in ctx.captured_queries if "FOR UPDATE" in q["sql"]]
+
+        callbacks[0]()
+        assert totals(cart) == (Decimal("50.00"), Decimal("50.00"))
+
+    def test_percentage_discount_is_capped(self, cart_user, make_product, make_discount):
+        client, cart = cart_user
+        cart.discount = make_discount(value="10.00", max_discount="15.00")
+        cart.save()
+
+        add(client, make_product("shoe", "100.00"), 1)
+        assert totals(cart) == (Decimal("100.00"), Decimal("90.00"))
+
+        add(client, make_product("coat", "200.00"), 1)
+        assert totals(cart) == (Decimal("300.00"), Decimal("285.00"))
+
+    def test_category_discount_applies_to_the_subtree(self, cart_user, make_product, make_discount, make_category, category):
+        client, cart = cart_user
+        child = make_category('child', parent=category)
+        other = make_category('other')
+        cart.discount = make_discount(type="fixed", value="30.00", applies_to="categories", traget_ids=[category.pk])
+        cart.save()
+
+        add(client, make_product("sock", "20.00", category=child), 1)
+        assert totals(cart) == (Decimal("20.00"), Decimal("0.00"))
+
+        add(client, make_product("lamp", "50.00", category=other), 1)
+        assert totals(cart) == (Decimal("70.00"), Decimal("50.00"))
+
+    def test_min_purchase(self, cart_user, make_product, make_discount):
+        client, cart = cart_user
+        cart.discount = make_discount(type="fixed", value="5.00", min_purchase="50.00")
+        cart.save()
+        hat = make_product("hat", "40.00")
+
+        add(client, hat, 1)
+        assert totals(cart) == (Decimal("40.00"), Decimal("40.00"))
+        add(client, hat, 1)
+        assert totals(cart) == (Decimal("80.00"), Decimal("75.00"))
+
+    def test_setting_a_discount_recomputes_the_cart(self, cart_user, make_product, make_discount):
+        client, cart = cart_user
+        add(client, make_product("shoe", "100.00"), 1)
+
+        cart.refresh_from_db()
+        cart.discount = make_discount(type="fixed", value="10.00")
+        cart.save()
+        assert (cart.subtotal, cart.total_amount) == (Decimal("100.00"), Decimal("90.00"))
+
+        cart.discount = None
+        cart.save()
+        assert totals(cart) == (Decimal("100.00"), Decimal("100.00"))
+
+    def test_deactivating_the_discount_drops_it_from_the_totals(self, cart_user, make_product, make_discount):
+        client, cart = cart_user
+        cart.discount = discount = make_discount(type="fixed", value="10.00")
+        cart.save()
+        add(client, make_product("shoe", "100.00"), 1)
+        assert totals(cart) == (Decimal("100.00"), Decimal("90.00"))
+
+        discount.is_active = False
+        discount.save()
+        assert totals(cart) == (Decimal("100.00"), Decimal("100.00"))
+
+    def test_stale_cart_save_keeps_the_totals(self, cart_user, make_product):
+        client, cart = cart_user
+        add(client, make_product("shoe", "100.00"), 1)
+
+        cart.status = Cart.expired
+        cart.save()
+        assert totals(cart) == (Decimal("100.00"), Decimal("100.00"))
+
+    def test_reprice_snapshots_new_prices(self, cart_user, make_product):
+        client, cart = cart_user
+        shoe = make_product("shoe", "100.00")
+        add(client, shoe, 2)
+
+        Product.objects.filter(pk=shoe.pk).update(price="80.00")
+        assert reprice(Cart.objects.all(), chunk_size=1) == 1
+
+        assert totals(cart) == (Decimal("160.00"), Decimal("160.00"))
+        assert cart.items.get().unit_price_snapshot == Decimal("80.00")
+
+    def test_reprice_command_filters_by_product(self, cart_user, make_product):
+        client, cart = cart_user
+        shoe, hat = make_product("shoe", "100.00"), make_product("hat", "10.00")
+        add(client, shoe, 1)
+
+        Product.objects.filter(pk=shoe.pk).update(price="90.00")
+        call_command("reprice_carts", product=[hat.pk])
+        assert totals(cart) == (Decimal("100.00"), Decimal("100.00"))
+
+        call_command("reprice_carts", product=[shoe.pk])
+        assert totals(cart) == (Decimal("90.00"), Decimal("90.00"))
+
+    def test_deleting_a_product_drops_its_lines_from_the_totals(self, cart_user, make_product):
+        client, cart = cart_user
+        shoe, hat = make_product("shoe", "100.00"), make_product("hat", "10.00")
+        add(client, shoe, 1)
+        add(client, hat, 1)
+
+        shoe.delete()
+        assert totals(cart) == (Decimal("10.00"), Decimal("10.00"))
@@ -0,0 +1,153 @@
+import os
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+import pytest
+import redis
+from orders.services import checkout
+from products.cart_store import DIRTY_KEY, RedisCartStore, cart_store
+from products.models import Cart, CartItem
+
+
+@pytest.fixture
+def redis_store(settings):
+    settings.CART_STORE = "redis"
+    settings.CART_REDIS_URL = os.environ.get("CART_TEST_REDIS_URL", "redis://127.0.0.1:6379/15")
+    store = cart_store()
+    try:
+        store.client.flushdb()
+    except redis.RedisError:
+        pytest.skip("Redis is not available")
+    yield store
+    store.client.flushdb()
+
+
+def add(client, product, quantity):
+    return client.post(
+        reverse("carts-me-items"), data=[{"product_id": product.id, "quantity": quantity}], content_type="application/json"
+    )
+
+
+@pytest.mark.django_db
+class TestRedisCartStore:
+
+    def test_adds_are_held_in_redis_until_persisted(self, redis_store, cart_user, product):
+        client, cart = cart_user
+        user = cart.user
+        add(client, product, 1)
+        response = add(client, product, 2)
+
+        item, = response.data["items"]
+        assert (item["product_id"], item["quantity"], item["unit_price_snapshot"]) == (product.id, 3, "50.00")
+        assert item["product"]["name"] == product.name
+        assert not CartItem.objects.exists()
+        assert redis_store.client.sismember(DIRTY_KEY, user.pk)
+
+        call_command("persist_carts")
+
+        item = CartItem.objects.get()
+        assert (item.product_id, item.quantity) == (product.id, 3)
+        assert not redis_store.client.sismember(DIRTY_KEY, user.pk)
+
+    def test_reads_only_check_the_cart_row_once_loaded(self, redis_store, cart_user):
+        client, _ = cart_user
+        client.get(reverse("carts-me"))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(reverse("carts-me"))
+
+        assert response.status_code == 200
+        assert len([q for q in ctx.captured_queries if "products_cart" in q["sql"]]) == 1
+        assert not [q for q in ctx.captured_queries if "products_cartitem" in q["sql"]]
+
+    def test_database_changes_on_another_worker_drop_the_redis_copy(self, redis_store, settings, cart_user, product):
+        client, cart = cart_user
+        user = cart.user
+        add(client, product, 1)
+        redis_store.persist(user.pk)
+        add(client, product, 1)
+
+        # a worker that cannot reach Redis changes the line in the database
+        other = RedisCartStore(
+            settings.CART_REDIS_URL, ttl=settings.CART_REDIS_TTL_SECONDS, retry_after=settings.CART_REDIS_RETRY_SECONDS
+        )
+        other.down_until = float("inf")
+        other.update_quantity(user, product.id, quantity=5)
+
+        redis_store.persist_dirty()
+        assert CartItem.objects.get().quantity == 5
+        assert client.get(reverse("carts-me")).data["items"][0]["quantity"] == 5
+
+    def test_cart_checked_out_while_redis_was_down_is_not_written_back(self, redis_store, cart_user, product, make_address):
+        client, cart = cart_user
+        user = cart.user
+        add(client, product, 1)
+        redis_store.persist(user.pk)
+        add(client, product, 1)
+
+        redis_store.down_until = float("inf")
+        order = checkout(user, make_address(user))
+        redis_store.down_until = 0
+
+        redis_store.persist_dirty()
+        assert CartItem.objects.get(cart__status=Cart.checkedOut).quantity == 1
+        assert order.items.get().quantity == 1
+        assert client.get(reverse("carts-me")).data["items"] == []
+
+    def test_existing_lines_are_loaded_and_removals_persisted(self, redis_store, cart_user, product):
+        client, cart = cart_user
+        user = cart.user
+        CartItem.objects.create(cart=Cart.objects.get(user=user), product=product, quantity=4, unit_price_snapshot=product.price)
+
+        assert client.get(reverse("carts-me")).data["items"][0]["quantity"] == 4
+
+        url = reverse("carts-me-items-delete", kwargs={"item_id": product.id})
+        assert client.delete(url).status_code == 204
+        assert client.delete(url).status_code == 404
+
+        redis_store.persist(user.pk)
+        assert not CartItem.objects.exists()
+
+    def test_quantity_change(self, redis_store, cart_user, product):
+        client, cart = cart_user
+        user = cart.user
+        add(client, product, 1)
+
+        url = reverse("carts-me-items-delete", kwargs={"item_id": product.id})
+        response = client.patch(url, data={"quantity": 7}, format="json", HTTP_IF_MATCH='"1"')
+
+        assert response.data["items"][0]["quantity"] == 7
+        assert response["ETag"] == '"2"'
+        assert client.patch(url, data={"delta": 1}, format="json", HTTP_IF_MATCH='"1"').status_code == 412
+        assert client.patch(url, data={"delta": -7}, format="json").status_code == 400
+
+        redis_store.persist(user.pk)
+        item = CartItem.objects.get()
+        assert (item.quantity, item.version) == (7, 2)
+
+
+@pytest.mark.django_db
+class TestCartStoreFallback:
+
+    @pytest.fixture(autouse=True)
+    def unreachable_redis(self, settings):
+        settings.CART_STORE = "redis"
+        settings.CART_REDIS_URL = "redis://127.0.0.1:1/0"
+
+    def test_writes_go_to_the_database(self, cart_user, product):
+        client, _ = cart_user
+        response = add(client, product, 2)
+
+        assert response.status_code == 200
+        assert CartItem.objects.get().quantity == 2
+
+    def test_reads_come_from_the_database(self, cart_user, product):
+        client, cart = cart_user
+        user = cart.user
+        CartItem.objects.create(cart=Cart.objects.get(user=user), product=product, quantity=4, unit_price_snapshot=product.price)
+
+        response = client.get(reverse("carts-me"))
+
+        assert response.status_code == 200
+        assert response.data["items"][0]["quantity"] == 4
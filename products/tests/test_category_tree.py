@@ -0,0 +1,109 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+import pytest
+
+
+@pytest.fixture
+def tree_url():
+    return reverse('categories-tree')
+
+
+def path_of(category):
+    category.refresh_from_db()
+    return category.path
+
+
+@pytest.mark.django_db
+class TestCategoryPath:
+
+    def test_path_is_set_on_create(self, make_category):
+        root = make_category('root')
+        child = make_category('child', parent=root)
+        assert root.path == f'/{root.pk}/'
+        assert path_of(child) == f'/{root.pk}/{child.pk}/'
+
+    def test_moving_a_category_moves_its_subtree(self, make_category):
+        a = make_category('a')
+        b = make_category('b')
+        child = make_category('child', parent=a)
+        grandchild = make_category('grandchild', parent=child)
+        child.parent = b
+        child.save()
+        assert path_of(child) == f'/{b.pk}/{child.pk}/'
+        assert path_of(grandchild) == f'/{b.pk}/{child.pk}/{grandchild.pk}/'
+
+    def test_moving_a_category_refreshes_its_subtree_details(self, authenticated_client, make_category, django_capture_on_commit_callbacks):
+        a = make_category('a')
+        b = make_category('b')
+        child = make_category('child', parent=a)
+        grandchild = make_category('grandchild', parent=child)
+        url = reverse('categories-detail', kwargs={'pk': grandchild.pk})
+        stale = authenticated_client.get(url).data
+        with django_capture_on_commit_callbacks(execute=True):
+            child.parent = b
+            child.save()
+        fresh = authenticated_client.get(url).data
+        assert fresh['path'] == f'/{b.pk}/{child.pk}/{grandchild.pk}/'
+        assert fresh['updated_at'] > stale['updated_at']
+        with django_capture_on_commit_callbacks(execute=True):
+            b.delete()
+        assert authenticated_client.get(url).data['path'] == f'/{child.pk}/{grandchild.pk}/'
+
+    def test_deleting_a_category_reroots_its_children(self, make_category):
+        root = make_category('root')
+        child = make_category('child', parent=root)
+        grandchild = make_category('grandchild', parent=child)
+        child.delete()
+        assert path_of(grandchild) == f'/{grandchild.pk}/'
+        assert path_of(root) == f'/{root.pk}/'
+
+    def test_descendants_is_a_single_prefix_filter(self, make_category):
+        root = make_category('root')
+        child = make_category('child', parent=root)
+        make_category('other')
+        assert set(root.descendants()) == {root, child}
+        assert set(root.descendants(include_self=False)) == {child}
+
+    def test_cannot_move_under_own_descendant(self, authenticated_client, make_category):
+        root = make_category('root')
+        child = make_category('child', parent=root)
+        url = reverse('categories-detail', kwargs={'pk': root.pk})
+        response = authenticated_client.patch(url, {'parent': child.pk}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'parent' in response.data
+
+
+@pytest.mark.django_db
+class TestCategoryTree:
+
+    def test_tree_is_nested_and_ordered(self, authenticated_client, tree_url, make_category):
+        electronics = make_category('electronics', display_order=1)
+        books = make_category('books', display_order=2)
+        laptops = make_category('laptops', parent=electronics)
+        response = authenticated_client.get(tree_url)
+        assert response.status_code == status.HTTP_200_OK
+        assert [node['id'] for node in response.data] == [electronics.id, books.id]
+        assert [node['id'] for node in response.data[0]['children']] == [laptops.id]
+
+    def test_inactive_categories_are_hidden_with_their_subtree(self, authenticated_client, tree_url, make_category):
+        hidden = make_category('hidden', is_active=False)
+        make_category('child', parent=hidden)
+        visible = make_category('visible')
+        response = authenticated_client.get(tree_url)
+        assert [node['id'] for node in response.data] == [visible.id]
+
+    def test_tree_is_cached_and_invalidated(self, authenticated_client, tree_url, make_category):
+        root = make_category('root')
+        authenticated_client.get(tree_url)
+        with CaptureQueriesContext(connection) as ctx:
+            authenticated_client.get(tree_url)
+        assert not [q for q in ctx.captured_queries if 'products_category' in q['sql']]
+        make_category('child', parent=root)
+        response = authenticated_client.get(tree_url)
+        assert len(response.data[0]['children']) == 1
+
+    def test_tree_unauthenticated(self, api_client, tree_url):
+        response = api_client.get(tree_url)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
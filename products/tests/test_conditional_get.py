@@ -0,0 +1,91 @@
+import time
+from unittest import mock
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework import status
+import pytest
+from products.serializers import ProductSerializer
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+
+    @pytest.mark.parametrize('url_name', ['products-list', 'categories-list'])
+    def test_list_sends_validators_and_answers_304(self, authenticated_client, product, url_name):
+        url = reverse(url_name)
+        response = authenticated_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'].startswith('"')
+        assert 'Last-Modified' not in response
+        again = authenticated_client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert again.status_code == status.HTTP_304_NOT_MODIFIED
+        assert again['ETag'] == response['ETag']
+        assert not again.content
+
+    def test_list_304_skips_the_serializer(self, authenticated_client, product):
+        url = reverse('products-list')
+        etag = authenticated_client.get(url)['ETag']
+        with mock.patch.object(ProductSerializer, 'to_representation') as to_representation:
+            response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        to_representation.assert_not_called()
+
+    def test_list_etag_changes_when_a_product_changes(self, authenticated_client, product):
+        url = reverse('products-list')
+        etag = authenticated_client.get(url)['ETag']
+        product.name = 'Renamed'
+        product.save()
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != etag
+
+    def test_list_etag_changes_when_a_next_page_appears(self, authenticated_client, product, make_product, monkeypatch):
+        # the facets would change the ETag too, only the next link is left to do it
+        monkeypatch.setattr('products.views.facet_counts', lambda category: {})
+        url = reverse('products-list')
+        params = {'page_size': 1, 'ordering': 'price'}
+        first = authenticated_client.get(url, params)
+        assert first.data['next'] is None
+        make_product('Dearer Product', '90.00')
+        response = authenticated_client.get(url, params, HTTP_IF_NONE_MATCH=first['ETag'])
+        assert response.status_code == status.HTTP_200_OK
+        assert [item['id'] for item in response.data['results']] == [product.pk]
+        assert response.data['next'] is not None
+
+    def test_list_ignores_if_modified_since(self, authenticated_client, product):
+        url = reverse('products-list')
+        since = http_date(time.time() + 60)
+        etag = authenticated_client.get(url)['ETag']
+        product.delete()
+        response = authenticated_client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['results'] == []
+        assert authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_200_OK
+
+    @pytest.mark.parametrize('url_name', ['products-detail', 'categories-detail'])
+    def test_detail_answers_304_on_matching_etag(self, authenticated_client, product, url_name):
+        pk = product.pk if url_name == 'products-detail' else product.category_id
+        url = reverse(url_name, kwargs={'pk': pk})
+        etag = authenticated_client.get(url)['ETag']
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_detail_etag_changes_after_update(self, authenticated_client, product):
+        url = reverse('products-detail', kwargs={'pk': product.pk})
+        etag = authenticated_client.get(url)['ETag']
+        product.price = '60.00'
+        product.save()
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_detail_answers_304_on_if_modified_since(self, authenticated_client, product):
+        url = reverse('products-detail', kwargs={'pk': product.pk})
+        last_modified = authenticated_client.get(url)['Last-Modified']
+        response = authenticated_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_sparse_fieldsets_have_their_own_etag(self, authenticated_client, product):
+        url = reverse('products-detail', kwargs={'pk': product.pk})
+        full = authenticated_client.get(url)['ETag']
+        sparse = authenticated_client.get(url, {'fields': 'name'})['ETag']
+        assert full != sparse
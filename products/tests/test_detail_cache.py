@@ -0,0 +1,73 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import serializers
+import pytest
+from products.cache import detail_key, serializer_version
+from products.models import Category, Product
+from products.serializers import CategorySerializer, ProductSerializer
+
+
+def product_queries(client, url):
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url)
+    return response, [q for q in ctx.captured_queries if 'products_product' in q['sql']]
+
+
+@pytest.mark.django_db
+class TestProductDetailCache:
+
+    def test_second_read_is_served_from_cache(self, authenticated_client, product):
+        url = reverse('products-detail', kwargs={'pk': product.pk})
+        first, queries = product_queries(authenticated_client, url)
+        assert queries
+        second, queries = product_queries(authenticated_client, url)
+        assert not queries
+        assert second.data == first.data
+
+    def test_save_invalidates_the_cached_payload(self, authenticated_client, product, django_capture_on_commit_callbacks):
+        url = reverse('products-detail', kwargs={'pk': product.pk})
+        authenticated_client.get(url)
+        product.name = 'Renamed'
+        with django_capture_on_commit_callbacks(execute=True):
+            product.save()
+        assert cache.get(detail_key(Product, product.pk, ProductSerializer)) is None
+        assert authenticated_client.get(url).data['name'] == 'Renamed'
+
+    def test_delete_invalidates_the_cached_payload(self, authenticated_client, product, django_capture_on_commit_callbacks):
+        url = reverse('products-detail', kwargs={'pk': product.pk})
+        authenticated_client.get(url)
+        with django_capture_on_commit_callbacks(execute=True):
+            product.delete()
+        assert authenticated_client.get(url).status_code == 404
+
+    def test_category_detail_is_cached_and_invalidated(self, authenticated_client, category, django_capture_on_commit_callbacks):
+        url = reverse('categories-detail', kwargs={'pk': category.pk})
+        authenticated_client.get(url)
+        assert cache.get(detail_key(Category, category.pk, CategorySerializer)) is not None
+        category.name = 'Renamed'
+        with django_capture_on_commit_callbacks(execute=True):
+            category.save()
+        assert authenticated_client.get(url).data['name'] == 'Renamed'
+
+    def test_cache_outage_serves_from_the_database(self, authenticated_client, product, category, settings):
+        # nothing listens there, every cache call fails at once
+        settings.CACHES = {**settings.CACHES, 'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:1/0',
+        }}
+        response = authenticated_client.get(reverse('products-detail', kwargs={'pk': product.pk}))
+        assert response.status_code == 200
+        assert response.data['name'] == product.name
+        assert authenticated_client.get(reverse('categories-detail', kwargs={'pk': category.pk})).status_code == 200
+        assert authenticated_client.get(reverse('categories-tree')).status_code == 200
+
+
+def test_serializer_version_changes_with_the_payload_shape():
+    class Narrower(serializers.ModelSerializer):
+        class Meta:
+            model = Product
+            fields = ('id', 'name')
+
+    assert serializer_version(ProductSerializer) == serializer_version(ProductSerializer)
+    assert serializer_version(Narrower) != serializer_version(ProductSerializer)
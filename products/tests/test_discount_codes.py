@@ -0,0 +1,123 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from django.utils import timezone
+import pytest
+from rest_framework.exceptions import ValidationError
+import products.discount_codes
+from products.discount_codes import generate_codes, random_codes
+from products.discounts import active_discounts
+from products.models import Discount
+from utils.base32 import ALPHABET
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def template(db):
+    now = timezone.now()
+    return Discount.objects.create(
+        title="Campaign", description="d", code="CAMPAIGN", type="fixed", value="15.00", max_discount="0.00",
+        usage_limit_per_user=1, applies_to="categories", traget_ids=[3], starts_at=now - timedelta(days=1),
+        ends_at=now + timedelta(days=30),
+    )
+
+
+def test_random_codes_are_distinct_and_readable():
+    codes = random_codes(2000, prefix="SPR-", length=8)
+
+    assert len(codes) == 2000
+    assert all(code.startswith("SPR-") and len(code) == 12 and set(code[4:]) <= set(ALPHABET) for code in codes)
+
+
+@pytest.mark.django_db
+class TestGenerateCodes:
+
+    def test_codes_copy_the_template(self, template):
+        progress = []
+
+        assert generate_codes(template, 25, prefix="C", chunk_size=10, progress=lambda *p: progress.append(p)) == 25
+
+        codes = Discount.objects.filter(template=template)
+        assert codes.count() == 25
+        assert progress == [(10, 25), (20, 25), (25, 25)]
+        assert set(codes.values_list("type", "value", "usage_limit_total", "usage_limit_per_user")) == {
+            ("fixed", Decimal("15.00"), 1, 1),
+        }
+        assert all(targets == [3] for targets in codes.values_list("traget_ids", flat=True))
+
+    def test_taken_codes_are_replaced(self, template, monkeypatch):
+        batches = iter([{"CAMPAIGN", "A1"}, {"A2"}])
+        monkeypatch.setattr(products.discount_codes, "random_codes", lambda *args: next(batches))
+
+        assert generate_codes(template, 2) == 2
+        assert set(template.generated_codes.values_list("code", flat=True)) == {"A1", "A2"}
+
+    def test_stops_when_a_chunk_is_all_taken(self, template, monkeypatch):
+        batches = iter([{"A1"}, {"CAMPAIGN", "A1"}])
+        monkeypatch.setattr(products.discount_codes, "random_codes", lambda *args: next(batches))
+
+        with pytest.raises(ValidationError):
+            generate_codes(template, 3, chunk_size=2)
+        assert list(template.generated_codes.values_list("code", flat=True)) == ["A1"]
+
+    def test_generated_codes_stay_out_of_the_active_set(self, template):
+        generate_codes(template, 5)
+
+        assert [discount.code for discount in active_discounts()] == ["CAMPAIGN"]
+
+    def test_command_reports_progress(self, template):
+        out = StringIO()
+
+        call_command("generate_discount_codes", template.pk, 12, "--chunk-size", "5", stdout=out)
+
+        assert template.generated_codes.count() == 12
+        assert "10/12 codes" in out.getvalue()
+        assert "Generated 12 codes." in out.getvalue()
+
+    @pytest.mark.parametrize("length", ["5", "31"])
+    def test_command_bounds_the_length(self, template, length):
+        with pytest.raises(CommandError):
+            call_command("generate_discount_codes", template.pk, 1, "--length", length)
+        assert not template.generated_codes.exists()
+
+
+@pytest.mark.django_db
+class TestDiscountCodesEndpoint:
+
+    def test_admin_generates_codes(self, make_authorized_client, template):
+        client, _ = make_authorized_client("09140329711", True)
+
+        response = client.post(
+            reverse("discounts-codes", kwargs={"pk": template.pk}), data={"count": 30, "prefix": "X"}, format="json"
+        )
+
+        assert response.status_code == 201
+        assert response.json() == {"created": 30}
+        assert all(code.startswith("X") for code in template.generated_codes.values_list("code", flat=True))
+
+    def test_count_is_bounded(self, make_authorized_client, template):
+        client, _ = make_authorized_client("09140329711", True)
+
+        response = client.post(
+            reverse("discounts-codes", kwargs={"pk": template.pk}), data={"count": 10**6}, format="json"
+        )
+
+        assert response.status_code == 400
+        assert "count" in response.json()
+
+    def test_requires_admin(self, make_authorized_client, template):
+        client, _ = make_authorized_client("09140329711")
+
+        response = client.post(reverse("discounts-codes", kwargs={"pk": template.pk}), data={"count": 1}, format="json")
+
+        assert response.status_code == 403
+        assert not template.generated_codes.exists()
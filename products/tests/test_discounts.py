@@ -0,0 +1,298 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+import pytest
+import products.discounts
+from orders.models import DiscountUsage, Order
+from products.discounts import (
+    ActiveDiscounts,
+    active_discounts,
+    best_discount,
+    code_key,
+    compile_discount,
+    discount_by_code,
+)
+from products.models import Cart, Discount
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+    products.discounts._active.reset()
+
+
+def line(product_id, quantity, price, path=None):
+    return product_id, quantity, Decimal(price), path
+
+
+@pytest.mark.django_db
+class TestCompiledDiscount:
+
+    def test_product_targets_are_matched_by_id(self, make_discount):
+        evaluator = compile_discount(make_discount(applies_to="products", traget_ids=[1, "3", "x"]))
+
+        assert evaluator.target_ids == frozenset({1, 3})
+        assert evaluator.evaluate([line(1, 2, "10.00"), line(2, 1, "5.00"), line(3, 1, "0.05")]) == (
+            Decimal("25.05"), Decimal("20.05"), Decimal("2.01"),
+        )
+
+    def test_category_target_covers_its_subtree(self, make_discount):
+        evaluator = compile_discount(make_discount(applies_to="categories", traget_ids=[4]))
+
+        assert evaluator.applies(1, "/4/9/")
+        assert evaluator.applies(1, "/2/4/")
+        assert not evaluator.applies(1, "/14/")
+        assert not evaluator.applies(1, None)
+
+    def test_amount_is_capped_and_needs_the_minimum_purchase(self, make_discount):
+        evaluator = compile_discount(make_discount(type="fixed", value="30.00", min_purchase="50.00"))
+
+        assert evaluator.amount(Decimal("40.00"), Decimal("40.00")) == Decimal("0.00")
+        assert evaluator.amount(Decimal("60.00"), Decimal("20.00")) == Decimal("20.00")
+
+        capped = compile_discount(make_discount(code="CAP", value="50.00", max_discount="15.00"))
+        assert capped.amount(Decimal("100.00"), Decimal("100.00")) == Decimal("15.00")
+
+    def test_is_live_checks_the_window_and_usage(self, make_discount):
+        now = timezone.now()
+        evaluator = compile_discount(make_discount(usage_limit_total=2, used_count=1))
+
+        assert evaluator.is_live(now)
+        assert not evaluator.is_live(now + timedelta(days=2))
+        assert not compile_discount(make_discount(code="USED", usage_limit_total=1, used_count=1)).is_live(now)
+        assert not compile_discount(make_discount(code="OFF", is_active=False)).is_live(now)
+
+    def test_rule_is_compiled_once_per_version(self, make_discount):
+        discount = make_discount()
+
+        assert compile_discount(discount) is compile_discount(Discount.objects.get(pk=discount.pk))
+
+        discount.value = "20.00"
+        discount.save()
+
+        assert compile_discount(discount).value == Decimal("20.00")
+
+
+@pytest.mark.django_db
+class TestDiscountCodeCache:
+
+    def test_code_is_read_from_the_database_once(self, make_discount, django_assert_num_queries):
+        discount = make_discount()
+
+        with django_assert_num_queries(1):
+            assert discount_by_code("SALE").pk == discount.pk
+            assert discount_by_code("SALE").pk == discount.pk
+
+    def test_unknown_code_is_cached_until_it_is_created(self, make_discount, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            assert discount_by_code("NEW") is None
+            assert discount_by_code("NEW") is None
+
+        discount = make_discount(code="NEW")
+
+        assert discount_by_code("NEW").pk == discount.pk
+
+    def test_save_and_delete_invalidate_the_code(self, make_discount):
+        discount = make_discount()
+        discount_by_code("SALE")
+
+        discount.code = "SPRING"
+        discount.value = "25.00"
+        discount.save()
+
+        assert cache.get(code_key("SALE")) is None
+        assert discount_by_code("SALE") is None
+        assert discount_by_code("SPRING").value == Decimal("25.00")
+
+        discount.delete()
+
+        assert discount_by_code("SPRING") is None
+
+
+@pytest.mark.django_db
+class TestCartDiscountCode:
+
+    @pytest.fixture
+    def cart(self, cart_data, make_product):
+        cart = Cart.objects.create(**cart_data())
+        product = make_product("shoe", "100.00")
+        cart.items.create(product=product, quantity=2, unit_price_snapshot=product.price)
+        Cart.objects.filter(pk=cart.pk).update(subtotal="200.00", eligible_subtotal="0.00", total_amount="200.00")
+        return cart
+
+    def test_code_applies_the_discount(self, make_authorized_client, make_discount, cart):
+        client, _ = make_authorized_client("09140329711", True)
+        discount = make_discount()
+
+        response = client.patch(
+            reverse("carts-detail", kwargs={"pk": cart.pk}), data={"discount_code": "SALE"}, content_type="application/json"
+        )
+
+        assert response.status_code == 200
+        cart.refresh_from_db()
+        assert cart.discount_id == discount.pk
+        assert cart.total_amount == Decimal("180.00")
+
+    def test_expired_code_is_rejected(self, make_authorized_client, make_discount, cart):
+        client, _ = make_authorized_client("09140329711", True)
+        make_discount(ends_at=timezone.now() - timedelta(hours=1))
+
+        response = client.patch(
+            reverse("carts-detail", kwargs={"pk": cart.pk}), data={"discount_code": "SALE"}, content_type="application/json"
+        )
+
+        assert response.status_code == 400
+        assert "discount_code" in response.json()
+        assert Cart.objects.get(pk=cart.pk).discount_id is None
+
+
+@pytest.mark.django_db
+class TestOwnCartDiscountCode:
+
+    def test_code_applies_and_null_takes_it_off(self, cart_user, make_product, make_discount):
+        client, cart = cart_user
+        product = make_product("shoe", "100.00")
+        client.post(reverse("carts-me-items"), data=[{"product_id": product.id, "quantity": 2}], content_type="application/json")
+        discount = make_discount()
+
+        response = client.patch(reverse("carts-me"), data={"discount_code": "SALE"}, content_type="application/json")
+
+        assert response.status_code == 200
+        assert (response.json()["discount"], response.json()["total_amount"]) == (discount.pk, "180.00")
+        assert Cart.objects.get(pk=cart.pk).discount_id == discount.pk
+
+        response = client.patch(reverse("carts-me"), data={"discount_code": None}, content_type="application/json")
+
+        assert (response.json()["discount"], response.json()["total_amount"]) == (None, "200.00")
+
+    def test_unknown_code_and_other_fields_are_rejected(self, cart_user):
+        client, cart = cart_user
+
+        response = client.patch(reverse("carts-me"), data={"discount_code": "NOPE"}, content_type="application/json")
+        assert response.status_code == 400
+        assert "discount_code" in response.json()
+
+        response = client.patch(reverse("carts-me"), data={"status": Cart.checkedOut}, content_type="application/json")
+        assert response.status_code == 400
+        assert Cart.objects.get(pk=cart.pk).status == Cart.active
+
+
+@pytest.mark.django_db
+class TestActiveDiscounts:
+
+    def test_live_set_moves_at_boundaries_without_queries(self, make_discount, django_assert_num_queries):
+        now = timezone.now()
+        make_discount(code="NOW", starts_at=now - timedelta(hours=1), ends_at=now + timedelta(hours=1))
+        make_discount(code="LATER", starts_at=now + timedelta(hours=2), ends_at=now + timedelta(hours=3))
+        make_discount(code="OFF", is_active=False)
+        make_discount(code="PAST", starts_at=now - timedelta(hours=3), ends_at=now - timedelta(hours=2))
+        active = ActiveDiscounts(check_seconds=3600)
+
+        with django_assert_num_queries(1):
+            assert [d.code for d in active.live(now)] == ["NOW"]
+            assert active.live(now + timedelta(minutes=90)) == ()
+            assert [d.code for d in active.live(now + timedelta(hours=2))] == ["LATER"]
+            assert active.live(now + timedelta(hours=4)) == ()
+
+    def test_reloads_when_a_discount_changes(self, make_discount, django_assert_num_queries):
+        discount = make_discount()
+        assert [d.code for d in active_discounts()] == ["SALE"]
+
+        with django_assert_num_queries(0):
+            active_discounts()
+
+        discount.is_active = False
+        discount.save()
+
+        assert active_discounts() == ()
+
+    def test_other_process_reloads_after_its_check_interval(self, make_discount):
+        active = ActiveDiscounts(check_seconds=0)
+        assert active.live() == ()
+
+        make_discount()
+
+        assert [d.code for d in active.live()] == ["SALE"]
+
+    def test_endpoint_lists_the_live_discounts(self, make_authorized_client, make_discount):
+        client, _ = make_authorized_client("09140329711")
+        make_discount(title="Spring sale")
+
+        response = client.get(reverse("discounts-active"))
+
+        assert response.status_code == 200
+        assert [(d["code"], d["title"], d["value"]) for d in response.json()] == [("SALE", "Spring sale", "10.00")]
+
+
+@pytest.mark.django_db
+class TestBestDiscount:
+
+    @pytest.fixture
+    def shoes(self, make_category):
+        return make_category("shoes", parent=make_category("wear"))
+
+    @pytest.fixture
+    def user(self, make_authorized_client):
+        return make_authorized_client("09140329711")[1]
+
+    def lines(self, shoes):
+        shoes.refresh_from_db()
+        # 200.00 of shoes, 50.00 elsewhere
+        return [line(1, 2, "100.00", shoes.path), line(2, 1, "50.00", "/99/")]
+
+    def test_picks_the_largest_savings(self, make_discount, shoes, user):
+        make_discount(code="ALL5", value="5.00")
+        make_discount(code="FIXED", type="fixed", value="20.00", applies_to="products", traget_ids=[2])
+        best = make_discount(code="WEAR", value="15.00", applies_to="categories", traget_ids=[shoes.parent_id])
+
+        discount, savings = best_discount(self.lines(shoes), user)
+
+        assert (discount.pk, savings) == (best.pk, Decimal("30.00"))
+
+    def test_minimum_purchase_and_free_shipping(self, make_discount, shoes, user):
+        make_discount(code="BIG", type="fixed", value="100.00", min_purchase="1000.00")
+        shipping = make_discount(code="SHIP", type="free_shipping", value="0.00")
+
+        discount, savings = best_discount(self.lines(shoes), user)
+
+        assert (discount.pk, savings) == (shipping.pk, Decimal("0.00"))
+        assert best_discount([], user) is None
+
+    def test_free_shipping_needs_an_eligible_line(self, make_discount, shoes, user):
+        make_discount(code="SHIPHATS", type="free_shipping", value="0.00", applies_to="products", traget_ids=[3])
+        shipping = make_discount(code="SHIPSHOES", type="free_shipping", value="0.00", applies_to="categories", traget_ids=[shoes.pk])
+
+        discount, _ = best_discount(self.lines(shoes), user)
+
+        assert discount.pk == shipping.pk
+        assert best_discount([line(2, 1, "50.00", "/99/")], user) is None
+
+    def test_user_limits_are_respected(self, make_discount, make_address, shoes, user):
+        first = make_discount(code="FIRST", value="50.00", first_purchase_only=True)
+        once = make_discount(code="ONCE", value="40.00", usage_limit_per_user=1)
+        make_discount(code="USEDUP", value="60.00", usage_limit_total=3, used_count=3)
+        other = make_discount(code="OTHER", value="10.00")
+
+        assert best_discount(self.lines(shoes), user)[0].pk == first.pk
+
+        order = Order.objects.create(user=user, shipping_address=make_address(user), order_number="O-1")
+        assert best_discount(self.lines(shoes), user)[0].pk == once.pk
+
+        DiscountUsage.objects.create(discount=once, user=user, order=order)
+        assert best_discount(self.lines(shoes), user)[0].pk == other.pk
+
+    def test_endpoint_returns_the_best_discount(self, make_authorized_client, make_discount, make_product):
+        client, _ = make_authorized_client("09140329711")
+        product = make_product("shoe", "100.00")
+        client.post(reverse("carts-me-items"), data=[{"product_id": product.id, "quantity": 3}], content_type="application/json")
+        make_discount(value="10.00")
+
+        response = client.get(reverse("carts-me-best-discount"))
+
+        assert response.status_code == 200
+        assert response.json()["discount"]["code"] == "SALE"
+        assert response.json()["savings"] == "30.00"
@@ -0,0 +1,96 @@
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+import pytest
+from products.facets import facet_counts
+from products.models import Product, ProductFacetCount
+
+
+@pytest.fixture
+def product_list_url():
+    return reverse('products-list')
+
+
+def listed_ids(response):
+    return {p['id'] for p in response.data['results']}
+
+
+@pytest.mark.django_db
+class TestProductFilters:
+
+    def test_filter_by_category_includes_subcategories(self, authenticated_client, product_list_url, make_category, make_product):
+        electronics = make_category('electronics')
+        laptops = make_category('laptops', parent=electronics)
+        books = make_category('books')
+        phone = make_product(category=electronics)
+        laptop = make_product(category=laptops)
+        make_product(category=books)
+        response = authenticated_client.get(product_list_url, {'category': electronics.id})
+        assert listed_ids(response) == {phone.id, laptop.id}
+
+    def test_filter_by_brand_price_featured_and_rating(self, authenticated_client, product_list_url, make_product):
+        match = make_product(brand='Apple', price='150.00', is_featured=True, average_rating='4.50')
+        make_product(brand='Apple', price='150.00', is_featured=True, average_rating='3.00')
+        make_product(brand='Apple', price='900.00', is_featured=True, average_rating='4.50')
+        make_product(brand='Samsung', price='150.00', is_featured=True, average_rating='4.50')
+        make_product(brand='Apple', price='150.00', is_featured=False, average_rating='4.50')
+        response = authenticated_client.get(product_list_url, {
+            'brand': 'Apple', 'min_price': '100', 'max_price': '200', 'is_featured': 'true', 'min_rating': '4',
+        })
+        assert listed_ids(response) == {match.id}
+
+    def test_invalid_filter_returns_400(self, authenticated_client, product_list_url):
+        response = authenticated_client.get(product_list_url, {'min_price': 'cheap'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'min_price' in response.data
+
+
+@pytest.mark.django_db
+class TestProductFacets:
+
+    def test_list_includes_facet_counts(self, authenticated_client, product_list_url, make_product):
+        make_product(brand='Apple', price='50.00', is_featured=True)
+        make_product(brand='Apple', price='700.00')
+        make_product(brand='Samsung', price='20000.00')
+        response = authenticated_client.get(product_list_url)
+        facets = response.data['facets']
+        assert facets['brand'] == {'Apple': 2, 'Samsung': 1}
+        assert facets['price'] == {'0-100': 1, '500-1000': 1, '10000+': 1}
+        assert facets['is_featured'] == {'true': 1, 'false': 2}
+
+    def test_facets_follow_the_category_filter(self, authenticated_client, product_list_url, make_category, make_product):
+        electronics = make_category('electronics')
+        laptops = make_category('laptops', parent=electronics)
+        make_product(brand='Apple', category=laptops)
+        make_product(brand='Nike', category=make_category('shoes'))
+        response = authenticated_client.get(product_list_url, {'category': electronics.id})
+        assert response.data['facets']['brand'] == {'Apple': 1}
+
+    def test_facets_are_updated_incrementally(self, make_product):
+        product = make_product(brand='Apple', price='50.00')
+        product.brand = 'Samsung'
+        product.price = '600.00'
+        product.save()
+        facets = facet_counts()
+        assert facets['brand'] == {'Samsung': 1}
+        assert facets['price'] == {'500-1000': 1}
+        product.delete()
+        assert facet_counts() == {'brand': {}, 'price': {}, 'is_featured': {}}
+
+    def test_facets_are_not_computed_from_the_product_table(self, make_product):
+        make_product(brand='Apple')
+        Product.objects.update(brand='Samsung')
+        # bulk updates skip signals, the aggregate is what gets served
+        assert facet_counts()['brand'] == {'Apple': 1}
+
+    def test_rebuild_command_repairs_drift(self, make_product):
+        make_product(brand='Apple')
+        Product.objects.update(brand='Samsung')
+        call_command('rebuild_product_facets')
+        assert facet_counts()['brand'] == {'Samsung': 1}
+
+    def test_deleting_a_category_moves_counts_to_uncategorized(self, make_category, make_product):
+        shoes = make_category('shoes')
+        make_product(brand='Nike', category=shoes)
+        shoes.delete()
+        assert ProductFacetCount.objects.filter(category__isnull=True, facet='brand', value='Nike', count=1).exists()
@@ -0,0 +1,74 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+import pytest
+from products.models import Product, ProductImage
+
+
+def make_products(category, count):
+    products = []
+    for i in range(count):
+        product = Product.objects.create(
+            name=f'Product {i}', description='d', category=category, brand='Brand',
+            slug=f'product-{i}', sku=f'SKU-{i}', price='10.00', weight_kg='1.000', dimensions='1x1x1',
+        )
+        for position in (2, 0, 1):
+            ProductImage.objects.create(
+                product=product, url=f'http://example.com/{i}/{position}.png',
+                thumbnail_url=f'http://example.com/{i}/{position}-thumb.png', alt_text='alt',
+                position=position, is_primary=position == 1,
+            )
+        products.append(product)
+    return products
+
+
+def list_queries(client, page_size):
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(reverse('products-list'), {'page_size': page_size})
+    assert response.status_code == 200
+    assert len(response.data['results']) == page_size
+    return len(ctx.captured_queries)
+
+
+@pytest.mark.django_db
+class TestProductImages:
+
+    def test_list_embeds_primary_image_and_ordered_gallery(self, authenticated_client, category):
+        make_products(category, 1)
+        item = authenticated_client.get(reverse('products-list')).data['results'][0]
+        assert [image['position'] for image in item['gallery']] == [0, 1, 2]
+        assert item['primary_image']['position'] == 1
+
+    def test_list_query_count_does_not_grow_with_page_size(self, authenticated_client, category):
+        make_products(category, 10)
+        assert list_queries(authenticated_client, 2) == list_queries(authenticated_client, 10)
+
+    def test_first_image_stands_in_for_missing_primary(self, authenticated_client, category):
+        product, = make_products(category, 1)
+        ProductImage.objects.filter(product=product).update(is_primary=False)
+        item = authenticated_client.get(reverse('products-list')).data['results'][0]
+        assert item['primary_image']['position'] == 0
+
+    def test_product_without_images(self, authenticated_client, category):
+        Product.objects.create(
+            name='Bare', description='d', category=category, brand='Brand',
+            slug='bare', sku='BARE', price='10.00', weight_kg='1.000', dimensions='1x1x1',
+        )
+        item = authenticated_client.get(reverse('products-list')).data['results'][0]
+        assert item['primary_image'] is None
+        assert item['gallery'] == []
+
+    def test_sparse_fieldset_skips_the_image_query(self, authenticated_client, category):
+        make_products(category, 2)
+        with CaptureQueriesContext(connection) as ctx:
+            authenticated_client.get(reverse('products-list'), {'fields': 'name'})
+        assert not any('products_productimage' in q['sql'] for q in ctx.captured_queries)
+
+    def test_image_changes_refresh_the_cached_detail(self, authenticated_client, category):
+        product, = make_products(category, 1)
+        url = reverse('products-detail', kwargs={'pk': product.pk})
+        assert len(authenticated_client.get(url).data['gallery']) == 3
+
+        ProductImage.objects.filter(product=product, position=2).get().delete()
+        data = authenticated_client.get(url).data
+        assert [image['position'] for image in data['gallery']] == [0, 1]
@@ -0,0 +1,94 @@
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+import pytest
+from products.models import Product
+
+
+@pytest.fixture
+def product_list_url():
+    return reverse('products-list')
+
+
+@pytest.fixture
+def make_products(db, category):
+    def _make(count, same_price=False):
+        return [
+            Product.objects.create(
+                name=f'Product {i}',
+                description='Description',
+                category=category,
+                brand='Brand',
+                slug=f'product-{i}',
+                sku=f'SKU-{i}',
+                price='10.00' if same_price else Decimal(i + 1),
+                weight_kg='1.000',
+                dimensions='1x1x1',
+            )
+            for i in range(count)
+        ]
+
+    return _make
+
+
+def walk_pages(client, url):
+    seen = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        seen.extend(item['id'] for item in response.data['results'])
+        url = response.data['next']
+    return seen
+
+
+@pytest.mark.django_db
+class TestProductPagination:
+
+    def test_first_page_has_next_link_only(self, authenticated_client, product_list_url, make_products):
+        make_products(5)
+        response = authenticated_client.get(product_list_url, {'page_size': 2})
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['results']) == 2
+        assert response.data['next'] is not None
+        assert response.data['previous'] is None
+        assert 'count' not in response.data
+
+    def test_walks_every_product_once_newest_first(self, authenticated_client, product_list_url, make_products):
+        products = make_products(7)
+        seen = walk_pages(authenticated_client, f'{product_list_url}?page_size=3')
+        assert seen == [p.id for p in reversed(products)]
+
+    def test_ties_on_sort_key_are_broken_by_id(self, authenticated_client, product_list_url, make_products):
+        products = make_products(5, same_price=True)
+        seen = walk_pages(authenticated_client, f'{product_list_url}?page_size=2&ordering=price')
+        assert seen == [p.id for p in products]
+
+    def test_previous_link_returns_the_previous_page(self, authenticated_client, product_list_url, make_products):
+        make_products(6)
+        first = authenticated_client.get(product_list_url, {'page_size': 2})
+        second = authenticated_client.get(first.data['next'])
+        back = authenticated_client.get(second.data['previous'])
+        assert [p['id'] for p in back.data['results']] == [p['id'] for p in first.data['results']]
+        assert back.data['previous'] is None
+
+    def test_unknown_ordering_falls_back_to_default(self, authenticated_client, product_list_url, make_products):
+        products = make_products(3)
+        response = authenticated_client.get(product_list_url, {'ordering': 'description'})
+        assert [p['id'] for p in response.data['results']] == [p.id for p in reversed(products)]
+
+    def test_invalid_cursor_returns_404(self, authenticated_client, product_list_url, make_products):
+        make_products(1)
+        response = authenticated_client.get(product_list_url, {'cursor': 'not-a-cursor'})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_deep_page_does_not_count_or_offset(self, authenticated_client, product_list_url, make_products):
+        make_products(6)
+        first = authenticated_client.get(product_list_url, {'page_size': 2})
+        second = authenticated_client.get(first.data['next'])
+        with CaptureQueriesContext(connection) as ctx:
+            authenticated_client.get(second.data['next'])
+        product_queries = [q['sql'] for q in ctx.captured_queries if 'products_product' in q['sql']]
+        assert product_queries
+        assert not any('COUNT(' in sql.upper() or 'OFFSET' in sql.upper() for sql in product_queries)
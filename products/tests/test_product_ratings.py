@@ -0,0 +1,76 @@
+from decimal import Decimal
+from django.core.management import call_command
+from django.urls import reverse
+import pytest
+from products.models import Comment, Product
+
+
+@pytest.fixture
+def comment(user, product):
+    def _make(rating, is_approved=True):
+        return Comment.objects.create(
+            user=user, product=product, rating=rating, content='c', is_approved=is_approved
+        )
+
+    return _make
+
+
+def aggregates(product):
+    product.refresh_from_db()
+    return product.rating_sum, product.review_count, product.average_rating
+
+
+@pytest.mark.django_db
+class TestProductRatings:
+
+    def test_approved_comments_update_the_aggregates(self, product, comment):
+        comment(5)
+        comment(4)
+        comment(4)
+        assert aggregates(product) == (13, 3, Decimal('4.33'))
+
+    def test_unapproved_comments_are_not_counted(self, product, comment):
+        comment(5)
+        comment(1, is_approved=False)
+        assert aggregates(product) == (5, 1, Decimal('5.00'))
+
+    def test_approving_and_unapproving(self, product, comment):
+        pending = comment(2, is_approved=False)
+        pending.is_approved = True
+        pending.save()
+        assert aggregates(product) == (2, 1, Decimal('2.00'))
+        pending.is_approved = False
+        pending.save()
+        assert aggregates(product) == (0, 0, Decimal('0.00'))
+
+    def test_editing_a_rating(self, product, comment):
+        comment(5)
+        edited = comment(3)
+        edited.rating = 4
+        edited.save()
+        assert aggregates(product) == (9, 2, Decimal('4.50'))
+
+    def test_deleting_a_comment(self, product, comment):
+        comment(5)
+        comment(2).delete()
+        assert aggregates(product) == (5, 1, Decimal('5.00'))
+
+    def test_saving_a_stale_product_keeps_the_aggregates(self, product, comment):
+        stale = Product.objects.get(pk=product.pk)
+        comment(5)
+        stale.name = 'Renamed'
+        stale.save()
+        assert aggregates(product) == (5, 1, Decimal('5.00'))
+        assert product.name == 'Renamed'
+
+    def test_aggregates_are_read_only_in_the_api(self, authenticated_client, product):
+        url = reverse('products-detail', kwargs={'pk': product.pk})
+        authenticated_client.patch(url, {'average_rating': '5.00', 'review_count': 99}, format='json')
+        assert aggregates(product) == (0, 0, Decimal('0.00'))
+
+    def test_rebuild_command_repairs_drift(self, product, comment):
+        comment(4)
+        comment(3)
+        Product.objects.filter(pk=product.pk).update(rating_sum=100, review_count=1, average_rating='1.00')
+        call_command('rebuild_product_ratings', batch_size=1)
+        assert aggregates(product) == (7, 2, Decimal('3.50'))
@@ -0,0 +1,55 @@
+from django.urls import reverse
+from rest_framework import status
+import pytest
+
+
+@pytest.fixture
+def search_url():
+    return reverse('products-search')
+
+
+@pytest.mark.django_db
+class TestProductSearch:
+
+    def test_search_matches_name(self, authenticated_client, search_url, make_product):
+        laptop = make_product('Gaming Laptop')
+        make_product('Desk Lamp')
+        response = authenticated_client.get(search_url, {'q': 'laptop'})
+        assert response.status_code == status.HTTP_200_OK
+        assert [p['id'] for p in response.data['results']] == [laptop.id]
+
+    def test_search_matches_brand_and_description(self, authenticated_client, search_url, make_product):
+        by_brand = make_product('Notebook Pro', brand='Lenovo')
+        by_description = make_product('Thin Book', description='A light lenovo machine')
+        make_product('Desk Lamp')
+        response = authenticated_client.get(search_url, {'q': 'lenovo'})
+        assert {p['id'] for p in response.data['results']} == {by_brand.id, by_description.id}
+
+    def test_search_matches_category_name(self, authenticated_client, search_url, make_product, make_category):
+        electronics = make_category('Electronics')
+        phone = make_product('Smart Phone', category=electronics)
+        make_product('Desk Lamp')
+        response = authenticated_client.get(search_url, {'q': 'electronics'})
+        assert [p['id'] for p in response.data['results']] == [phone.id]
+
+    def test_search_is_paginated(self, authenticated_client, search_url, make_product):
+        for i in range(3):
+            make_product(f'Laptop {i}')
+        response = authenticated_client.get(search_url, {'q': 'laptop', 'page_size': 2})
+        assert len(response.data['results']) == 2
+        rest = authenticated_client.get(response.data['next'])
+        ids = [p['id'] for p in response.data['results'] + rest.data['results']]
+        assert len(ids) == len(set(ids)) == 3
+
+    def test_search_without_query_returns_400(self, authenticated_client, search_url):
+        response = authenticated_client.get(search_url)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_search_unauthenticated(self, api_client, search_url):
+        response = api_client.get(search_url, {'q': 'laptop'})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_search_vector_is_not_serialized(self, authenticated_client, search_url, make_product):
+        make_product('Gaming Laptop')
+        response = authenticated_client.get(search_url, {'q': 'laptop'})
+        assert 'search_vector' not in response.data['results'][0]
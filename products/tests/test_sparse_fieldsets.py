@@ -0,0 +1,58 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+import pytest
+from products.models import Cart
+
+
+def product_selects(ctx):
+    return [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT') and 'FROM "products_product"' in q['sql']]
+
+
+@pytest.mark.django_db
+class TestSparseFieldsets:
+
+    def test_fields_limits_list_payload_and_columns(self, authenticated_client, product):
+        with CaptureQueriesContext(connection) as ctx:
+            response = authenticated_client.get(reverse('products-list'), {'fields': 'name,price'})
+        assert set(response.data['results'][0]) == {'id', 'name', 'price'}
+        selects = product_selects(ctx)
+        assert selects
+        assert all('"description"' not in sql for sql in selects)
+
+    def test_omit_drops_fields_and_defers_columns(self, authenticated_client, product):
+        with CaptureQueriesContext(connection) as ctx:
+            response = authenticated_client.get(reverse('products-list'), {'omit': 'description,view_count'})
+        item = response.data['results'][0]
+        assert 'description' not in item and 'view_count' not in item
+        assert 'name' in item
+        assert all('"description"' not in sql for sql in product_selects(ctx))
+
+    def test_unknown_fields_are_ignored(self, authenticated_client, product):
+        response = authenticated_client.get(reverse('products-list'), {'fields': 'name,nope'})
+        assert set(response.data['results'][0]) == {'id', 'name'}
+
+    def test_fields_apply_to_cached_detail(self, authenticated_client, product):
+        url = reverse('products-detail', kwargs={'pk': product.pk})
+        assert set(authenticated_client.get(url, {'fields': 'name'}).data) == {'id', 'name'}
+        # the cache keeps the full payload
+        assert 'description' in authenticated_client.get(url).data
+
+    def test_fields_on_categories(self, authenticated_client, category):
+        response = authenticated_client.get(reverse('categories-list'), {'fields': 'name,slug'})
+        assert set(response.data[0]) == {'id', 'name', 'slug'}
+
+    def test_fields_on_own_cart(self, make_authorized_client):
+        client, user = make_authorized_client('09140329711')
+        Cart.objects.create(user=user, expires_at=timezone.now() + timedelta(days=7))
+        response = client.get(reverse('carts-me'), {'omit': 'user,discount'})
+        assert 'user' not in response.data and 'discount' not in response.data
+        assert 'total_amount' in response.data
+
+    def test_writes_ignore_sparse_parameters(self, authenticated_client, product):
+        url = reverse('products-detail', kwargs={'pk': product.pk})
+        response = authenticated_client.patch(f'{url}?fields=name', {'brand': 'Other'}, format='json')
+        assert response.status_code == 200
+        assert response.data['brand'] == 'Other'
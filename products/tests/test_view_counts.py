@@ -0,0 +1,80 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+import pytest
+from products.models import Product
+
+
+def view_count(product):
+    product.refresh_from_db(fields=['view_count'])
+    return product.view_count
+
+
+@pytest.mark.django_db
+class TestViewCounts:
+
+    def test_detail_views_are_buffered_not_written(self, authenticated_client, make_product, view_count_buffer):
+        product = make_product()
+        url = reverse('products-detail', kwargs={'pk': product.pk})
+        for _ in range(3):
+            authenticated_client.get(url)
+        assert view_count(product) == 0
+        assert view_count_buffer.stats()['pending_events'] == 3
+
+    def test_flush_writes_all_products_in_one_update(self, make_product, view_count_buffer):
+        products = [make_product() for _ in range(5)]
+        for i, product in enumerate(products):
+            for _ in range(i + 1):
+                view_count_buffer.record(product.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            assert view_count_buffer.flush() == 15
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        assert len(updates) == 1
+        assert [view_count(p) for p in products] == [1, 2, 3, 4, 5]
+        assert view_count_buffer.stats()['pending_events'] == 0
+        assert view_count_buffer.stats()['flushed_events'] == 15
+
+    def test_flush_refreshes_cached_details(self, authenticated_client, make_product, view_count_buffer, django_capture_on_commit_callbacks):
+        product = make_product()
+        url = reverse('products-detail', kwargs={'pk': product.pk})
+        first = authenticated_client.get(url)
+        with django_capture_on_commit_callbacks(execute=True):
+            view_count_buffer.flush()
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['view_count'] == 1
+        assert response.data['updated_at'] > first.data['updated_at']
+
+    def test_flush_adds_to_existing_counts(self, make_product, view_count_buffer):
+        product = make_product()
+        Product.objects.filter(pk=product.pk).update(view_count=10)
+        view_count_buffer.record(product.pk)
+        view_count_buffer.flush()
+        assert view_count(product) == 11
+
+    def test_events_over_the_limit_are_dropped_and_counted(self, make_product, view_count_buffer):
+        view_count_buffer.max_pending = 2
+        products = [make_product() for _ in range(3)]
+        results = [view_count_buffer.record(p.pk) for p in products]
+        assert results == [True, True, False]
+        # known products keep counting
+        assert view_count_buffer.record(products[0].pk)
+        assert view_count_buffer.stats()['dropped_events'] == 1
+
+    def test_missing_product_is_not_recorded(self, authenticated_client, view_count_buffer):
+        response = authenticated_client.get(reverse('products-detail', kwargs={'pk': 999}))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert view_count_buffer.stats()['pending_events'] == 0
+
+    def test_stats_are_admin_only(self, make_authorized_client, make_product, view_count_buffer):
+        view_count_buffer.record(make_product().pk)
+        url = reverse('products-view-count-stats')
+        customer, _ = make_authorized_client('09120000000')
+        assert customer.get(url).status_code == status.HTTP_403_FORBIDDEN
+        admin, _ = make_authorized_client('09140329711', True)
+        response = admin.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['pending_events'] == 1
+        assert response.data['flush_lag_seconds'] >= 0
+        assert response.data['dropped_events'] == 0
@@ -9,8 +9,11 @@ router.register(r"products", views.ProductViews, basename="products")
 router.register(r"carts", views.CartViews, basename="carts")
 
 urlpatterns = [
+    path("discounts/active/", views.ActiveDiscountsView.as_view(), name="discounts-active"),
+    path("discounts/<int:pk>/codes/", views.DiscountCodesView.as_view(), name="discounts-codes"),
     path("carts/me/", views.GetCartView.as_view(), name="carts-me"),
     path("carts/me/items/", views.UserCart.as_view(), name="carts-me-items"),
+    path("carts/me/best-discount/", views.BestDiscountView.as_view(), name="carts-me-best-discount"),
     path(
         "carts/me/items/<int:item_id>/",
         views.UserCart.as_view(),
@@ -0,0 +1,151 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from products.cache import invalidate_details
+from products.models import Product
+from products.serializers import ProductSerializer
+
+logger = logging.getLogger(__name__)
+
+# products per UPDATE statement
+FLUSH_BATCH_SIZE = 1000
+
+
+def write_view_counts(counts):
+    """
+    Add ``counts`` ({product_id: views}) to ``Product.view_count``, one
+    UPDATE per batch. The products' ``updated_at`` moves and their cached
+    details are dropped, so payloads and ETags show the new counts.
+    """
+
+    items = sorted(counts.items())
+    with transaction.atomic():
+        for start in range(0, len(items), FLUSH_BATCH_SIZE):
+            update_from_values(items[start:start + FLUSH_BATCH_SIZE])
+        invalidate_details(Product, [pk for pk, _ in items], ProductSerializer)
+
+
+def update_from_values(batch):
+    table = connection.ops.quote_name(Product._meta.db_table)
+    values = ", ".join(["(%s, %s)"] * len(batch))
+    params = [value for row in batch for value in row]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} AS p SET view_count = p.view_count + v.views, updated_at = %s "
+            f"FROM (VALUES {values}) AS v(id, views) WHERE p.id = v.id",
+            [timezone.now(), *params],
+        )
+
+
+class ViewCountBuffer:
+    """
+    Per-worker buffer of product views. Views are counted in memory and a
+    background thread adds them to the database every ``flush_interval``
+    seconds, so a hot product never becomes a row lock hotspot. Views still
+    buffered when a worker exits are lost, view_count is an estimate.
+    """
+
+    def __init__(self, flush_interval, max_pending):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.pending_since = None
+        self.dropped_events = 0
+        self.flushed_events = 0
+        self.last_flush_at = None
+        self.flusher = None
+        self.flusher_pid = None
+
+    def record(self, product_id):
+        with self.lock:
+            if product_id not in self.counts and len(self.counts) >= self.max_pending:
+                self.dropped_events += 1
+                return False
+
+            if not self.counts:
+                self.pending_since = time.monotonic()
+            self.counts[product_id] += 1
+
+        self.ensure_flusher()
+        return True
+
+    def flush(self):
+        """Write the buffered views to the database, returns the number of events written."""
+
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+            pending_since, self.pending_since = self.pending_since, None
+
+        if counts:
+            try:
+                write_view_counts(counts)
+            except Exception:
+                logger.exception("Flushing %d product view counts failed", len(counts))
+                with self.lock:
+                    # keep them for the next flush
+                    self.counts.update(counts)
+                    self.pending_since = min(filter(None, (pending_since, self.pending_since)))
+                return 0
+
+        events = sum(counts.values())
+        with self.lock:
+            self.flushed_events += events
+            self.last_flush_at = timezone.now()
+
+        return events
+
+    def stats(self):
+        with self.lock:
+            lag = time.monotonic() - self.pending_since if self.pending_since else 0.0
+            return {
+                "pending_events": sum(self.counts.values()),
+                "pending_products": len(self.counts),
+                "flush_lag_seconds": round(lag, 3),
+                "dropped_events": self.dropped_events,
+                "flushed_events": self.flushed_events,
+                "last_flush_at": self.last_flush_at,
+            }
+
+    def ensure_flusher(self):
+        if not self.flush_interval:
+            return
+
+        # a forked worker does not inherit the parent's thread
+        if self.flusher is not None and self.flusher.is_alive() and self.flusher_pid == os.getpid():
+            return
+
+        with self.lock:
+            if self.flusher is not None and self.flusher.is_alive() and self.flusher_pid == os.getpid():
+                return
+            self.flusher = threading.Thread(target=self.run_flusher, name="product-view-flusher", daemon=True)
+            self.flusher_pid = os.getpid()
+            self.flusher.start()
+
+    def run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            close_old_connections()
+            try:
+                self.flush()
+            finally:
+                # do not hold a connection between flushes
+                connection.close()
+
+
+buffer = ViewCountBuffer(
+    flush_interval=settings.PRODUCT_VIEW_COUNT_FLUSH_SECONDS,
+    max_pending=settings.PRODUCT_VIEW_COUNT_MAX_PENDING,
+)
+
+
+def record_view(product_id):
+    return buffer.record(product_id)
@@ -1,41 +1,232 @@
-from products.serializers import CategorySerializer, ProductSerializer, CartSerializer
+from products.serializers import CategorySerializer, ProductSerializer, CartSerializer, CartDiscountSerializer, ActiveDiscountSerializer, DiscountCodesSerializer, select_fields, sparse_fieldset
 from rest_framework import viewsets, status
-from django.shortcuts import get_object_or_404
-from products.models import Category, Product, Cart
+from rest_framework.decorators import action
+from django.db import transaction
+from django.db.models import Prefetch
+from products.models import Category, Product, ProductImage, Cart, Discount
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from datetime import datetime, timedelta
 from rest_framework.permissions import IsAuthenticated
 from products.permission import IsAdminUser
-import json
+from products.pagination import ProductPagination, ProductSearchPagination
+from products.search import search_products
+from products.filters import filter_products
+from products.facets import facet_counts
+from products.cache import get_category_tree, get_detail, serializer_version
+from products import view_counts
+from products.carts import active_cart, cart_lines, load_cart_products, payload_lines
+from products.cart_store import cart_store
+from products.discount_codes import generate_codes
+from products.discounts import active_discounts, best_discount
+from django.utils.dateparse import parse_datetime
+from utils import error_messages
+from utils.conditional import conditional_response, if_match_version, payload_etag, rows_etag, version_etag
 
 
-class CategoryViews(viewsets.ModelViewSet):
+class SparseQuerysetMixin:
+    """
+    Loads only the columns a ``?fields=`` / ``?omit=`` request serializes
+    for the actions in ``sparse_actions``.
+    """
+
+    sparse_actions = ("list",)
+    # columns always loaded, e.g. the pagination sort keys
+    sparse_always_load = ()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in self.sparse_actions:
+            return queryset
+
+        fields, omit = sparse_fieldset(self.request)
+        columns = {field.name for field in queryset.model._meta.concrete_fields}
+
+        if fields is not None:
+            return queryset.only("pk", *(fields & columns), *self.sparse_always_load)
+
+        deferred = (omit & columns) - set(self.sparse_always_load) - {queryset.model._meta.pk.name}
+        return queryset.defer(*deferred) if deferred else queryset
+
+
+def detail_response(view, model):
+    """
+    Cached detail payload of ``view``'s object cut down to the requested
+    fields, answered with 304 when the client's copy is current.
+    """
+
+    data = get_detail(
+        model, view.kwargs["pk"], view.get_serializer_class(),
+        lambda: view.get_serializer_class()(view.get_object()).data,
+    )
+    payload = {name: data[name] for name in select_fields(data, view.request)}
+
+    return conditional_response(
+        view.request, payload_etag(payload), parse_datetime(data["updated_at"]),
+        lambda: Response(payload),
+    )
+
+
+class CategoryViews(SparseQuerysetMixin, viewsets.ModelViewSet):
 
     serializer_class = CategorySerializer
     permission_classes = [
         IsAuthenticated,
     ]
     queryset = Category.objects.all()
+    sparse_always_load = ("updated_at",)
+
+    def list(self, request, *args, **kwargs):
+        categories = list(self.filter_queryset(self.get_queryset()))
+        etag = rows_etag(categories, serializer_version(self.get_serializer_class()))
+
+        return conditional_response(
+            request, etag, None,
+            lambda: Response(self.get_serializer(categories, many=True).data),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return detail_response(self, Category)
+
+    @action(detail=False, methods=["get"])
+    def tree(self, request):
+        return Response(get_category_tree(build_category_tree))
+
+
+def build_category_tree():
+    """Nest every active category under its parent, read with one query."""
+
+    nodes = {}
+    parents = []
+    fields = ("id", "parent_id", "name", "slug", "icon_url", "display_order")
+    for row in Category.objects.filter(is_active=True).values(*fields):
+        parents.append((row.pop("parent_id"), row))
+        nodes[row["id"]] = {**row, "children": []}
+
+    roots = []
+    for parent_id, row in parents:
+        if parent_id is None:
+            roots.append(nodes[row["id"]])
+        elif parent_id in nodes:
+            nodes[parent_id]["children"].append(nodes[row["id"]])
+        # children of an inactive category are hidden with it
+
+    def sort(branch):
+        branch.sort(key=lambda node: (node["display_order"] is None, node["display_order"] or 0, node["name"]))
+        for node in branch:
+            sort(node["children"])
 
+    sort(roots)
+    return roots
 
-class ProductViews(viewsets.ModelViewSet):
+
+def with_gallery(queryset, request):
+    """
+    Prefetch the images of every product in ``queryset`` with one query,
+    unless the request's sparse fieldset leaves out both image fields.
+    """
+
+    if not select_fields(("primary_image", "gallery"), request):
+        return queryset
+
+    images = ProductImage.objects.order_by("position", "pk").defer("created_at")
+    return queryset.prefetch_related(Prefetch("images", queryset=images, to_attr="gallery"))
+
+
+class ProductViews(SparseQuerysetMixin, viewsets.ModelViewSet):
 
     serializer_class = ProductSerializer
     permission_classes = [
         IsAuthenticated,
     ]
-    queryset = Product.objects.all()
+    queryset = Product.objects.defer("search_vector")
+    pagination_class = ProductPagination
+    sparse_actions = ("list", "search")
+    sparse_always_load = ("created_at", "price", "updated_at")
+    category = None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        if self.action in ("list", "search"):
+            queryset, self.category = filter_products(queryset, self.request.query_params)
+
+        return with_gallery(queryset, self.request)
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        facets = facet_counts(self.category)
+        # a row added past the page changes its next link, not its rows
+        links = [self.paginator.has_next, self.paginator.has_previous]
+        etag = rows_etag(page, facets, links, serializer_version(self.get_serializer_class()))
+
+        def build():
+            response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+            response.data["facets"] = facets
+            return response
+
+        return conditional_response(request, etag, None, build)
 
+    def retrieve(self, request, *args, **kwargs):
+        response = detail_response(self, Product)
+        view_counts.record_view(Product._meta.pk.to_python(self.kwargs["pk"]))
 
-class CartViews(viewsets.ModelViewSet):
+        return response
+
+    @action(detail=False, methods=["get"], url_path="view-counts", permission_classes=[IsAuthenticated, IsAdminUser])
+    def view_count_stats(self, request):
+        # buffer state of the worker answering the request
+        return Response(view_counts.buffer.stats())
+
+    @action(detail=False, methods=["get"], pagination_class=ProductSearchPagination)
+    def search(self, request):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response({"q": [error_messages.ERR_REQUIRED_FIELD]}, status=status.HTTP_400_BAD_REQUEST)
+
+        page = self.paginate_queryset(search_products(self.get_queryset(), query))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class CartViews(SparseQuerysetMixin, viewsets.ModelViewSet):
 
     serializer_class = CartSerializer
     permission_classes = [
         IsAuthenticated,
         IsAdminUser,
     ]
-    queryset = Cart.objects.all()
+    queryset = Cart.objects.prefetch_related(cart_lines())
+    sparse_actions = ("list", "retrieve")
+
+
+class ActiveDiscountsView(APIView):
+    permission_classes = [
+        IsAuthenticated,
+    ]
+
+    def get(self, request, format="json"):
+        # held in process, the discount table is not queried per request
+        return Response(ActiveDiscountSerializer(active_discounts(), many=True).data)
+
+
+class DiscountCodesView(APIView):
+    permission_classes = [
+        IsAuthenticated,
+        IsAdminUser,
+    ]
+
+    def post(self, request, pk):
+        """Generate one-time codes copying the template discount ``pk``."""
+
+        template = Discount.objects.filter(pk=pk, template__isnull=True).first()
+        if template is None:
+            return Response({"detail": "Discount not found."}, status=404)
+
+        serializer = DiscountCodesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        created = generate_codes(template, **serializer.validated_data)
+        return Response({"created": created}, status=status.HTTP_201_CREATED)
 
 
 class GetCartView(APIView):
@@ -44,53 +235,106 @@ class GetCartView(APIView):
     ]
 
     def get(self, request, format="json"):
-        cart, _ = Cart.objects.get_or_create(
-            user_id=self.request.user,
-            defaults={"expires_at": datetime.now() + timedelta(days=7)},
-        )
+        data = cart_store().load(request.user)
 
-        return Response(CartSerializer(cart).data)
+        return Response({name: data[name] for name in select_fields(data, request)})
 
+    def patch(self, request, format="json"):
+        """Apply ``discount_code`` to the user's cart, ``null`` takes its discount off."""
 
-class UserCart(APIView):
+        serializer = CartDiscountSerializer(active_cart(request.user), data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # a cart held in Redis is written back first, so the totals cover its lines
+        cart_store().persist(request.user.pk)
+        serializer.save()
+
+        return Response(cart_store().load(request.user))
+
+
+class BestDiscountView(APIView):
     permission_classes = [
         IsAuthenticated,
     ]
 
-    def get_cart(self):
-        cart = Cart.objects.get(user_id=self.request.user)
+    def get(self, request, format="json"):
+        """The live discount saving the most on the user's cart, nothing is applied."""
+
+        best = best_discount(payload_lines(cart_store().load(request.user)), request.user)
+        discount, savings = best or (None, None)
+
+        return Response({
+            "discount": ActiveDiscountSerializer(discount).data if discount else None,
+            "savings": str(savings or "0.00"),
+        })
+
 
-        return cart
+def is_quantity(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+class UserCart(APIView):
+    permission_classes = [
+        IsAuthenticated,
+    ]
 
     def post(self, request, format="json"):
-        cart = self.get_cart()
-        cartItems = cart.items
         items = request.data
 
         if not isinstance(items, list):
             return Response({"detail": "Invalid item format"}, status=400)
 
+        quantities = {}
         for item in items:
             if not isinstance(item, dict):
                 return Response({"detail": "Invalid item format"}, status=400)
-            product = get_object_or_404(Product, pk=item.get("product_id"))
-            cartItems.append(item)
-        cart.items = json.dumps(cartItems)
-        cart.save()
+            quantity = item.get("quantity", 1)
+            try:
+                product_id = int(item.get("product_id"))
+            except (TypeError, ValueError):
+                return Response({"detail": "Invalid item format"}, status=400)
+            if not is_quantity(quantity):
+                return Response({"detail": "Invalid item format"}, status=400)
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
 
-        return Response(CartSerializer(cart).data)
+        with transaction.atomic():
+            products = load_cart_products(quantities)
 
-    def delete(self, request, item_id=None):
-        cart = self.get_cart()
+            if quantities.keys() - products.keys():
+                return Response({"detail": "Product not found."}, status=404)
+            if not all(product.is_active for product in products.values()):
+                return Response({"product_id": [error_messages.ERR_PRODUCT_UNAVAILABLE]}, status=400)
 
-        before = len(cart.items)
+            data = cart_store().add(request.user, quantities, products)
 
-        cart.items = [i for i in cart.items if str(i.get("product_id")) != str(item_id)]
-        after = len(cart.items)
+        return Response(data)
 
-        if before == after:
-            return Response({"detail": "Item not found."}, status=404)
+    def patch(self, request, item_id=None):
+        """
+        Set the line's ``quantity`` or move it by ``delta``. Send the line's
+        ``version`` as ``If-Match`` to get a 412 instead of overwriting a
+        change made by another session.
+        """
 
-        cart.save()
+        body = request.data if isinstance(request.data, dict) else {}
+        quantity, delta = body.get("quantity"), body.get("delta")
+
+        if (quantity is None) == (delta is None):
+            return Response({"detail": "Invalid item format"}, status=400)
+        if quantity is not None and not is_quantity(quantity):
+            return Response({"detail": "Invalid item format"}, status=400)
+        if delta is not None and (not isinstance(delta, int) or isinstance(delta, bool)):
+            return Response({"detail": "Invalid item format"}, status=400)
+
+        data = cart_store().update_quantity(
+            request.user, item_id, quantity=quantity, delta=delta, expected_version=if_match_version(request)
+        )
+
+        version = next(item["version"] for item in data["items"] if item["product_id"] == item_id)
+        return Response(data, headers={"ETag": version_etag(version)})
+
+    def delete(self, request, item_id=None):
+        data = cart_store().remove(request.user, item_id)
+        if data is None:
+            return Response({"detail": "Item not found."}, status=404)
 
-        return Response(CartSerializer(cart).data, status=status.HTTP_204_NO_CONTENT)
+        return Response(data, status=status.HTTP_204_NO_CONTENT)
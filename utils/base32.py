@@ -0,0 +1,2 @@
+# Crockford's base32, no I, L, O or U to misread
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
@@ -29,4 +29,21 @@ ERR_INVALID_LAST_NAME = 'نام خانوادگی خیلی طولانی یا خا
 ERR_REFRESH_TOKEN_BLACKLISTED = "رفرش توکن در لیست سیاه قرار دارد."
 ERR_REFRESH_TOKEN_INVALID = "توکن داده شده برای هیچ نوع توکنی معتبر نیست."
 ERR_REQUIRED_FIELD = "این مقدار لازم است."
-ERR_BLANK_FIELD = 'این مقدار نباید خالی باشد.'
\ No newline at end of file
+ERR_BLANK_FIELD = 'این مقدار نباید خالی باشد.'
+
+# products app errors
+ERR_INVALID_FILTER_VALUE = "مقدار فیلتر نامعتبر است."
+ERR_INVALID_CATEGORY_PARENT = "دسته بندی نمی تواند زیرمجموعه خودش باشد."
+ERR_PRODUCT_UNAVAILABLE = "محصول در حال حاضر قابل خرید نیست."
+ERR_ACTIVE_CART_EXISTS = "این کاربر یک سبد خرید فعال دارد."
+ERR_CART_ITEM_CHANGED = "این کالا در سبد خرید تغییر کرده است، سبد را دوباره دریافت کنید."
+ERR_INVALID_QUANTITY = "تعداد باید حداقل یک باشد."
+ERR_INVALID_DISCOUNT_CODE = "کد تخفیف نامعتبر یا منقضی شده است."
+ERR_DISCOUNT_CODES_EXHAUSTED = "کد آزاد دیگری با این پیشوند و طول باقی نمانده است، طول بیشتری انتخاب کنید."
+
+# orders app errors
+ERR_DISCOUNT_USED_UP = "ظرفیت استفاده از این کد تخفیف تکمیل شده است."
+ERR_DISCOUNT_USER_LIMIT = "شما از حداکثر تعداد مجاز این کد تخفیف استفاده کرده اید."
+ERR_CART_EMPTY = "سبد خرید خالی است."
+ERR_DISCOUNT_NOT_APPLICABLE = "این کد تخفیف شامل سبد خرید شما نمی شود."
+ERR_DISCOUNT_FIRST_PURCHASE = "این کد تخفیف فقط برای اولین خرید قابل استفاده است."
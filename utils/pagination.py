@@ -0,0 +1,169 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder drops datetimes to milliseconds, a cursor needs them exact."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on ``(sort key, pk)``.
+
+    Each page is read with a ``WHERE (key, pk) < (last_key, last_pk)`` filter
+    instead of an OFFSET, so deep pages cost the same as the first one and the
+    table is never counted. Sort keys must be non-null columns (or annotations).
+    """
+
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    ordering_query_param = "ordering"
+    invalid_cursor_message = "Invalid cursor"
+
+    # default sort key, prefix with "-" for descending order
+    ordering = "-created_at"
+    # sort keys a client may choose with ?ordering=
+    ordering_fields = ("created_at",)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.current_ordering = self.get_ordering(request, view)
+
+        field = self.current_ordering.lstrip("-")
+        descending = self.current_ordering.startswith("-")
+
+        cursor = self.decode_cursor(request, queryset, field)
+        reverse = bool(cursor and cursor["reverse"])
+
+        # walking backwards flips the sort direction, the page is re-reversed below
+        fetch_descending = descending != reverse
+        prefix = "-" if fetch_descending else ""
+        queryset = queryset.order_by(f"{prefix}{field}", f"{prefix}pk")
+
+        if cursor is not None:
+            op = "lt" if fetch_descending else "gt"
+            # "key <= v AND (key < v OR pk < last_pk)" keeps the leading
+            # condition a plain range so the (key, pk) index can be used
+            queryset = queryset.filter(
+                Q(**{f"{field}__{op}e": cursor["value"]}),
+                Q(**{f"{field}__{op}": cursor["value"]}) | Q(**{f"pk__{op}": cursor["pk"]}),
+            )
+
+        rows = list(queryset[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.field = field
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, request, view=None):
+        ordering = request.query_params.get(self.ordering_query_param)
+
+        if ordering and ordering.lstrip("-") in self.ordering_fields:
+            return ordering
+        return self.ordering
+
+    def decode_cursor(self, request, queryset, field):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            if payload["o"] != self.current_ordering:
+                raise ValueError
+            value, pk, reverse = payload["v"], int(payload["pk"]), bool(payload.get("r"))
+        except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        try:
+            value = queryset.model._meta.get_field(field).to_python(value)
+        except FieldDoesNotExist:
+            # annotated sort keys (e.g. search rank) travel as plain JSON values
+            pass
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+
+        return {"value": value, "pk": pk, "reverse": reverse}
+
+    def encode_cursor(self, row, reverse=False):
+        payload = {
+            "o": self.current_ordering,
+            "v": getattr(row, self.field),
+            "pk": row.pk,
+        }
+        if reverse:
+            payload["r"] = 1
+
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(payload, cls=CursorEncoder).encode("utf-8")
+        ).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }